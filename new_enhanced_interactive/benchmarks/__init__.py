@@ -0,0 +1,14 @@
+"""Package initialization."""
+from new_enhanced_interactive.benchmarks.synthetic_dataset import (
+    SyntheticProfile,
+    SyntheticXrmBasicDataSet,
+    create_synthetic_tree,
+    install_synthetic_backend
+)
+
+__all__ = [
+    'SyntheticProfile',
+    'SyntheticXrmBasicDataSet',
+    'create_synthetic_tree',
+    'install_synthetic_backend'
+]
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from collections import OrderedDict
+
+from new_enhanced_interactive.benchmarks.run_benchmarks import build_parser as build_benchmark_parser
+from new_enhanced_interactive.benchmarks.run_benchmarks import run_scenario
+
+DEFAULT_BASELINE = 'benchmark_baseline.json'
+
+# Fixed workload: TXRMProcessor through a serial batch run, then the cumulative CSV export
+WORKLOAD = OrderedDict([
+    ('scenarios', 'batch,csv'),
+    ('files', 40),
+    ('projections', 1601),
+    ('axes', 8),
+    ('call_latency', 0.0),
+    ('read_latency', 0.0),
+    ('file_size', 1.0),
+    ('workers', 1),
+    ('formats', 'csv,txt,config'),
+    ('csv_rows', 2000),
+    ('csv_repeat', 3),
+])
+
+# metric -> (True if higher is better, threshold option)
+METRICS = OrderedDict([
+    ('files_per_second', (True, 'max_throughput_drop')),
+    ('latency_p50_ms', (False, 'max_latency_growth')),
+    ('latency_p95_ms', (False, 'max_latency_growth')),
+    ('peak_rss_mb', (False, 'max_rss_growth')),
+])
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Run the fixed benchmark workload and compare it against a stored baseline."
+    )
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE,
+                        help="Baseline JSON file (default: {0})".format(DEFAULT_BASELINE))
+    parser.add_argument('--update', action='store_true',
+                        help="Save this run as the new baseline instead of comparing")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="Runs per scenario, the median of each metric is used (default: 3)")
+    parser.add_argument('--max-throughput-drop', type=float, default=10.0,
+                        help="Allowed files/s drop in percent (default: 10)")
+    parser.add_argument('--max-latency-growth', type=float, default=20.0,
+                        help="Allowed per-file p50/p95 latency growth in percent (default: 20)")
+    parser.add_argument('--max-rss-growth', type=float, default=20.0,
+                        help="Allowed peak RSS growth in percent (default: 20)")
+    parser.add_argument('--json', metavar='PATH', help="Also write this run and the comparison to a JSON file")
+    return parser
+
+
+def _median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2.0
+
+
+def _environment():
+    return OrderedDict([
+        ('python', platform.python_version()),
+        ('platform', platform.platform()),
+        ('machine', platform.node()),
+    ])
+
+
+def run_workload(workload, repeat):
+    """Run every scenario of the workload `repeat` times; returns {scenario: median metrics} or None on error"""
+    options = build_benchmark_parser().parse_args([])
+    for key, value in workload.items():
+        setattr(options, key, value)
+
+    results = OrderedDict()
+    for name in workload['scenarios'].split(','):
+        runs = []
+        for i in range(max(repeat, 1)):
+            print("Running {0} ({1}/{2})...".format(name, i + 1, max(repeat, 1)))
+            result = run_scenario(name, options)
+            if 'error' in result:
+                print("Scenario {0} failed:\n{1}".format(name, result['error']))
+                return None
+            runs.append(result)
+        results[name] = OrderedDict(
+            (metric, _median([run[metric] for run in runs]) if runs[0].get(metric) is not None else None)
+            for metric in METRICS
+        )
+        results[name]['files'] = runs[0]['files']
+    return results
+
+
+def compare(baseline_results, results, thresholds):
+    """
+    Compare each metric with the baseline. Returns a list of
+    (scenario, metric, baseline, current, change in percent, regressed).
+    """
+    rows = []
+    for name, metrics in results.items():
+        reference = baseline_results.get(name)
+        if reference is None:
+            continue
+        for metric, (higher_is_better, threshold_name) in METRICS.items():
+            old, new = reference.get(metric), metrics.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old * 100.0
+            worse = -change if higher_is_better else change
+            rows.append((name, metric, old, new, change, worse > thresholds[threshold_name]))
+    return rows
+
+
+def format_comparison(rows):
+    lines = [
+        "{0:<8} {1:<18} {2:>12} {3:>12} {4:>9}  {5}".format(
+            'Scenario', 'Metric', 'Baseline', 'Current', 'Change', 'Status'),
+        "-" * 72
+    ]
+    for name, metric, old, new, change, regressed in rows:
+        lines.append("{0:<8} {1:<18} {2:>12.2f} {3:>12.2f} {4:>+8.1f}%  {5}".format(
+            name, metric, old, new, change, 'REGRESSED' if regressed else 'ok'))
+    return "\n".join(lines)
+
+
+def _save(path, data):
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2, separators=(',', ': '))
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    thresholds = {
+        'max_throughput_drop': args.max_throughput_drop,
+        'max_latency_growth': args.max_latency_growth,
+        'max_rss_growth': args.max_rss_growth,
+    }
+
+    baseline = None
+    if os.path.exists(args.baseline) and not args.update:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f, object_pairs_hook=OrderedDict)
+
+    # Rerun the workload the baseline was recorded with so the numbers are comparable
+    workload = baseline['workload'] if baseline else WORKLOAD
+    results = run_workload(workload, args.repeat)
+    if results is None:
+        return 1
+
+    run = OrderedDict([
+        ('created_at', time.strftime("%Y-%m-%d %H:%M:%S")),
+        ('environment', _environment()),
+        ('repeat', args.repeat),
+        ('workload', workload),
+        ('results', results),
+    ])
+
+    if baseline is None:
+        _save(args.baseline, run)
+        print("\nBaseline saved to: {0}".format(args.baseline))
+        return 0
+
+    if baseline.get('environment') != run['environment']:
+        print("\nWarning: the baseline was recorded on {0} (Python {1}), numbers may not be comparable".format(
+            baseline['environment'].get('machine'), baseline['environment'].get('python')))
+
+    rows = compare(baseline['results'], results, thresholds)
+    print("\n" + format_comparison(rows))
+    regressions = [row for row in rows if row[5]]
+    if args.json:
+        run['baseline'] = args.baseline
+        run['comparison'] = [OrderedDict(zip(('scenario', 'metric', 'baseline', 'current', 'change_percent',
+                                               'regressed'), row)) for row in rows]
+        _save(args.json, run)
+
+    if regressions:
+        print("\n{0} metric(s) regressed past the thresholds".format(len(regressions)))
+        return 1
+    print("\nNo regressions. Run with --update to record this run as the new baseline.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
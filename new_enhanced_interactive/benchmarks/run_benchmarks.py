@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+
+try:
+    import resource  # Not available on Windows
+except ImportError:
+    resource = None
+
+from new_enhanced_interactive.benchmarks.synthetic_dataset import (
+    SyntheticProfile,
+    create_synthetic_tree,
+    install_synthetic_backend
+)
+
+SCENARIOS = ('batch', 'watch', 'csv')
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Benchmark batch, watch and CSV export on synthetic TXRM datasets (no XradiaPy needed)."
+    )
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help="Comma-separated scenarios from {0} (default: all)".format(','.join(SCENARIOS)))
+    parser.add_argument('--files', type=int, default=50, help="Number of TXRM files (default: 50)")
+    parser.add_argument('--projections', type=int, default=1601, help="Projections per file (default: 1601)")
+    parser.add_argument('--axes', type=int, default=8, help="Motor axes per file (default: 8)")
+    parser.add_argument('--call-latency', type=float, default=0.0,
+                        help="Milliseconds added to every dataset getter call (default: 0)")
+    parser.add_argument('--read-latency', type=float, default=0.0,
+                        help="Milliseconds added to every ReadFile (default: 0)")
+    parser.add_argument('--file-size', type=float, default=1.0,
+                        help="Size of each TXRM file on disk in MB (default: 1)")
+    parser.add_argument('--workers', type=int, default=1, help="Worker processes for the batch scenario")
+    parser.add_argument('--formats', default='csv,txt,config',
+                        help="Outputs written by the batch scenario (default: csv,txt,config)")
+    parser.add_argument('--csv-rows', type=int, default=2000,
+                        help="Rows in the cumulative CSV of the csv scenario (default: 2000)")
+    parser.add_argument('--csv-repeat', type=int, default=3,
+                        help="Times the csv scenario writes the CSV (default: 3)")
+    parser.add_argument('--json', metavar='PATH', help="Also write the results to this JSON file")
+    return parser
+
+
+def profile_from_options(options):
+    return SyntheticProfile(
+        projections=options.projections,
+        axes=options.axes,
+        call_latency=options.call_latency / 1000.0,
+        read_latency=options.read_latency / 1000.0
+    )
+
+
+def _peak_rss_mb():
+    """Peak resident memory of this process and its finished children in MB, None if unknown"""
+    if resource is None:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024.0 * 1024.0) if sys.platform == 'darwin' else peak / 1024.0
+
+
+def _file_results(progress, seconds):
+    """Throughput and latency of a run from its ProgressTracker"""
+    from new_enhanced_interactive.utils.progress_tracker import ALL, TOTAL_STAGE
+    percentiles = progress.get_percentiles() or {}
+    stages = dict(
+        (stage, histogram.sum / histogram.count * 1000.0)
+        for (stage, size_label, projection_label), histogram in progress.histograms.items()
+        if size_label == ALL and projection_label == ALL and histogram.count and stage != TOTAL_STAGE
+    )
+    return {
+        'files': progress.processed_files,
+        'failed': len(progress.failed_files),
+        'seconds': seconds,
+        'files_per_second': progress.processed_files / seconds if seconds else 0.0,
+        'mb_per_second': progress.bytes_processed / (1024.0 * 1024.0) / seconds if seconds else 0.0,
+        'latency_p50_ms': (percentiles.get('p50') or 0.0) * 1000.0,
+        'latency_p95_ms': (percentiles.get('p95') or 0.0) * 1000.0,
+        'stage_mean_ms': stages
+    }
+
+
+def _run_batch(options, workdir):
+    from new_enhanced_interactive.config.user_config import UserConfig
+    from new_enhanced_interactive.processors.batch_runner import BatchRunner
+
+    data_dir = os.path.join(workdir, 'data')
+    create_synthetic_tree(data_dir, options.files, int(options.file_size * 1024 * 1024))
+    user_config = UserConfig()
+    user_config.search_paths = [data_dir]
+    user_config.output_dir = os.path.join(workdir, 'output')
+    user_config.workers = options.workers
+    user_config.output_formats = [fmt.strip() for fmt in options.formats.split(',') if fmt.strip()]
+    user_config.progress_interval = float('inf')
+    user_config.cache_dir = None  # Measure extraction, not cache hits from earlier runs
+
+    runner = BatchRunner(user_config)
+    start = time.time()
+    runner.run()
+    return _file_results(runner.progress, time.time() - start)
+
+
+def _run_watch(options, workdir):
+    from new_enhanced_interactive.config.watch_config import WatchConfig
+    from new_enhanced_interactive.processors.txrm_processor import TXRMProcessor
+    from new_enhanced_interactive.utils.file_watcher import TXRMFileWatcher
+
+    data_dir = os.path.join(workdir, 'data')
+    create_synthetic_tree(data_dir, options.files, int(options.file_size * 1024 * 1024))
+    config = WatchConfig(os.path.join(workdir, 'watch_config.json'))
+    config.config.update(
+        watch_mode_enabled=True,
+        watch_directory=data_dir,
+        cumulative_csv_path=os.path.join(workdir, 'output'),
+        processed_files_log=os.path.join(workdir, 'processed_files.json'),
+        github_enabled=False,
+        work_queue_enabled=False,
+        metadata_cache_enabled=False,
+        progress_interval=float('inf')
+    )
+    os.makedirs(config.config['cumulative_csv_path'])
+
+    watcher = TXRMFileWatcher(TXRMProcessor(output_dir=config.config['cumulative_csv_path']), config)
+    # One polling cycle picks up every file, with a CSV update after each one like in production
+    start = time.time()
+    watcher._process_new_files()
+    return _file_results(watcher.progress, time.time() - start)
+
+
+def _run_csv(options, workdir):
+    from new_enhanced_interactive.metadata.metadata_extractor import MetadataExtractor
+    from new_enhanced_interactive.processors.txrm_processor import TXRMProcessor
+
+    data_dir = os.path.join(workdir, 'data')
+    paths = create_synthetic_tree(data_dir, min(options.files, options.csv_rows), 0)
+    extractor = MetadataExtractor()
+    templates = []
+    for path in paths:
+        metadata = extractor.get_complete_metadata(path)
+        metadata['file_hash'] = "{0:064x}".format(len(templates))
+        templates.append(metadata)
+
+    processor = TXRMProcessor(output_dir=os.path.join(workdir, 'output'))
+    for i in range(options.csv_rows):
+        metadata = dict(templates[i % len(templates)])
+        metadata['file_path'] = os.path.join(data_dir, "row_{0:06d}.txrm".format(i))
+        processor.all_metadata.append(metadata)
+
+    durations = []
+    for i in range(options.csv_repeat):
+        start = time.time()
+        processor.save_cumulative_csv("benchmark_{0}.csv".format(i))
+        durations.append(time.time() - start)
+    seconds = sum(durations)
+    return {
+        'files': options.csv_rows,
+        'failed': 0,
+        'seconds': seconds,
+        'files_per_second': options.csv_rows * len(durations) / seconds if seconds else 0.0,
+        'mb_per_second': 0.0,
+        'latency_p50_ms': sorted(durations)[len(durations) // 2] * 1000.0,
+        'latency_p95_ms': max(durations) * 1000.0,
+        'stage_mean_ms': {'cumulative_csv': seconds / len(durations) * 1000.0}
+    }
+
+
+_SCENARIO_FUNCTIONS = {
+    'batch': _run_batch,
+    'watch': _run_watch,
+    'csv': _run_csv,
+}
+
+
+def _scenario_process(name, options, results):
+    """Run one scenario in a fresh process so peak memory belongs to it alone"""
+    workdir = tempfile.mkdtemp(prefix='txrm_benchmark_')
+    # Keep processing logs out of the current directory
+    os.environ['LOG_FILE'] = os.path.join(workdir, 'logs', 'processing.log')
+    stdout = sys.stdout
+    try:
+        install_synthetic_backend(profile_from_options(options))
+        sys.stdout = open(os.devnull, 'w')
+        result = _SCENARIO_FUNCTIONS[name](options, workdir)
+        result['peak_rss_mb'] = _peak_rss_mb()
+    except Exception:
+        result = {'error': traceback.format_exc()}
+    finally:
+        if sys.stdout is not stdout:
+            sys.stdout.close()
+            sys.stdout = stdout
+        from new_enhanced_interactive.utils.logging_utils import stop_logging
+        stop_logging()
+        shutil.rmtree(workdir, ignore_errors=True)
+    result['scenario'] = name
+    results.put(result)
+
+
+def run_scenario(name, options):
+    """Run a scenario in a child process and return its results dict"""
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_scenario_process, args=(name, options, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def format_results(results):
+    lines = [
+        "{0:<8} {1:>7} {2:>9} {3:>9} {4:>9} {5:>10} {6:>10} {7:>10}".format(
+            'Scenario', 'Files', 'Seconds', 'Files/s', 'MB/s', 'p50 ms', 'p95 ms', 'Peak MB'),
+        "-" * 80
+    ]
+    for result in results:
+        if 'error' in result:
+            lines.append("{0:<8} failed:\n{1}".format(result['scenario'], result['error']))
+            continue
+        lines.append("{0:<8} {1:>7} {2:>9.2f} {3:>9.1f} {4:>9.1f} {5:>10.2f} {6:>10.2f} {7:>10}".format(
+            result['scenario'], result['files'], result['seconds'], result['files_per_second'],
+            result['mb_per_second'], result['latency_p50_ms'], result['latency_p95_ms'],
+            "{0:.1f}".format(result['peak_rss_mb']) if result['peak_rss_mb'] is not None else 'n/a'))
+    for result in results:
+        if result.get('stage_mean_ms'):
+            lines.append("\n{0} mean ms per stage: {1}".format(result['scenario'], ", ".join(
+                "{0} {1:.2f}".format(stage, ms) for stage, ms in sorted(result['stage_mean_ms'].items()))))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    options = build_parser().parse_args(argv)
+    names = [name.strip() for name in options.scenarios.split(',') if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        print("Unknown scenario: {0}".format(", ".join(unknown)))
+        return 2
+
+    print("Synthetic workload: {0} files, {1} projections, {2} axes, {3} MB per file".format(
+        options.files, options.projections, options.axes, options.file_size))
+    results = []
+    for name in names:
+        print("Running {0}...".format(name))
+        results.append(run_scenario(name, options))
+    print("\n" + format_results(results))
+
+    if options.json:
+        with open(options.json, 'w') as f:
+            json.dump({'options': vars(options), 'results': results}, f, indent=2, separators=(',', ': '))
+        print("\nResults saved to: {0}".format(options.json))
+    return 1 if any('error' in result for result in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
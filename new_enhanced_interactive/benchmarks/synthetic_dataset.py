@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division
+import hashlib
+import math
+import os
+import time
+from datetime import datetime, timedelta
+
+from new_enhanced_interactive.metadata.xradia_backend import set_dataset_factory
+
+# Axis names as reported by the instruments, in the order they are handed out
+AXIS_NAMES = (
+    'Sample X', 'Sample Y', 'Sample Z', 'Sample Theta', 'Source X', 'Source Z',
+    'Detector Z', 'CCD Z', 'CCD X', 'Flat Panel X', 'Flat Panel Z', 'MkIV Filter Wheel', 'DCT'
+)
+
+
+def format_xradia_date(value):
+    """Format a datetime like XradiaPy does: 09/10/2022 15:17:54.773"""
+    return value.strftime("%m/%d/%Y %H:%M:%S.") + "{0:03d}".format(value.microsecond // 1000)
+
+
+class SyntheticProfile(object):
+    """
+    Knobs of the synthetic datasets.
+
+    `call_latency` is added to every getter call and `read_latency` to
+    ReadFile, both in seconds, to mimic the cost of the native library.
+    Projection dates start at `start` (shifted per file) and advance by
+    `exposure` plus `overhead` seconds per projection.
+    """
+
+    def __init__(self, projections=1601, axes=8, call_latency=0.0, read_latency=0.0,
+                 exposure=2.0, overhead=0.35, start=datetime(2024, 5, 6, 9, 30),
+                 width=2048, height=2048, pixel_size=1.5, images_per_projection=1):
+        self.projections = projections
+        self.axes = min(max(axes, 1), len(AXIS_NAMES))
+        self.call_latency = call_latency
+        self.read_latency = read_latency
+        self.exposure = exposure
+        self.overhead = overhead
+        self.start = start
+        self.width = width
+        self.height = height
+        self.pixel_size = pixel_size
+        self.images_per_projection = images_per_projection
+
+
+class SyntheticXrmBasicDataSet(object):
+    """
+    Stand-in for XradiaPy's XrmBasicDataSet that needs no instrument
+    software. Values are derived from the file path, so every read of the
+    same file returns the same metadata. Files that do not exist are not
+    initialized correctly, like with the real library.
+    """
+
+    def __init__(self, profile):
+        self.profile = profile
+        self.path = None
+        self._initialized = False
+        self._seed = 0
+        self._start = profile.start
+        self._axes = list(AXIS_NAMES[:profile.axes])
+        # Sample Theta is always present so scans have a rotation axis
+        if 'Sample Theta' not in self._axes:
+            self._axes[-1] = 'Sample Theta'
+
+    def _call(self):
+        if self.profile.call_latency:
+            time.sleep(self.profile.call_latency)
+
+    def ReadFile(self, path):
+        if self.profile.read_latency:
+            time.sleep(self.profile.read_latency)
+        self.path = path
+        self._initialized = os.path.exists(path)
+        key = path if isinstance(path, bytes) else path.encode('utf-8')
+        self._seed = int(hashlib.md5(key).hexdigest()[:8], 16)
+        self._start = self.profile.start + timedelta(minutes=self._seed % 100000)
+
+    def GetName(self):
+        self._call()
+        return self.path
+
+    def IsInitializedCorrectly(self):
+        self._call()
+        return self._initialized
+
+    def GetObjective(self):
+        self._call()
+        return ('0.4X', '4X', '20X', '40X')[self._seed % 4]
+
+    def GetPixelSize(self):
+        self._call()
+        return self.profile.pixel_size
+
+    def GetPower(self):
+        self._call()
+        return 10.0
+
+    def GetVoltage(self):
+        self._call()
+        return (40.0, 60.0, 80.0, 140.0)[self._seed % 4]
+
+    def GetFilter(self):
+        self._call()
+        return 'LE{0}'.format(1 + self._seed % 6)
+
+    def GetBinning(self):
+        self._call()
+        return 2
+
+    def GetHeight(self):
+        self._call()
+        return self.profile.height
+
+    def GetWidth(self):
+        self._call()
+        return self.profile.width
+
+    def GetProjections(self):
+        self._call()
+        return self.profile.projections
+
+    def GetImagesPerProjection(self, tomo_point_index=0):
+        self._call()
+        return self.profile.images_per_projection
+
+    def GetAxesNames(self):
+        self._call()
+        return list(self._axes)
+
+    def _axis_position(self, projection_idx, axis):
+        if axis == 'Sample Theta':
+            return -180.0 + 360.0 * projection_idx / max(self.profile.projections - 1, 1)
+        # A fixed position per file with a slow drift and some jitter
+        base = (self._seed % 1000) / 100.0 + AXIS_NAMES.index(axis)
+        return base + 1e-5 * projection_idx + 5e-4 * math.sin(projection_idx * 0.7 + len(axis))
+
+    def GetAxisPosition(self, projection_idx, axis):
+        self._call()
+        return self._axis_position(projection_idx, axis)
+
+    def GetAxisPositions(self, projection_idx):
+        self._call()
+        return dict((axis.replace(' ', '_'), self._axis_position(projection_idx, axis)) for axis in self._axes)
+
+    def GetDate(self, projection_idx):
+        self._call()
+        # Every 100th projection stalls a little, like a reference image or a detector hiccup
+        stall = 4.0 * (projection_idx // 100)
+        seconds = projection_idx * (self.profile.exposure + self.profile.overhead) + stall
+        return format_xradia_date(self._start + timedelta(seconds=seconds))
+
+    def GetDetectorToRADistance(self, projection_idx):
+        self._call()
+        return 100.0 + (self._seed % 50)
+
+    def GetSourceToRADistance(self, projection_idx):
+        self._call()
+        return -20.0 - (self._seed % 30)
+
+    def GetExposure(self, projection_idx):
+        self._call()
+        return self.profile.exposure
+
+
+class SyntheticDataSetFactory(object):
+    """Dataset factory for xradia_backend.set_dataset_factory"""
+
+    def __init__(self, profile=None):
+        self.profile = profile or SyntheticProfile()
+
+    def __call__(self):
+        return SyntheticXrmBasicDataSet(self.profile)
+
+
+def install_synthetic_backend(profile=None):
+    """Make the extractor and config converter use synthetic datasets"""
+    factory = SyntheticDataSetFactory(profile)
+    set_dataset_factory(factory)
+    return factory
+
+
+def create_synthetic_tree(root, file_count, file_size=0, folders=4, drift_every=0):
+    """
+    Create `file_count` .txrm files of `file_size` bytes spread over
+    `folders` sample folders below `root`. Every `drift_every`-th scan
+    also gets a drift file. The files are sparse, so creating them is fast
+    while hashing still reads every byte. Returns the scan file paths.
+    """
+    paths = []
+    for i in range(file_count):
+        folder = os.path.join(root, "sample_{0:02d}".format(i % max(folders, 1)))
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        names = ["scan_{0:05d}.txrm".format(i)]
+        if drift_every and i % drift_every == 0:
+            names.append("scan_{0:05d}_drift.txrm".format(i))
+        for name in names:
+            path = os.path.join(folder, name)
+            with open(path, 'wb') as f:
+                f.write(b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1')  # OLE2 signature, like real TXRM files
+                if file_size > 8:
+                    f.truncate(file_size)
+            if name == names[0]:
+                paths.append(path)
+    return paths
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import argparse
+import os
+
+from new_enhanced_interactive.config.user_config import UserConfig, OUTPUT_FORMATS, DEFAULT_OUTPUT_FORMATS
+from new_enhanced_interactive.config.watch_config import WatchConfig
+from new_enhanced_interactive.metadata.metadata_extractor import PROJECTION_DETAILS
+from new_enhanced_interactive.metadata.projection_sampling import parse_indices, parse_window
+from new_enhanced_interactive.processors.batch_runner import BatchRunner
+from new_enhanced_interactive.processors.txrm_processor import TXRMProcessor
+from new_enhanced_interactive.utils.file_watcher import TXRMFileWatcher
+from new_enhanced_interactive.utils.parallel_walk import DEFAULT_WALK_CONCURRENCY
+from new_enhanced_interactive.utils.profiling import run_profiled, DEFAULT_TOP_N
+from new_enhanced_interactive.utils.progress_tracker import DEFAULT_REPORT_INTERVAL
+from new_enhanced_interactive.utils.sharding import merge_host_csvs, merge_shard_csvs, parse_shard, MERGED_CSV_NAME
+
+LOG_LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR')
+
+
+def _shard_type(value):
+    """argparse type for --shard i/N"""
+    try:
+        return parse_shard(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def _indices_type(value):
+    """argparse type for --sample-indices"""
+    try:
+        return parse_indices(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def _window_type(value):
+    """argparse type for --sample-window START:END"""
+    try:
+        return parse_window(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def _formats_type(value):
+    """argparse type for a comma-separated list of output formats"""
+    formats = [fmt.strip().lower() for fmt in value.split(',') if fmt.strip()]
+    unknown = [fmt for fmt in formats if fmt not in OUTPUT_FORMATS]
+    if unknown or not formats:
+        raise argparse.ArgumentTypeError("Unknown output format '{0}', choose from {1}".format(
+            ','.join(unknown), ','.join(OUTPUT_FORMATS)))
+    return formats
+
+
+def _add_profile_arguments(subparser):
+    subparser.add_argument('--profile', action='store_true',
+                           help="Run under cProfile and write a .prof file and a summary to the output folder")
+    subparser.add_argument('--profile-memory', action='store_true',
+                           help="Also report allocation hotspots with tracemalloc (Python 3 only), implies --profile")
+    subparser.add_argument('--profile-top', type=int, default=DEFAULT_TOP_N,
+                           help="Functions and allocation sites listed in the summaries (default: {0})".format(
+                               DEFAULT_TOP_N))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='xradia-metadata',
+        description="Extract metadata from TXRM files without interactive prompts."
+    )
+    parser.add_argument('--log-level', type=str.upper, choices=LOG_LEVELS,
+                        help="Log file level, overrides LOG_LEVEL (default: INFO)")
+    subparsers = parser.add_subparsers(dest='command')
+
+    batch = subparsers.add_parser('batch', help="Process all TXRM files below one or more folders")
+    batch.add_argument('search_paths', nargs='+', metavar='search_path',
+                       help="Folder containing TXRM files")
+    batch.add_argument('-o', '--output-dir',
+                       help="Output folder for cumulative files (default: <first search_path>/metadata_output)")
+    batch.add_argument('--include-drift', action='store_true', help="Also process drift files")
+    batch.add_argument('--include', action='append', metavar='PATTERN',
+                       help="Only process files matching this glob (relative path or file name), repeatable")
+    batch.add_argument('--exclude', action='append', metavar='PATTERN',
+                       help="Skip files matching this glob (relative path or file name), repeatable")
+    batch.add_argument('-j', '--workers', type=int, default=1,
+                       help="Number of worker processes (default: 1)")
+    batch.add_argument('--formats', type=_formats_type, default=list(DEFAULT_OUTPUT_FORMATS),
+                       help="Comma-separated outputs from {0} (default: {1})".format(
+                           ','.join(OUTPUT_FORMATS), ','.join(DEFAULT_OUTPUT_FORMATS)))
+    batch.add_argument('--resume', action='store_true',
+                       help="Skip files recorded by a previous run in the output folder")
+    batch.add_argument('--walk-threads', type=int, default=DEFAULT_WALK_CONCURRENCY,
+                       help="Directories listed in parallel during discovery (default: {0})".format(
+                           DEFAULT_WALK_CONCURRENCY))
+    batch.add_argument('--prune', action='append', metavar='DIR',
+                       help="Additional folder name to skip during discovery, repeatable")
+    batch.add_argument('--progress-interval', type=float, default=DEFAULT_REPORT_INTERVAL,
+                       help="Seconds between progress, throughput and ETA lines (default: {0:.0f})".format(
+                           DEFAULT_REPORT_INTERVAL))
+    batch.add_argument('--trace-calls', action='store_true',
+                       help="Count calls and time per XradiaPy method and report them for each file")
+    batch.add_argument('--cache', action='store_true',
+                       help="Reuse metadata cached by file hash for files seen before")
+    batch.add_argument('--cache-dir',
+                       help="Folder of cached metadata keyed by file hash, implies --cache (default: "
+                            "METADATA_CACHE_DIR or ~/.txrm_metadata_cache)")
+    batch.add_argument('--no-cache', action='store_true',
+                       help="Always extract through XradiaPy, even with --cache or --cache-dir (the default)")
+    batch.add_argument('--projection-detail', choices=PROJECTION_DETAILS, default='all',
+                       help="Keep every projection in the records, or only the first and last with streamed "
+                            "statistics of all of them (default: all)")
+    batch.add_argument('--sample-stride', type=int, default=1, metavar='K',
+                       help="Only read every K-th projection, plus the first and last (default: 1, all)")
+    batch.add_argument('--sample-indices', type=_indices_type, metavar='LIST',
+                       help="Only read these projections, e.g. 'first,last,every:100,250'; negative counts from the end")
+    batch.add_argument('--sample-window', type=_window_type, action='append', metavar='START:END',
+                       help="Only read projections taken START to END seconds after the first one, repeatable")
+    batch.add_argument('--shard', type=_shard_type, default=os.environ.get('TXRM_SHARD'),
+                       help="Only process shard i of N (e.g. 0/4), default from TXRM_SHARD")
+    _add_profile_arguments(batch)
+
+    watch = subparsers.add_parser('watch', help="Run watch mode with the saved watch configuration")
+    _add_profile_arguments(watch)
+
+    merge = subparsers.add_parser('merge', help="Merge the CSV files written by all shards or workstations")
+    merge.add_argument('output_dir', help="Folder containing the shard or workstation CSV files")
+    merge.add_argument('-o', '--output',
+                       help="Merged CSV path (default: <output_dir>/{0})".format(MERGED_CSV_NAME))
+    merge.add_argument('--shards', type=int, metavar='N',
+                       help="Only merge the files of a run with N shards (required if the folder holds "
+                            "files of runs with different N)")
+    merge.add_argument('--hosts', action='store_true',
+                       help="Merge the per-workstation CSV files of a watch with a shared work queue")
+
+    return parser
+
+
+def run_batch(args):
+    """Process every selected TXRM file and write the cumulative outputs"""
+    missing = [path for path in args.search_paths if not os.path.isdir(path)]
+    if missing:
+        print("Path does not exist: {0}".format(", ".join(missing)))
+        return 2
+
+    user_config = UserConfig.from_args(args)
+    if user_config.shard:
+        print("\nProcessing shard {0}/{1}".format(*user_config.shard))
+    runner = BatchRunner(user_config)
+    if _profiling(args) and user_config.workers > 1:
+        print("\nNote: only the main process is profiled, use --workers 1 to profile extraction")
+    return 0 if _run(args, runner.run, runner.output_dir, 'batch') else 1
+
+
+def run_watch(args):
+    """Watch the configured directory until interrupted"""
+    config = WatchConfig()
+    if not config.config['watch_mode_enabled']:
+        print("Watch mode is not configured! Run the interactive mode to configure it first.")
+        return 2
+    output_dir = config.config['cumulative_csv_path']
+    watcher = TXRMFileWatcher(TXRMProcessor(output_dir=output_dir), config)
+    _run(args, watcher.watch, output_dir or os.getcwd(), 'watch')
+    return 0
+
+
+def _profiling(args):
+    return args.profile or args.profile_memory
+
+
+def _run(args, func, output_dir, name):
+    """Call func, under the profiler if requested"""
+    if not _profiling(args):
+        return func()
+    return run_profiled(func, output_dir, name, args.profile_top, args.profile_memory)
+
+
+def run_merge(args):
+    """Merge shard or workstation CSV files into a single cumulative CSV"""
+    if args.hosts:
+        return 0 if merge_host_csvs(args.output_dir, args.output) else 1
+    return 0 if merge_shard_csvs(args.output_dir, args.output, args.shards) else 1
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.log_level:
+        # Through the environment so worker processes pick it up as well
+        os.environ['LOG_LEVEL'] = args.log_level
+    if args.command == 'batch':
+        return run_batch(args)
+    if args.command == 'watch':
+        return run_watch(args)
+    if args.command == 'merge':
+        return run_merge(args)
+    parser.print_help()
+    return 2
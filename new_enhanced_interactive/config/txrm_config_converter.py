@@ -1,15 +1,68 @@
 # -*- coding: utf-8 -*-
 from __future__ import print_function
 import ConfigParser
-from XradiaPy import Data
+from new_enhanced_interactive.metadata.call_tracer import TracingDataSet
+from new_enhanced_interactive.metadata.xradia_backend import create_dataset
 from new_enhanced_interactive.utils.logging_utils import setup_logger
 
+
+class _MetadataDataSet(object):
+    """The dataset getters used for the config, answered from an extracted metadata record"""
+
+    def __init__(self, metadata):
+        self.machine_settings = metadata['machine_settings']
+        self.image_properties = metadata['image_properties']
+        self.first_projection = metadata['projection_data'][0]
+
+    @staticmethod
+    def can_answer(metadata):
+        try:
+            first = metadata['projection_data'][0]
+            return ('detector_to_ra_distance' in first and 'source_to_ra_distance' in first
+                    and 'pixel_size' in metadata['machine_settings'] and 'binning' in metadata['machine_settings']
+                    and all(key in metadata['image_properties']
+                            for key in ('width', 'height', 'total_projections')))
+        except (KeyError, IndexError, TypeError):
+            return False
+
+    def GetDetectorToRADistance(self, projection_idx):
+        return self.first_projection['detector_to_ra_distance']
+
+    def GetSourceToRADistance(self, projection_idx):
+        return self.first_projection['source_to_ra_distance']
+
+    def GetPixelSize(self):
+        return self.machine_settings['pixel_size']
+
+    def GetProjections(self):
+        return self.image_properties['total_projections']
+
+    def GetWidth(self):
+        return self.image_properties['width']
+
+    def GetHeight(self):
+        return self.image_properties['height']
+
+    def GetBinning(self):
+        return self.machine_settings['binning']
+
+
 class TXRMConfigConverter(object):
     def __init__(self):
-        self.dataset = Data.XRMData.XrmBasicDataSet()
+        self.dataset = create_dataset()
         self.config = None
-        self.logger = setup_logger('txrm_config')
+        self.logger = setup_logger('txrm_config', __name__)
         self.metadata = None  # Add metadata storage
+        self.call_stats = None  # CallStats to trace dataset calls into, None to not trace
+        self.shared_dataset = None  # MemoizingDataSet shared with other components, used instead of new datasets
+
+    def _new_dataset(self):
+        if self.shared_dataset is not None:
+            return self.shared_dataset
+        dataset = create_dataset()
+        if self.call_stats is not None:
+            dataset = TracingDataSet(dataset, self.call_stats)
+        return dataset
 
     def _init_config_sections(self):
         sections = ['Geometry', 'CT', 'Image', 'Detector', 'Axis', 'General']
@@ -103,11 +156,15 @@ class TXRMConfigConverter(object):
             # Ensure txrm_path is a proper string and normalize path separators
             txrm_path = str(txrm_path).replace('\\', '/')
             
-            # Reset the dataset before reading a new file
-            self.dataset = Data.XRMData.XrmBasicDataSet()
-            
-            # Read the file
-            self.dataset.ReadFile(txrm_path)
+            if _MetadataDataSet.can_answer(metadata):
+                # Everything the config needs was extracted already, no need to read the file again
+                self.dataset = _MetadataDataSet(metadata)
+            else:
+                # Reset the dataset before reading a new file
+                self.dataset = self._new_dataset()
+                
+                # Read the file
+                self.dataset.ReadFile(txrm_path)
             
             self._init_config_sections()
             self._fill_geometry_section()
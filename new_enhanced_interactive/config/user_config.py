@@ -1,14 +1,69 @@
 # -*- coding: utf-8 -*-
 from __future__ import print_function
 import os
+from new_enhanced_interactive.metadata.projection_sampling import ProjectionSampling
 from new_enhanced_interactive.utils.file_utils import get_user_input
+from new_enhanced_interactive.utils.metadata_cache import default_cache_dir
+from new_enhanced_interactive.utils.parallel_walk import DEFAULT_PRUNE_DIRS, DEFAULT_WALK_CONCURRENCY
+from new_enhanced_interactive.utils.progress_tracker import DEFAULT_REPORT_INTERVAL
+
+# csv/json: cumulative outputs, txt/config: sidecar files next to each TXRM file,
+# drift: axis drift and jitter report of the drift files
+OUTPUT_FORMATS = ['csv', 'json', 'txt', 'config', 'drift']
+DEFAULT_OUTPUT_FORMATS = ['csv', 'txt', 'config']
 
 class UserConfig(object):  # Explicitly inherit from object
     def __init__(self):
-        self.search_path = None
+        self.search_paths = []
         self.output_dir = None
         self.include_drift = False
         self.process_mode = None
+        self.include_patterns = []
+        self.exclude_patterns = []
+        self.workers = 1
+        self.output_formats = list(DEFAULT_OUTPUT_FORMATS)
+        self.resume = False
+        self.shard = None
+        self.walk_concurrency = DEFAULT_WALK_CONCURRENCY
+        self.prune_dirs = list(DEFAULT_PRUNE_DIRS)
+        self.progress_interval = DEFAULT_REPORT_INTERVAL
+        self.trace_calls = False
+        self.cache_dir = None  # Folder of the metadata cache, None disables it
+        self.projection_detail = 'all'  # 'ends' keeps only the first and last projection in the records
+        self.sampling = None  # ProjectionSampling of the projections to read, None to read all of them
+        
+    @classmethod
+    def from_args(cls, args):
+        """Build a configuration from parsed command line arguments"""
+        config = cls()
+        config.search_paths = list(args.search_paths)
+        config.output_dir = args.output_dir
+        config.include_drift = args.include_drift
+        config.process_mode = '1'
+        config.include_patterns = args.include or []
+        config.exclude_patterns = args.exclude or []
+        config.workers = max(1, args.workers)
+        config.output_formats = args.formats
+        config.resume = args.resume
+        config.shard = args.shard
+        config.walk_concurrency = args.walk_threads
+        config.prune_dirs.extend(args.prune or [])
+        config.progress_interval = args.progress_interval
+        config.trace_calls = args.trace_calls
+        config.cache_dir = None
+        if (args.cache or args.cache_dir) and not args.no_cache:
+            config.cache_dir = args.cache_dir or default_cache_dir()
+        config.projection_detail = args.projection_detail
+        indices, every = args.sample_indices or ([], None)
+        sampling = ProjectionSampling(args.sample_stride, indices, every, args.sample_window)
+        config.sampling = None if sampling.is_full else sampling
+        return config
+    
+    def get_output_dir(self):
+        """Output directory, defaulting to metadata_output below the first search path"""
+        if self.output_dir:
+            return self.output_dir
+        return os.path.join(self.search_paths[0], "metadata_output")
         
     def _get_valid_path(self):
         """Get and validate path from user"""
@@ -20,7 +75,7 @@ class UserConfig(object):  # Explicitly inherit from object
         
     def setup_from_user_input(self):
         # Get search path
-        self.search_path = self._get_valid_path()
+        self.search_paths = [self._get_valid_path()]
         
         # Get output location
         save_location = get_user_input(
@@ -30,7 +85,10 @@ class UserConfig(object):  # Explicitly inherit from object
             "Enter (1/2): ",
             ['1', '2']
         )
-        self.output_dir = os.getcwd() if save_location == '1' else self.search_path
+        self.output_dir = os.path.join(
+            os.getcwd() if save_location == '1' else self.search_paths[0],
+            "metadata_output"
+        )
         
         # Get drift file preference
         self.include_drift = get_user_input(
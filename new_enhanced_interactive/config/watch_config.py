@@ -9,17 +9,38 @@ DEFAULT_CONFIG = {
     "processed_files_log": "processed_files.json",
     "cumulative_csv_path": "",
     "include_drift_files": False,
+    "work_queue_enabled": False,  # Coordinate with other workstations through a shared queue
+    "work_queue_path": "",  # SQLite database on the share, defaults to the watch directory
+    "lease_seconds": 300,
+    "retry_delay": 60,  # Seconds before a failed queued file is retried, doubled after each failure
+    "walk_concurrency": 8,  # Directories listed in parallel when scanning the share
+    "prune_dirs": ["metadata_output", "$recycle.bin", "system volume information", "@eadir", "#recycle"],
+    "progress_interval": 30,  # Seconds between progress, throughput and ETA lines
+    "trace_xradia_calls": False,  # Report calls and time per XradiaPy method for each file
+    "metadata_cache_enabled": False,  # Reuse metadata of files whose content was extracted before
+    "metadata_cache_dir": "",  # Defaults to METADATA_CACHE_DIR or ~/.txrm_metadata_cache
+    "projection_detail": "all",  # "ends" keeps only the first and last projection, with statistics of all
     "github_enabled": False,  # GitHub disabled by default
+    "git_sync_state": "git_sync_state.json",  # Pending GitHub push, kept across restarts
     "github_config": {
         "token": "",
         "repo_owner": "",
         "repo_name": "",
         "branch": "main",
         "repo_path": "",
-        "remote_url": ""
+        "remote_url": "",
+        "layout": "sharded",  # "sharded": append-only monthly CSVs, "snapshot": full CSV copies
+        "sync_engine": "plumbing"  # "plumbing": fetch only when a push is rejected, "porcelain": pull before every push
     }
 }
 
+# Values of settings added later, for configs saved before the setting existed; such installs keep
+# their previous behavior, while newly written configs get the DEFAULT_CONFIG values
+LEGACY_GITHUB_DEFAULTS = {
+    "layout": "snapshot",
+    "sync_engine": "porcelain",
+}
+
 class WatchConfig(object):
     def __init__(self, config_path="watch_config.json"):
         self.config_path = config_path
@@ -46,6 +67,7 @@ class WatchConfig(object):
         # Ensure github_config structure exists
         if 'github_config' in loaded_config:
             config['github_config'] = DEFAULT_CONFIG['github_config'].copy()
+            config['github_config'].update(LEGACY_GITHUB_DEFAULTS)
             config['github_config'].update(loaded_config['github_config'])
         
         return config
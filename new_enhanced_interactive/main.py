@@ -6,9 +6,12 @@ import sys
 
 # Import all required modules at the top level
 from new_enhanced_interactive.config.watch_config import WatchConfig
-from new_enhanced_interactive.utils.file_utils import get_user_input, find_txrm_files
+from new_enhanced_interactive.config.user_config import UserConfig
+from new_enhanced_interactive.utils.file_utils import get_user_input
 from new_enhanced_interactive.utils.file_watcher import TXRMFileWatcher
 from new_enhanced_interactive.processors.txrm_processor import TXRMProcessor
+from new_enhanced_interactive.processors.batch_runner import BatchRunner
+from new_enhanced_interactive.cli import main as cli_main
 
 # Fix module import path if running script directly
 if __name__ == "__main__":
@@ -35,7 +38,7 @@ def _handle_interactive_mode(_):  # Change file_path to _ since it's unused
     
     if process_file == 'q':
         print("\nProcessing stopped by user.")
-        return False
+        return None
     return process_file == 'y'  # Simplified return logic
 
 def setup_watch_config():
@@ -68,13 +71,20 @@ def setup_watch_config():
             ['y', 'n']
         ) == 'y'
         
+        # Coordinate with other workstations watching the same share
+        use_queue = get_user_input(
+            "\nShare work with other workstations watching this directory? (y/n): ",
+            ['y', 'n']
+        ) == 'y'
+        
         # Update config
         config.update_config(
             watch_mode_enabled=True,
             watch_directory=watch_dir,
             polling_interval=interval,
             include_drift_files=include_drift,
-            cumulative_csv_path=os.path.join(watch_dir, "metadata_output")
+            cumulative_csv_path=os.path.join(watch_dir, "metadata_output"),
+            work_queue_enabled=use_queue
         )
         print("\nWatch mode configuration saved!")
     else:
@@ -83,6 +93,10 @@ def setup_watch_config():
     return config
 
 def main():
+    # Any command line arguments select the non-interactive CLI
+    if len(sys.argv) > 1:
+        return cli_main(sys.argv[1:])
+    
     if not check_admin():
         user_input = get_user_input("Continue anyway? (y/n): ", ['y', 'n'])
         if user_input != 'y':
@@ -121,53 +135,19 @@ def main():
         print("Path does not exist!")
         search_path = raw_input("Enter a valid folder path: ").strip('"')
     
-    # Initialize processor
-    processor = TXRMProcessor(output_dir=os.path.join(search_path, "metadata_output"))
-    
-    # Process files
-    include_drift = get_user_input("\nInclude drift files? (y/n): ", ['y', 'n']) == 'y'
-    
-    # Fix: Call find_txrm_files directly instead of as a method of processor
-    txrm_files = find_txrm_files(search_path, include_drift)
-    
-    if not txrm_files:
-        print("\nNo TXRM files found in the specified path.")
-        return
-    
-    process_mode = get_user_input(
+    user_config = UserConfig()
+    user_config.search_paths = [search_path]
+    user_config.include_drift = get_user_input("\nInclude drift files? (y/n): ", ['y', 'n']) == 'y'
+    user_config.process_mode = get_user_input(
         "\nChoose processing mode:\n1. Process all files (batch)\n2. Confirm each file\nEnter (1/2): ",
         ['1', '2']
     )
     
-    processed_count = 0
-    for i, file_path in enumerate(txrm_files, 1):
-        print("\nFile {0} of {1}:".format(i, len(txrm_files)))
-        print(file_path)
-        
-        # Skip drift files if not included
-        if not include_drift and 'drift' in os.path.basename(file_path).lower():
-            print("Skipping drift file (not included in processing)")
-            continue
-            
-        if process_mode == '2':
-            if not _handle_interactive_mode(file_path):
-                break
-        
-        if processor.process_single_file(file_path):
-            processed_count += 1
-    
-    # Generate cumulative CSV file after processing all files
-    if processor.all_metadata:
-        print("\nProcessed {0} files successfully.".format(processed_count))
-        csv_path = processor.save_cumulative_csv()
-        if csv_path:
-            print("\nCumulative CSV file saved to: {0}".format(csv_path))
-        else:
-            print("\nError: Failed to generate cumulative CSV file.")
-    else:
-        print("\nNo metadata was collected. CSV file not generated.")
+    # Same processing as the non-interactive CLI, optionally confirming each file
+    confirm = _handle_interactive_mode if user_config.process_mode == '2' else None
+    BatchRunner(user_config).run(confirm=confirm)
     
     print("\nProcessing complete!")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
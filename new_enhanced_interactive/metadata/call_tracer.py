@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division
+import time
+from collections import OrderedDict
+
+# time.perf_counter does not exist on Python 2.7
+_clock = getattr(time, 'perf_counter', time.time)
+
+
+class CallStats(object):
+    """Number of calls and accumulated seconds per dataset method"""
+
+    def __init__(self):
+        self.methods = OrderedDict()  # method name -> [calls, seconds]
+
+    def add(self, name, seconds):
+        entry = self.methods.get(name)
+        if entry is None:
+            entry = self.methods[name] = [0, 0.0]
+        entry[0] += 1
+        entry[1] += seconds
+
+    def total_calls(self):
+        return sum(calls for calls, _ in self.methods.values())
+
+    def total_seconds(self):
+        return sum(seconds for _, seconds in self.methods.values())
+
+    def by_time(self):
+        """(name, calls, seconds) sorted by time spent, largest first"""
+        return sorted(((name, calls, seconds) for name, (calls, seconds) in self.methods.items()),
+                      key=lambda item: item[2], reverse=True)
+
+    def to_dict(self):
+        return OrderedDict((name, {'calls': calls, 'seconds': seconds})
+                           for name, calls, seconds in self.by_time())
+
+    def summary(self, top=3):
+        """One line: total calls and time, then the most expensive methods"""
+        busiest = ", ".join("{0} {1}x {2:.3f}s".format(name, calls, seconds)
+                            for name, calls, seconds in self.by_time()[:top])
+        return "{0} XradiaPy calls in {1:.3f} s ({2})".format(
+            self.total_calls(), self.total_seconds(), busiest)
+
+    def format_table(self):
+        lines = ["{0:<28} {1:>8} {2:>10} {3:>12}".format('Method', 'Calls', 'Total s', 'Per call ms'),
+                 "-" * 61]
+        for name, calls, seconds in self.by_time():
+            lines.append("{0:<28} {1:>8} {2:>10.4f} {3:>12.4f}".format(
+                name, calls, seconds, seconds / calls * 1000.0))
+        return "\n".join(lines)
+
+
+class TracingDataSet(object):
+    """
+    Proxy around an XrmBasicDataSet that counts calls and time per method
+    in a CallStats. Attribute access is forwarded unchanged, so the proxy
+    can be used wherever the dataset is.
+    """
+
+    def __init__(self, dataset, call_stats):
+        self._dataset = dataset
+        self._call_stats = call_stats
+
+    def __getattr__(self, name):
+        attribute = getattr(self._dataset, name)
+        if not callable(attribute):
+            return attribute
+        call_stats = self._call_stats
+
+        def traced(*args, **kwargs):
+            start = _clock()
+            try:
+                return attribute(*args, **kwargs)
+            finally:
+                call_stats.add(name, _clock() - start)
+
+        # Later lookups find the wrapper directly instead of going through __getattr__
+        self.__dict__[name] = traced
+        return traced
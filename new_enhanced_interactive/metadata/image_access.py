@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division
+import struct
+from collections import OrderedDict
+
+import numpy as np
+
+from new_enhanced_interactive.utils.compound_file import CompoundFile, CompoundFileError
+
+# ImageInfo/DataType values of the XRM formats
+DATA_TYPES = {
+    5: np.dtype('<u2'),  # Unsigned 16 bit
+    10: np.dtype('<f4'),  # 32 bit float
+}
+
+# Projections are stored in storages of 100 images: ImageData1/Image1 to Image100, ImageData2/Image101, ...
+IMAGES_PER_STORAGE = 100
+
+
+def image_stream_name(index):
+    """Stream of the projection with 0-based `index`"""
+    return "ImageData{0}/Image{1}".format(index // IMAGES_PER_STORAGE + 1, index + 1)
+
+
+class TXRMImages(object):
+    """
+    Projection images of a TXRM file as NumPy arrays, without XradiaPy.
+
+    The file is memory-mapped and each projection is a (height, width)
+    view of its stream in the file, so only the pages that are touched are
+    read and nothing is decoded or copied. Streams whose sectors are not
+    contiguous are copied instead; `is_zero_copy` tells which. Strided
+    slices such as `projection(i)[::8, ::8]` stay views, which makes
+    thumbnails and sampled intensity statistics cheap.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = CompoundFile(path)
+        try:
+            self.width = self._info_int('ImageWidth')
+            self.height = self._info_int('ImageHeight')
+            data_type = self._info_int('DataType')
+        except KeyError as e:
+            self.file.close()
+            raise CompoundFileError("{0} has no image information: {1}".format(path, e))
+        if data_type not in DATA_TYPES:
+            self.file.close()
+            raise CompoundFileError("Unsupported image data type {0} in {1}".format(data_type, path))
+        self.dtype = DATA_TYPES[data_type]
+        self.count = self._count_images()
+
+    def _info_int(self, name):
+        return struct.unpack('<I', self.file.read('ImageInfo/' + name)[:4])[0]
+
+    def _count_images(self):
+        """Number of image streams present; the ImageInfo counts include images that were not taken"""
+        count = 0
+        while self.file.exists(image_stream_name(count)):
+            count += 1
+        return count
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for index in range(self.count):
+            yield self.projection(index)
+
+    def _check_index(self, index):
+        if not 0 <= index < self.count:
+            raise IndexError("Projection {0} out of range, {1} has {2}".format(index, self.path, self.count))
+
+    def projection(self, index):
+        """Read-only (height, width) array of a projection, a view of the file where possible"""
+        self._check_index(index)
+        return self.file.view(image_stream_name(index), self.dtype, (self.height, self.width))
+
+    def is_zero_copy(self, index):
+        """True if `projection(index)` shares memory with the file"""
+        self._check_index(index)
+        return self.file.is_contiguous(image_stream_name(index))
+
+    def thumbnail(self, index, step=8):
+        """Every `step`-th pixel of every `step`-th row, still a view"""
+        return self.projection(index)[::step, ::step]
+
+    def intensity_stats(self, index, step=1):
+        """Min, max, mean and standard deviation of a projection, from every `step`-th pixel"""
+        pixels = self.thumbnail(index, step) if step > 1 else self.projection(index)
+        return OrderedDict([
+            ('min', pixels.min().item()),
+            ('max', pixels.max().item()),
+            ('mean', float(pixels.mean(dtype=np.float64))),
+            ('std', float(pixels.std(dtype=np.float64))),
+        ])
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+import copy
+
+# Methods whose results only depend on the file and their arguments
+CACHED_PREFIXES = ('Get', 'Is')
+
+
+class MemoizingDataSet(object):
+    """
+    Dataset that remembers getter results until the next file is read.
+
+    A new dataset is created with `dataset_factory()` for every file.
+    ReadFile of the path that is already loaded does nothing, so the
+    extractor and the config converter can share one instance and the file
+    is read once. Get* and Is* results are cached per method and arguments;
+    other methods are passed through. Call `reset` when a file may have
+    changed on disk since it was read.
+    """
+
+    def __init__(self, dataset_factory):
+        self._dataset_factory = dataset_factory
+        self._dataset = None
+        self._path = None
+        self._results = {}
+
+    def reset(self):
+        """Forget the loaded file, the next ReadFile reads it again"""
+        self._dataset = None
+        self._path = None
+        self._results = {}
+
+    def uncached(self):
+        """The dataset of the loaded file itself, for bulk calls whose results are only used once"""
+        return self._current()
+
+    def ReadFile(self, path):
+        if self._dataset is not None and path == self._path:
+            return
+        self.reset()
+        self._dataset = self._dataset_factory()
+        self._dataset.ReadFile(path)
+        self._path = path
+
+    def _current(self):
+        if self._dataset is None:
+            # Getters before any ReadFile go to an empty dataset, like with XradiaPy
+            self._dataset = self._dataset_factory()
+        return self._dataset
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        if not callable(getattr(self._current(), name)):
+            return getattr(self._current(), name)
+        if not name.startswith(CACHED_PREFIXES):
+            return lambda *args, **kwargs: getattr(self._current(), name)(*args, **kwargs)
+
+        def cached(*args):
+            key = (name,) + args
+            try:
+                result = self._results[key]
+            except KeyError:
+                result = self._results[key] = getattr(self._current(), name)(*args)
+            except TypeError:  # Unhashable arguments
+                return getattr(self._current(), name)(*args)
+            # Callers may modify lists and dicts they get back
+            return copy.copy(result) if isinstance(result, (list, dict)) else result
+
+        # Later lookups find the wrapper directly instead of going through __getattr__
+        self.__dict__[name] = cached
+        return cached
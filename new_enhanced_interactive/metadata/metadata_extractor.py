@@ -1,8 +1,29 @@
-from XradiaPy import Data
+from new_enhanced_interactive.metadata.call_tracer import TracingDataSet
+from new_enhanced_interactive.metadata.memoizing_dataset import MemoizingDataSet
+from new_enhanced_interactive.metadata.xradia_backend import create_dataset
+from new_enhanced_interactive.utils.date_engine import DateEngine
+from new_enhanced_interactive.utils.running_stats import ColumnStats
+from new_enhanced_interactive.utils.stage_timer import StageTimer
+
+# 'all' keeps every projection in projection_data, 'ends' only the first and the last
+PROJECTION_DETAILS = ('all', 'ends')
 
 class MetadataExtractor(object):
     def __init__(self):
-        self.dataset = Data.XRMData.XrmBasicDataSet()
+        self.dataset = create_dataset()
+        self.call_stats = None  # CallStats to trace dataset calls into, None to not trace
+        self.shared_dataset = None  # MemoizingDataSet shared with other components, used instead of new datasets
+        self.projection_detail = 'all'  # One of PROJECTION_DETAILS; statistics always cover every projection read
+        self.sampling = None  # ProjectionSampling of the projections to read, None to read all of them
+        self.date_engine = None  # DateEngine to find sampling time windows, created when needed
+
+    def _new_dataset(self):
+        if self.shared_dataset is not None:
+            return self.shared_dataset
+        dataset = create_dataset()
+        if self.call_stats is not None:
+            dataset = TracingDataSet(dataset, self.call_stats)
+        return dataset
 
     def get_basic_info(self):
         return {
@@ -45,57 +66,123 @@ class MetadataExtractor(object):
             print("Error getting images per projection: {0}".format(str(e)))
             return 1  # Default to 1 if the function fails
 
-    def get_axis_positions(self, projection_idx):
+    def get_axis_positions(self, projection_idx, dataset=None, axis_names=None):
+        dataset = dataset or self.dataset
         axis_data = {}
-        axis_names = self.dataset.GetAxesNames()
+        if axis_names is None:
+            axis_names = dataset.GetAxesNames()
         for axis in axis_names:
-            pos = self.dataset.GetAxisPosition(projection_idx, axis)
+            pos = dataset.GetAxisPosition(projection_idx, axis)
             axis_data["{0}_pos".format(axis.replace(" ", "_"))] = pos
         return axis_data
 
-    def get_projection_data(self, projection_idx):
+    def get_projection_data(self, projection_idx, dataset=None, axis_names=None):
+        dataset = dataset or self.dataset
         proj_data = {
             'projection_number': projection_idx,
-            'date': self.dataset.GetDate(projection_idx),
-            'detector_to_ra_distance': self.dataset.GetDetectorToRADistance(projection_idx),
-            'source_to_ra_distance': self.dataset.GetSourceToRADistance(projection_idx),
-            'exposure': self.dataset.GetExposure(projection_idx)
+            'date': dataset.GetDate(projection_idx),
+            'detector_to_ra_distance': dataset.GetDetectorToRADistance(projection_idx),
+            'source_to_ra_distance': dataset.GetSourceToRADistance(projection_idx),
+            'exposure': dataset.GetExposure(projection_idx)
         }
-        proj_data.update(self.get_axis_positions(projection_idx))
+        proj_data.update(self.get_axis_positions(projection_idx, dataset, axis_names))
         return proj_data
 
-    def get_complete_metadata(self, file_path):
-        """Extract all metadata from a TXRM file"""
+    def satisfies(self, metadata):
+        """Whether a record, e.g. from the cache, has the projection detail this extractor would extract"""
+        detail = metadata.get('projection_detail', 'all')
+        sampling = metadata.get('projection_sampling')
+        if sampling and (self.sampling is None or sampling.get('selection') != self.sampling.describe()):
+            return False
+        return detail == 'all' or detail == self.projection_detail
+
+    def _seconds_since_first(self, dataset, num_projections):
+        """Function of a projection index to its seconds since projection 0, None if a date does not parse"""
+        if self.date_engine is None:
+            self.date_engine = DateEngine()
+        parse = self.date_engine.parse
+        # The first and last date settle day-first or month-first once for the whole file
+        first_and_last = [dataset.GetDate(0), dataset.GetDate(num_projections - 1)]
+        start = parse(first_and_last[0], first_and_last)
+
+        def seconds_at(index):
+            when = parse(dataset.GetDate(index), first_and_last)
+            return (when - start).total_seconds() if when is not None and start is not None else None
+        return seconds_at
+
+    def select_projections(self, num_projections, dataset=None):
+        """Indices of the projections to read with the current sampling"""
+        if self.sampling is None or self.sampling.is_full:
+            return list(range(num_projections))
+        seconds_at = None
+        if self.sampling.windows:
+            seconds_at = self._seconds_since_first(dataset or self.dataset, num_projections)
+        return self.sampling.select(num_projections, seconds_at)
+
+    def get_complete_metadata(self, file_path, timer=None):
+        """
+        Extract all metadata from a TXRM file. Time spent reading the file,
+        in the header getters and in the projection loop is added to `timer`.
+        """
+        timer = timer or StageTimer()
         try:
             # Ensure file_path is a proper string and normalize path separators
             file_path = str(file_path).replace('\\', '/')
             
             # Reset the dataset before reading a new file
-            self.dataset = Data.XRMData.XrmBasicDataSet()
+            self.dataset = self._new_dataset()
             
             # Read the file
-            self.dataset.ReadFile(file_path)
+            with timer.stage('read_file'):
+                self.dataset.ReadFile(file_path)
             
             if not self.dataset.IsInitializedCorrectly():
                 print("File was not initialized correctly: {}".format(file_path))
                 return None
             
             metadata = {}
-            metadata['basic_info'] = self.get_basic_info()
-            metadata['machine_settings'] = self.get_machine_settings()
-            metadata['image_properties'] = self.get_image_properties()
-            
-            # Get detector-specific information for flat panel detectors
-            metadata['detector_info'] = {
-                'images_per_projection': self.get_images_per_projection()
-            }
+            with timer.stage('header'):
+                metadata['basic_info'] = self.get_basic_info()
+                metadata['machine_settings'] = self.get_machine_settings()
+                metadata['image_properties'] = self.get_image_properties()
+                
+                # Get detector-specific information for flat panel detectors
+                metadata['detector_info'] = {
+                    'images_per_projection': self.get_images_per_projection()
+                }
             
-            # Extract data for each projection
+            # Extract data for each projection, with statistics of every numeric field
             metadata['projection_data'] = []
-            num_projections = self.dataset.GetProjections()
-            for idx in range(num_projections):
-                proj_data = self.get_projection_data(idx)
-                metadata['projection_data'].append(proj_data)
+            stats = ColumnStats(skip=('projection_number',))
+            keep_all = self.projection_detail == 'all'
+            with timer.stage('projections'):
+                num_projections = self.dataset.GetProjections()
+                axis_names = self.dataset.GetAxesNames()
+                # Per-projection results are used once, caching them would hold every projection in memory
+                dataset = self.dataset
+                if not keep_all and isinstance(dataset, MemoizingDataSet):
+                    dataset = dataset.uncached()
+                indices = self.select_projections(num_projections)
+                last = None
+                for idx in indices:
+                    proj_data = self.get_projection_data(idx, dataset, axis_names)
+                    stats.add(proj_data, idx)
+                    if keep_all or not metadata['projection_data']:
+                        metadata['projection_data'].append(proj_data)
+                    else:
+                        last = proj_data
+                if last is not None:
+                    metadata['projection_data'].append(last)
+            metadata['projection_detail'] = self.projection_detail
+            metadata['projection_stats'] = stats.summary()
+            # Statistics of a sample are marked as such
+            metadata['projection_sampling'] = None
+            if len(indices) < num_projections:
+                metadata['projection_sampling'] = {
+                    'selection': self.sampling.describe(),
+                    'projections_read': len(indices),
+                    'total_projections': num_projections,
+                }
             
             return metadata
         except Exception as e:
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division
+
+
+def parse_indices(value):
+    """
+    Parse an index list such as 'first,last,every:100,250,-2' into
+    (indices, every). Negative indices count from the last projection.
+    """
+    indices, every = [], None
+    for item in value.split(','):
+        item = item.strip().lower()
+        if not item:
+            continue
+        if item == 'first':
+            indices.append(0)
+        elif item == 'last':
+            indices.append(-1)
+        elif item.startswith('every:'):
+            try:
+                every = int(item.split(':', 1)[1])
+            except ValueError:
+                every = 0
+            if every < 1:
+                raise ValueError("every:K needs a whole number K >= 1, got '{0}'".format(item))
+        else:
+            try:
+                indices.append(int(item))
+            except ValueError:
+                raise ValueError("Unknown projection index '{0}', use numbers, first, last or every:K".format(item))
+    return indices, every
+
+
+def parse_window(value):
+    """Parse 'START:END' in seconds since the first projection; END may be empty for the rest of the scan"""
+    start, _, end = value.partition(':')
+    start = float(start) if start.strip() else 0.0
+    end = float(end) if end.strip() else None
+    if end is not None and end < start:
+        raise ValueError("Window end {0} is before its start {1}".format(end, start))
+    return start, end
+
+
+class ProjectionSampling(object):
+    """
+    Which projections the extractor reads: every `stride`-th projection,
+    explicit `indices` (with `every` for every k-th as well), and/or
+    `windows` of (start, end) seconds since the first projection. The
+    selections are combined. The first and last projection are always
+    read, so start and end times and axis ranges stay exact. Windows are
+    found by bisecting the projection dates, which assumes they increase.
+    """
+
+    def __init__(self, stride=1, indices=None, every=None, windows=None):
+        self.stride = max(1, int(stride or 1))
+        self.indices = list(indices or [])
+        self.every = every
+        self.windows = list(windows or [])
+
+    @property
+    def is_full(self):
+        """True if every projection is read"""
+        return self.stride == 1 and not self.indices and not self.every and not self.windows
+
+    def describe(self):
+        """Short text of the selection, stored with sampled records"""
+        parts = []
+        if self.stride > 1:
+            parts.append("stride={0}".format(self.stride))
+        if self.indices or self.every:
+            items = [str(i) for i in self.indices] + (["every:{0}".format(self.every)] if self.every else [])
+            parts.append("indices={0}".format(','.join(items)))
+        for start, end in self.windows:
+            parts.append("window={0:g}:{1}".format(start, '' if end is None else '{0:g}'.format(end)))
+        return ' '.join(parts) or 'all'
+
+    def select(self, num_projections, seconds_at=None):
+        """
+        Sorted projection indices to read. `seconds_at(index)` returns the
+        seconds since the first projection, None if the date does not parse;
+        it is needed for windows only.
+        """
+        if num_projections <= 0:
+            return []
+        if self.is_full:
+            return list(range(num_projections))
+        last = num_projections - 1
+        selected = set([0, last])
+        if self.stride > 1:
+            selected.update(range(0, num_projections, self.stride))
+        for index in self.indices:
+            if -num_projections <= index < num_projections:
+                selected.add(index % num_projections)
+        if self.every:
+            selected.update(range(0, num_projections, self.every))
+        for start, end in self.windows:
+            if seconds_at is None:
+                continue
+            first = self._bisect(num_projections, start, seconds_at)
+            stop = self._bisect(num_projections, end, seconds_at, after=True) if end is not None \
+                else num_projections
+            selected.update(range(first, stop))
+        return sorted(selected)
+
+    @staticmethod
+    def _bisect(num_projections, seconds, seconds_at, after=False):
+        """First index at or after `seconds` (after it with `after`); unparsable dates count as later"""
+        low, high = 0, num_projections
+        while low < high:
+            middle = (low + high) // 2
+            value = seconds_at(middle)
+            if value is not None and (value <= seconds if after else value < seconds):
+                low = middle + 1
+            else:
+                high = middle
+        return low
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+
+# XradiaPy only exists on the instrument PCs. It is imported when available,
+# and another dataset factory (e.g. a synthetic dataset for benchmarks) can
+# be installed with set_dataset_factory.
+try:
+    from XradiaPy import Data
+except ImportError:
+    Data = None
+
+_dataset_factory = None
+
+
+def set_dataset_factory(factory):
+    """Create datasets with `factory()` from now on; None restores XradiaPy"""
+    global _dataset_factory
+    _dataset_factory = factory
+
+
+def xradia_available():
+    return Data is not None
+
+
+def create_dataset():
+    """Return a new, empty XrmBasicDataSet"""
+    if _dataset_factory is not None:
+        return _dataset_factory()
+    if Data is None:
+        raise ImportError("XradiaPy is not available. Add the Xradia Python directory to PYTHONPATH "
+                          "or install a dataset factory with set_dataset_factory().")
+    return Data.XRMData.XrmBasicDataSet()
@@ -1,4 +1,5 @@
 """Package initialization."""
 from new_enhanced_interactive.processors.txrm_processor import TXRMProcessor
+from new_enhanced_interactive.processors.batch_runner import BatchRunner
 
-__all__ = ['TXRMProcessor'] 
\ No newline at end of file
+__all__ = ['TXRMProcessor', 'BatchRunner'] 
\ No newline at end of file
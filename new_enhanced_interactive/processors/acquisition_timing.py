@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division
+from collections import OrderedDict
+
+import numpy as np
+
+# Summary fields of one scan, in CSV order; the cumulative CSV prefixes them with 'timing_'
+TIMING_FIELDS = (
+    'dated_projections',  # Projections whose date parsed
+    'interval_median_s',  # Time between consecutive projections
+    'interval_p95_s',
+    'interval_max_s',  # Longest gap
+    'exposure_median_s',  # Exposure times images per projection
+    'overhead_median_s',  # Interval minus exposure: readout, stage moves and software
+    'duty_cycle',  # Share of the scan spent exposing
+    'stall_count',  # Intervals far above the median
+    'stall_time_s',  # Time lost in stalls beyond the median interval
+    'backward_steps',  # Dates earlier than the projection before them
+    'projections_per_hour',
+)
+
+
+def _float_array(values):
+    """float64 array of raw values, NaN where a value is not a number"""
+    try:
+        return np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        result = np.full(len(values), np.nan)
+        for i, value in enumerate(values):
+            try:
+                result[i] = float(value)
+            except (TypeError, ValueError):
+                pass
+        return result
+
+
+class AcquisitionTiming(object):
+    """
+    Instrument efficiency of a scan from the date and exposure of every
+    projection, all computed on arrays. An interval is the time from one
+    dated projection to the next; it is a stall when it is more than
+    `stall_factor` times the median interval and at least
+    `min_stall_seconds` longer than it. In sampled records an interval
+    spanning skipped projections is spread evenly over them. Records that
+    only kept the first and last projection get the throughput alone.
+    """
+
+    def __init__(self, date_engine, stall_factor=3.0, min_stall_seconds=5.0):
+        self.date_engine = date_engine
+        self.stall_factor = stall_factor
+        self.min_stall_seconds = min_stall_seconds
+
+    def analyze(self, metadata):
+        """OrderedDict of TIMING_FIELDS for one metadata record, None for fields that cannot be computed"""
+        result = OrderedDict((field, None) for field in TIMING_FIELDS)
+        projections = metadata.get('projection_data') or []
+        microseconds, valid = self.date_engine.to_microseconds([p.get('date') for p in projections])
+        result['dated_projections'] = int(valid.sum())
+        if result['dated_projections'] < 2:
+            return result
+        if metadata.get('projection_detail', 'all') != 'all':
+            span = (microseconds[valid][-1] - microseconds[valid][0]) / 1e6
+            total = _float_array([(metadata.get('image_properties') or {}).get('total_projections')])[0]
+            if span > 0 and total > 1:
+                result['projections_per_hour'] = round(float((total - 1) / span * 3600), 1)
+            return result
+
+        averaging = _float_array([(metadata.get('detector_info') or {}).get('images_per_projection', 1)])[0]
+        if not averaging > 0:
+            averaging = 1.0
+        exposures = _float_array([p.get('exposure') for p in projections])[valid] * averaging
+        intervals = np.diff(microseconds[valid]) / 1e6
+        # Exposure of the projection that starts each interval
+        exposures = exposures[:-1]
+        # Projections each interval spans, more than one where a sample skipped some
+        steps = np.diff(_float_array([p.get('projection_number') for p in projections])[valid])
+        if not (np.isfinite(steps).all() and (steps > 0).all()):
+            steps = np.ones(len(intervals))
+        span = float(intervals.sum())
+        intervals = intervals / steps
+
+        median = float(np.median(intervals))
+        result['interval_median_s'] = round(median, 3)
+        result['interval_p95_s'] = round(float(np.percentile(intervals, 95)), 3)
+        result['interval_max_s'] = round(float(intervals.max()), 3)
+        result['backward_steps'] = int((intervals < 0).sum())
+
+        stalls = intervals > max(self.stall_factor * median, median + self.min_stall_seconds)
+        result['stall_count'] = int(stalls.sum())
+        result['stall_time_s'] = round(float(((intervals[stalls] - median) * steps[stalls]).sum()), 3)
+
+        if span > 0:
+            result['projections_per_hour'] = round(float(steps.sum()) / span * 3600, 1)
+
+        known = ~np.isnan(exposures)
+        if known.any():
+            result['exposure_median_s'] = round(float(np.median(exposures[known])), 3)
+            result['overhead_median_s'] = round(float(np.median(intervals[known] - exposures[known])), 3)
+            exposed_span = float(intervals[known].sum())
+            if exposed_span > 0:
+                result['duty_cycle'] = round(float(exposures[known].sum()) / exposed_span, 3)
+        return result
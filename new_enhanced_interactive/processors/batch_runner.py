@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import json
+import multiprocessing
+import os
+
+from new_enhanced_interactive.processors.txrm_processor import TXRMProcessor
+from new_enhanced_interactive.utils.metadata_cache import MetadataCache
+from new_enhanced_interactive.utils.file_utils import DiscoverySummary, file_size, iter_txrm_files, matches_patterns
+from new_enhanced_interactive.utils.progress_tracker import ProgressTracker, SNAPSHOT_FILE_NAME
+from new_enhanced_interactive.utils.sharding import in_shard, shard_output_name
+from new_enhanced_interactive.utils.stage_timer import StageReport, StageTimer
+
+RECORDS_FILE_NAME = "metadata_records.jsonl"
+
+# Processor owned by each worker process of the pool
+_worker_processor = None
+
+
+def _init_worker(output_dir, output_formats, trace_calls, cache_dir, projection_detail, sampling):
+    global _worker_processor
+    _worker_processor = BatchRunner.create_processor(output_dir, output_formats, trace_calls, cache_dir,
+                                                     projection_detail, sampling)
+
+
+def _process_in_worker(file_path):
+    """Process one file in a worker process and hand its metadata and stage timings back"""
+    if not _worker_processor.process_single_file(file_path):
+        return file_path, None, _worker_processor.last_timer
+    return file_path, _worker_processor.all_metadata.pop(), _worker_processor.last_timer
+
+
+class BatchRunner(object):
+    """
+    Non-interactive batch processing driven by a UserConfig.
+
+    Used by the command line interface and, with a per-file confirmation
+    callback, by the interactive manual mode. Every processed file is
+    appended to a JSON-lines record file in the output directory so an
+    interrupted run can be resumed without re-extracting finished files.
+    """
+
+    def __init__(self, user_config):
+        self.user_config = user_config
+        self.output_dir = user_config.get_output_dir()
+        self.processor = self.create_processor(self.output_dir, user_config.output_formats,
+                                               user_config.trace_calls, user_config.cache_dir,
+                                               user_config.projection_detail, user_config.sampling)
+        self.processed_count = 0
+        self.failed_count = 0
+        self.cached_count = 0
+        self.selected_count = 0
+        self.discovery_summaries = []
+        self.stage_report = StageReport()
+        self.progress = ProgressTracker(report_interval=user_config.progress_interval)
+        self._done_paths = set()
+        self._records_file = None
+
+    @staticmethod
+    def create_processor(output_dir, output_formats, trace_calls=False, cache_dir=None, projection_detail='all',
+                         sampling=None):
+        """
+        Create a processor that writes the sidecar files selected in
+        `output_formats`, reuses the metadata cached in `cache_dir`, reads
+        the projections selected by `sampling` and keeps those selected by
+        `projection_detail`.
+        """
+        processor = TXRMProcessor(output_dir=output_dir)
+        processor.write_metadata_txt = 'txt' in output_formats
+        processor.write_config_file = 'config' in output_formats
+        processor.trace_calls = trace_calls
+        processor.metadata_extractor.projection_detail = projection_detail
+        processor.metadata_extractor.sampling = sampling
+        if cache_dir:
+            processor.metadata_cache = MetadataCache(cache_dir)
+        return processor
+
+    def _output_name(self, extension):
+        """Fixed output name for shards, None for the default timestamped name"""
+        if self.user_config.shard:
+            index, count = self.user_config.shard
+            return shard_output_name(index, count, extension)
+        return None
+
+    @property
+    def records_path(self):
+        name = RECORDS_FILE_NAME
+        if self.user_config.shard:
+            name = "metadata_records_shard_{0}_of_{1}.jsonl".format(*self.user_config.shard)
+        return os.path.join(self.output_dir, name)
+
+    @property
+    def histograms_path(self):
+        name = SNAPSHOT_FILE_NAME
+        if self.user_config.shard:
+            name = "latency_histograms_shard_{0}_of_{1}.json".format(*self.user_config.shard)
+        return os.path.join(self.output_dir, name)
+
+    def _load_records(self):
+        """Load metadata of files finished by a previous run"""
+        if not os.path.exists(self.records_path):
+            return
+        with open(self.records_path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Last line of an interrupted run may be incomplete
+                    continue
+                self.processor.all_metadata.append(record)
+                self._done_paths.add(record.get('file_path'))
+        print("\nResuming: {0} files already processed".format(len(self._done_paths)))
+
+    def _append_record(self, metadata):
+        self._records_file.write(json.dumps(metadata, default=str) + '\n')
+        self._records_file.flush()
+
+    def _record_result(self, file_path, metadata, timer):
+        if timer is not None:
+            self.stage_report.add(timer.timings, timer.bytes_read)
+        self.progress.record_processed(file_path, metadata, timer)
+        self.progress.print_progress()
+        if metadata is None:
+            self.failed_count += 1
+            return
+        self.processed_count += 1
+        if timer is not None and 'cache_lookup' in timer.timings and 'read_file' not in timer.timings:
+            self.cached_count += 1
+        self._done_paths.add(file_path)
+        self._append_record(metadata)
+
+    def iter_files(self):
+        """
+        Yield the files selected by search paths, patterns, shard and resume
+        state while the directory trees are still being walked.
+        """
+        index, count = self.user_config.shard or (0, 1)
+        for root in self.user_config.search_paths:
+            print("\nSearching for .txrm files in: {0}".format(root))
+            summary = DiscoverySummary(root, self.user_config.include_drift)
+            self.discovery_summaries.append(summary)
+            files = iter_txrm_files(root, self.user_config.include_drift, summary,
+                                    self.user_config.walk_concurrency, self.user_config.prune_dirs)
+            for file_path in files:
+                if not matches_patterns(file_path, root,
+                                        self.user_config.include_patterns,
+                                        self.user_config.exclude_patterns):
+                    continue
+                if not in_shard(file_path, root, index, count):
+                    continue
+                if file_path in self._done_paths:
+                    continue
+                self.selected_count += 1
+                self.progress.add_file(file_path, file_size(file_path))
+                yield file_path
+
+    def _run_serial(self, txrm_files, confirm):
+        for i, file_path in enumerate(txrm_files, 1):
+            print("\nFile {0}:".format(i))
+            print(file_path)
+
+            if confirm is not None:
+                decision = confirm(file_path)
+                if decision is None:
+                    break
+                if not decision:
+                    self.progress.discard_file(file_path)
+                    continue
+
+            if self.processor.process_single_file(file_path):
+                self._record_result(file_path, self.processor.all_metadata[-1], self.processor.last_timer)
+            else:
+                self._record_result(file_path, None, self.processor.last_timer)
+
+    def _run_parallel(self, txrm_files):
+        workers = self.user_config.workers
+        print("\nProcessing files with {0} worker processes".format(workers))
+        pool = multiprocessing.Pool(
+            workers,
+            initializer=_init_worker,
+            initargs=(self.output_dir, self.user_config.output_formats, self.user_config.trace_calls,
+                      self.user_config.cache_dir, self.user_config.projection_detail, self.user_config.sampling)
+        )
+        try:
+            for file_path, metadata, timer in pool.imap_unordered(_process_in_worker, txrm_files):
+                if metadata is not None:
+                    self.processor.all_metadata.append(metadata)
+                self._record_result(file_path, metadata, timer)
+        finally:
+            pool.close()
+            pool.join()
+
+    def save_outputs(self):
+        """Write the cumulative outputs. Returns False if any of them failed."""
+        if not self.processor.all_metadata:
+            print("\nNo metadata was collected. Output files not generated.")
+            return True
+
+        success = True
+        timer = StageTimer()
+        if 'csv' in self.user_config.output_formats:
+            with timer.stage('cumulative_csv'):
+                csv_path = self.processor.save_cumulative_csv(self._output_name('csv'))
+            if not csv_path:
+                print("\nError: Failed to generate cumulative CSV file.")
+                success = False
+        if 'json' in self.user_config.output_formats:
+            with timer.stage('cumulative_json'):
+                saved = self.processor.save_cumulative_json(self._output_name('json'))
+            if not saved:
+                print("\nError: Failed to generate cumulative JSON file.")
+                success = False
+        if 'drift' in self.user_config.output_formats:
+            name = self._output_name('csv')
+            with timer.stage('drift_report'):
+                saved = self.processor.save_drift_report('drift_' + name if name else None)
+            if not saved:
+                print("\nError: Failed to generate drift report.")
+                success = False
+        self.stage_report.add(timer.timings, count_file=False)
+        return success
+
+    def print_latency_report(self):
+        """Print latency percentiles and save the histograms next to the outputs"""
+        if not self.progress.histograms:
+            return
+        print("\nLatency percentiles:")
+        print(self.progress.format_percentiles())
+        if self.progress.save_snapshot(self.histograms_path):
+            print("Latency histograms saved to: {0}".format(self.histograms_path))
+
+    def run(self, confirm=None):
+        """
+        Process all selected files and write the cumulative outputs.
+
+        `confirm` is called with each file path before it is processed;
+        returning False skips the file and None stops the run. Files are
+        processed in parallel when more than one worker is configured and
+        no confirmation is requested. Returns True if every file and output
+        succeeded.
+        """
+        if not os.path.exists(self.output_dir):
+            os.makedirs(self.output_dir)
+        if self.user_config.resume:
+            self._load_records()
+
+        # Files are processed while discovery is still walking the trees
+        self._records_file = open(self.records_path, 'a' if self.user_config.resume else 'w')
+        try:
+            if self.user_config.workers > 1 and confirm is None:
+                self._run_parallel(self.iter_files())
+            else:
+                self._run_serial(self.iter_files(), confirm)
+        finally:
+            self._records_file.close()
+
+        for summary in self.discovery_summaries:
+            if summary.complete:
+                summary.print_summary()
+        if not self.selected_count and not self.processor.all_metadata:
+            print("\nNo TXRM files found in the specified path.")
+            return True
+
+        print("\nProcessed {0} files successfully, {1} failed.".format(
+            self.processed_count, self.failed_count))
+        if self.cached_count:
+            print("{0} files reused cached metadata from: {1}".format(self.cached_count, self.user_config.cache_dir))
+        self.progress.print_progress(force=True)
+        success = self.save_outputs()
+        self.stage_report.print_report()
+        self.print_latency_report()
+        return success and self.failed_count == 0
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+
+# (display name, metadata key) of the axes exported with start, end and range columns, in CSV order
+EXPORTED_AXES = (
+    ('Sample X', 'Sample_X_pos'),
+    ('Sample Y', 'Sample_Y_pos'),
+    ('Sample Z', 'Sample_Z_pos'),
+    ('Sample Theta', 'Sample_Theta_pos'),
+    ('Source X', 'Source_X_pos'),
+    ('Source Z', 'Source_Z_pos'),
+    ('Flat Panel Z', 'Flat_Panel_Z_pos'),
+    ('Flat Panel X', 'Flat_Panel_X_pos'),
+    ('Detector Z', 'Detector_Z_pos'),
+    ('CCD Z', 'CCD_Z_pos'),
+    ('CCD X', 'CCD_X_pos'),
+    ('MkIV Filter Wheel', 'MkIV_Filter_Wheel_pos'),
+    ('DCT', 'DCT_pos'),
+)
+
+
+def axis_column_names(display_name):
+    """Names of the start, end and range columns of an axis"""
+    safe_name = display_name.lower().replace(' ', '_')
+    return tuple('{0}_{1}'.format(safe_name, part) for part in ('start', 'end', 'range'))
+
+
+# Types whose float() numpy reproduces exactly in one array conversion
+_PLAIN_NUMBERS = (float, int, bool, np.float64)
+
+
+class _FloatColumn(object):
+    """float() of raw values as a float64 array, with masks of the values that failed"""
+
+    def __init__(self, raw):
+        size = len(raw)
+        if set(map(type, raw)).issubset(_PLAIN_NUMBERS):
+            self.values = np.array(raw, dtype=np.float64)
+            self.ok = np.ones(size, dtype=bool)
+            self.type_error = np.zeros(size, dtype=bool)
+            return
+        self.values = np.zeros(size, dtype=np.float64)
+        self.ok = np.zeros(size, dtype=bool)
+        self.type_error = np.zeros(size, dtype=bool)  # float() raised TypeError rather than ValueError
+        for i, value in enumerate(raw):
+            if value is None:  # Missing; neither a number nor an error
+                continue
+            try:
+                self.values[i] = float(value)
+                self.ok[i] = True
+            except TypeError:
+                self.type_error[i] = True
+            except ValueError:
+                pass
+
+
+def _format_unique(values, mask, format_value, fallback):
+    """
+    format_value(value) where mask is set, `fallback` elsewhere. Catalogs
+    repeat the same settings and positions, so each distinct value is only
+    formatted once; values are told apart by their bits to keep -0.0.
+    """
+    bits, inverse = np.unique(values.view(np.int64), return_inverse=True)
+    text = np.array([format_value(value) for value in bits.view(np.float64).tolist()] + [fallback], dtype=object)
+    inverse[~mask] = len(bits)
+    return text[inverse].tolist()
+
+
+def _rounded(values, mask):
+    """str(round(value, 2)) where mask is set, '' elsewhere; rounded by Python to keep its output"""
+    return _format_unique(values, mask, lambda value: str(round(value, 2)), '')
+
+
+def _fixed(values, mask, fallback):
+    """'{0:.6f}' formatting where mask is set, `fallback` elsewhere"""
+    return _format_unique(values, mask, '{0:.6f}'.format, fallback)
+
+
+class DerivedColumns(object):
+    """
+    Computes the derived CSV columns of many metadata records at once:
+    X-ray power and current, real image size, scan time and the start, end
+    and range of every exported axis. Raw values are gathered column by
+    column into arrays and the arithmetic runs on whole columns. The text
+    is the same as the per-record calculations wrote, including the empty
+    or '0.0' values for missing or broken fields.
+    """
+
+    def __init__(self, date_engine, logger=None):
+        self.date_engine = date_engine
+        self.logger = logger
+
+    def compute(self, records):
+        """Column name -> list of strings, one per record"""
+        settings = [metadata.get('machine_settings') or {} for metadata in records]
+        images = [metadata.get('image_properties') or {} for metadata in records]
+        projections = [metadata.get('projection_data') for metadata in records]
+        has_projections = np.array([bool(data) for data in projections], dtype=bool)
+        firsts = [data[0] if data else {} for data in projections]
+        lasts = [data[-1] if data else {} for data in projections]
+
+        stored_power = [None if value is None or value == '' else str(value)  # str(power) where the record has one
+                        for value in (s.get('power') for s in settings)]
+        voltage = _FloatColumn([s.get('voltage', 0) for s in settings])
+        current = _FloatColumn([s.get('current', 0) for s in settings])
+        power = _FloatColumn([s.get('power', 0) for s in settings])
+        width = _FloatColumn([image.get('width', 0) for image in images])
+        height = _FloatColumn([image.get('height', 0) for image in images])
+        pixel_size = _FloatColumn([s.get('pixel_size', 0) for s in settings])
+        starts = [first.get('date') for first in firsts]
+        ends = [last.get('date') for last in lasts]
+        axis_columns = [(_FloatColumn([first.get(name) for first in firsts]),
+                         _FloatColumn([last.get(name) for last in lasts]),
+                         _FloatColumn([first.get(name, 0) for first in firsts]),
+                         _FloatColumn([last.get(name, 0) for last in lasts]))
+                        for _, name in EXPORTED_AXES]
+
+        columns = OrderedDict()
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            columns['xray_tube_power'] = self._power(stored_power, voltage, current)
+            # Current from power and voltage, as before
+            columns['xray_tube_current'] = _rounded(
+                power.values / voltage.values * 100, power.ok & voltage.ok & (voltage.values > 0))
+            fixed_pixel_size = self._fix_pixel_size(pixel_size)
+            for name, pixels in (('image_width_real', width), ('image_height_real', height)):
+                columns[name] = _rounded(pixels.values * fixed_pixel_size, pixels.ok & pixel_size.ok
+                                         & (pixels.values > 0) & (fixed_pixel_size > 0))
+            columns['scan_time'] = self._scan_time(starts, ends, has_projections)
+            for (display_name, _), (start, end, range_start, range_end) in zip(EXPORTED_AXES, axis_columns):
+                start_name, end_name, range_name = axis_column_names(display_name)
+                columns[start_name] = self._position(start, has_projections)
+                columns[end_name] = self._position(end, has_projections)
+                columns[range_name] = _fixed(np.abs(range_end.values - range_start.values),
+                                             has_projections & range_start.ok & range_end.ok, '0.0')
+        return columns
+
+    def _power(self, stored_power, voltage, current):
+        """The stored power, or voltage times current (in uA) if there is none"""
+        calculated = _rounded(current.values / 1000000 * voltage.values,
+                              voltage.ok & current.ok & (voltage.values > 0) & (current.values > 0))
+        return [stored if stored is not None else value for stored, value in zip(stored_power, calculated)]
+
+    def _fix_pixel_size(self, pixel_size):
+        """Pixel sizes in um, repairing values that look like nm or mm"""
+        values = pixel_size.values
+        too_large = pixel_size.ok & (values > 100)
+        too_small = pixel_size.ok & (values > 0) & (values < 0.01)
+        if self.logger is not None and (too_large.any() or too_small.any()):
+            self.logger.warning("Corrected pixel size units of %d records (%d above 100 um, %d below 0.01 um)",
+                                int(too_large.sum() + too_small.sum()), int(too_large.sum()), int(too_small.sum()))
+        return np.where(too_large, values / 1000, np.where(too_small, values * 1000, values))
+
+    @staticmethod
+    def _position(column, has_projections):
+        """Formatted axis position; '0.0' if missing or not a number, '' if it is not a scalar"""
+        text = _fixed(column.values, column.ok, '0.0')
+        return ['' if broken else value
+                for value, broken in zip(text, (column.type_error & has_projections).tolist())]
+
+    def _scan_time(self, starts, ends, has_projections):
+        """End minus start as HH:MM:SS, '' where the dates are missing or do not parse"""
+        result = [''] * len(starts)
+        rows = [i for i in np.flatnonzero(has_projections).tolist() if starts[i] and ends[i]]
+        if not rows:
+            return result
+        # Dates that are datetime objects already are subtracted directly, as before
+        both_datetimes = set(i for i in rows if isinstance(starts[i], datetime) and isinstance(ends[i], datetime))
+        for i in both_datetimes:
+            result[i] = str(ends[i] - starts[i])
+        rows = [i for i in rows if i not in both_datetimes]
+        if not rows:
+            return result
+
+        # Each row is a different file, so day-first or month-first is decided per row
+        start_us, end_us, both_ok = self.date_engine.spans([starts[i] for i in rows], [ends[i] for i in rows])
+        # The same float arithmetic as on timedelta.total_seconds() before
+        total_seconds = (end_us - start_us) / 1e6
+        hours = np.trunc(total_seconds // 3600).astype(np.int64).tolist()
+        minutes = np.trunc((total_seconds % 3600) // 60).astype(np.int64).tolist()
+        seconds = np.trunc(total_seconds % 60).astype(np.int64).tolist()
+        for j, (i, ok) in enumerate(zip(rows, both_ok.tolist())):
+            if ok:
+                result[i] = "{0:02d}:{1:02d}:{2:02d}".format(hours[j], minutes[j], seconds[j])
+        return result
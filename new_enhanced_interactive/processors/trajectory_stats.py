@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division
+from collections import OrderedDict
+
+import numpy as np
+
+# Statistics of each axis, in report order
+AXIS_STATISTICS = ('count', 'min', 'max', 'mean', 'range', 'std', 'jitter', 'drift_slope', 'drift_total')
+
+MICROSECONDS_PER_HOUR = 3600 * 1000000
+
+
+def axis_keys(projection_data):
+    """Sorted axis position keys ('Sample_X_pos', ...) found in any projection"""
+    keys = set()
+    for projection in projection_data:
+        keys.update(key for key in projection if key.endswith('_pos'))
+    return sorted(keys)
+
+
+def axis_matrix(projection_data, keys):
+    """float64 matrix of positions, one row per projection and one column per key, NaN where missing"""
+    rows = [[projection.get(key) for key in keys] for projection in projection_data]
+    try:
+        matrix = np.array(rows, dtype=np.float64).reshape(len(rows), len(keys))
+    except (TypeError, ValueError):
+        matrix = np.full((len(rows), len(keys)), np.nan)
+        for i, row in enumerate(rows):
+            for j, value in enumerate(row):
+                try:
+                    matrix[i, j] = float(value)
+                except (TypeError, ValueError):
+                    pass
+    matrix[~np.isfinite(matrix)] = np.nan
+    return matrix
+
+
+class TrajectoryStats(object):
+    """
+    Statistics of every axis over the projections of a scan, computed on
+    the whole position matrix at once: range, mean and spread, a least
+    squares drift slope, and jitter as the standard deviation left after
+    removing that linear drift. Time is in hours since the first dated
+    projection; without dates, projection numbers are used instead.
+    Records that only kept the first and last projection are summarized
+    from the statistics streamed during extraction, against projection
+    numbers.
+    """
+
+    def __init__(self, date_engine):
+        self.date_engine = date_engine
+
+    def _time_base(self, projection_data):
+        """(x values, 'hours' or 'projections') to fit the drift against, NaN for undated projections"""
+        microseconds, valid = self.date_engine.to_microseconds([p.get('date') for p in projection_data])
+        if valid.sum() >= 2:
+            hours = (microseconds - microseconds[valid][0]) / MICROSECONDS_PER_HOUR
+            return np.where(valid, hours, np.nan), 'hours'
+        numbers = np.array([p.get('projection_number', np.nan) for p in projection_data], dtype=np.float64)
+        if not np.isfinite(numbers).all():
+            numbers = np.arange(len(projection_data), dtype=np.float64)
+        return numbers, 'projections'
+
+    @staticmethod
+    def _from_running_stats(projection_stats):
+        """The same result from the RunningStats summaries of the axis columns"""
+        result = OrderedDict([('time_base', 'projections'), ('axes', OrderedDict())])
+        for key in axis_keys([projection_stats]):
+            streamed = projection_stats[key]
+            slope = streamed.get('slope')
+            # Positions are projection numbers, which are not consecutive when the projections were sampled
+            span = streamed['last_position'] - streamed['first_position'] if 'last_position' in streamed \
+                else streamed['count'] - 1
+            result['axes'][key] = OrderedDict([
+                ('count', streamed['count']), ('min', streamed['min']), ('max', streamed['max']),
+                ('mean', streamed['mean']), ('range', streamed['max'] - streamed['min']), ('std', streamed['std']),
+                ('jitter', streamed.get('jitter')), ('drift_slope', slope),
+                ('drift_total', slope * span if slope is not None else None),
+            ])
+        return result
+
+    def analyze(self, metadata):
+        """OrderedDict with the time base and an OrderedDict of AXIS_STATISTICS per axis key"""
+        if metadata.get('projection_detail', 'all') != 'all' and metadata.get('projection_stats'):
+            return self._from_running_stats(metadata['projection_stats'])
+        projection_data = metadata.get('projection_data') or []
+        keys = axis_keys(projection_data)
+        result = OrderedDict([('time_base', None), ('axes', OrderedDict())])
+        if not keys:
+            return result
+        positions = axis_matrix(projection_data, keys)
+        x, result['time_base'] = self._time_base(projection_data)
+
+        present = ~np.isnan(positions)
+        count = present.sum(axis=0)
+        filled = np.where(present, positions, 0.0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = filled.sum(axis=0) / count
+            minimum = np.where(present, positions, np.inf).min(axis=0)
+            maximum = np.where(present, positions, -np.inf).max(axis=0)
+            std = np.sqrt((np.where(present, positions - mean, 0.0) ** 2).sum(axis=0) / count)
+
+            # Least squares line per axis over the projections that have both a position and a time
+            fitted = present & ~np.isnan(x)[:, np.newaxis]
+            fit_count = fitted.sum(axis=0)
+            x_column = np.where(fitted, x[:, np.newaxis], 0.0)
+            y_column = np.where(fitted, positions, 0.0)
+            x_mean = x_column.sum(axis=0) / fit_count
+            y_mean = y_column.sum(axis=0) / fit_count
+            dx = np.where(fitted, x_column - x_mean, 0.0)
+            dy = np.where(fitted, y_column - y_mean, 0.0)
+            sxx = (dx ** 2).sum(axis=0)
+            slope = np.where(sxx > 0, (dx * dy).sum(axis=0) / sxx, np.nan)
+            residuals = np.where(fitted, dy - slope * dx, 0.0)
+            jitter = np.sqrt((residuals ** 2).sum(axis=0) / fit_count)
+            # Drift over the fitted part of the scan
+            drift_total = slope * (np.where(fitted, x_column, -np.inf).max(axis=0)
+                                   - np.where(fitted, x_column, np.inf).min(axis=0))
+
+        columns = OrderedDict([
+            ('count', count), ('min', minimum), ('max', maximum), ('mean', mean), ('range', maximum - minimum),
+            ('std', std), ('jitter', jitter), ('drift_slope', slope), ('drift_total', drift_total),
+        ])
+        for j, key in enumerate(keys):
+            stats = OrderedDict()
+            for name, values in columns.items():
+                value = values[j].item()
+                stats[name] = value if count[j] and np.isfinite(value) else None
+            stats['count'] = int(count[j])
+            result['axes'][key] = stats
+        return result
@@ -2,14 +2,24 @@
 from __future__ import print_function, division
 import os
 import csv
+import json
 from datetime import datetime
 import gc
 import time
 
 # Fix the imports to use absolute imports from the package root
 from new_enhanced_interactive.config.txrm_config_converter import TXRMConfigConverter
+from new_enhanced_interactive.metadata.call_tracer import CallStats, TracingDataSet
+from new_enhanced_interactive.metadata.memoizing_dataset import MemoizingDataSet
 from new_enhanced_interactive.metadata.metadata_extractor import MetadataExtractor
+from new_enhanced_interactive.metadata.xradia_backend import create_dataset
+from new_enhanced_interactive.processors.acquisition_timing import AcquisitionTiming, TIMING_FIELDS
+from new_enhanced_interactive.processors.derived_columns import DerivedColumns, EXPORTED_AXES, axis_column_names
+from new_enhanced_interactive.processors.trajectory_stats import AXIS_STATISTICS, TrajectoryStats
+from new_enhanced_interactive.utils.date_engine import DateEngine
 from new_enhanced_interactive.utils.logging_utils import setup_logger
+from new_enhanced_interactive.utils.profiling import memory_checkpoint
+from new_enhanced_interactive.utils.stage_timer import StageTimer
 from new_enhanced_interactive.utils.validation_utils import TXRMValidator
 
 class TXRMProcessor(object):
@@ -24,10 +34,30 @@ class TXRMProcessor(object):
                 print("Warning: Could not create output directory: {}".format(str(e)))
         
         self.all_metadata = []  # Store metadata from all processed files
+        self.write_metadata_txt = True  # Write <name>_metadata.txt next to each TXRM file
+        self.write_config_file = True  # Write <name>_config.txt next to each TXRM file
+        self.trace_calls = False  # Count calls and time per XradiaPy method for each file
+        self.metadata_cache = None  # MetadataCache of earlier extractions, None to always extract
         self.config_converter = TXRMConfigConverter()
         self.metadata_extractor = MetadataExtractor()
         self.validator = TXRMValidator()
-        self.logger = setup_logger('txrm_processor')
+        self.date_engine = DateEngine()  # Remembers unambiguous date layouts across files
+        self.metadata_extractor.date_engine = self.date_engine
+        self.acquisition_timing = AcquisitionTiming(self.date_engine)
+        self.trajectory_stats = TrajectoryStats(self.date_engine)
+        # One dataset for extractor and converter: each file is read once and repeated getters are cached
+        self.call_stats = None
+        self.dataset = MemoizingDataSet(self._create_dataset)
+        self.metadata_extractor.shared_dataset = self.dataset
+        self.config_converter.shared_dataset = self.dataset
+        self.logger = setup_logger('txrm_processor', __name__)
+        self.last_timer = None  # Stage timings of the most recent file, also if it failed
+
+    def _create_dataset(self):
+        dataset = create_dataset()
+        if self.call_stats is not None:
+            dataset = TracingDataSet(dataset, self.call_stats)
+        return dataset
 
     def save_metadata_txt(self, metadata, file_path):
         """Save metadata as formatted text file next to TXRM file"""
@@ -82,7 +112,11 @@ class TXRMProcessor(object):
                 if metadata['projection_data']:
                     first_proj = metadata['projection_data'][0]
                     last_proj = metadata['projection_data'][-1]
-                    f.write("Total Projections: %s\n" % len(metadata['projection_data']))
+                    total_projections = len(metadata['projection_data'])
+                    if metadata.get('projection_detail', 'all') != 'all' or metadata.get('projection_sampling'):
+                        # Only the first and last projection were kept, or only a sample was read
+                        total_projections = metadata['image_properties'].get('total_projections', total_projections)
+                    f.write("Total Projections: %s\n" % total_projections)
                     f.write("First Projection Date: %s\n" % first_proj['date'])
                     f.write("Last Projection Date: %s\n" % last_proj['date'])
                     
@@ -96,6 +130,26 @@ class TXRMProcessor(object):
                     for key, value in last_proj.items():
                         if '_pos' in key:
                             f.write("%s: %s\n" % (key, value))
+
+                # Statistics streamed over all projections during extraction
+                if metadata.get('projection_stats'):
+                    sampling = metadata.get('projection_sampling')
+                    if sampling:
+                        f.write("\nProjection Statistics (sampled, {0} of {1} projections: {2}):\n".format(
+                            sampling['projections_read'], sampling['total_projections'], sampling['selection']))
+                    else:
+                        f.write("\nProjection Statistics:\n")
+                    f.write("-" * 20 + "\n")
+                    for key, stats in metadata['projection_stats'].items():
+                        f.write("%s: mean=%s, std=%s, min=%s, max=%s\n" % (
+                            key, stats['mean'], stats['std'], stats['min'], stats['max']))
+
+                # Acquisition Timing
+                if metadata.get('acquisition_timing'):
+                    f.write("\nAcquisition Timing:\n")
+                    f.write("-" * 20 + "\n")
+                    for key, value in metadata['acquisition_timing'].items():
+                        f.write("%s: %s\n" % (key, value if value is not None else 'N/A'))
             
             self.logger.info("Metadata text file saved to: %s", txt_path)
             return True
@@ -106,6 +160,46 @@ class TXRMProcessor(object):
             print(error_msg)
             return False
 
+    def save_config_file(self, metadata, file_path):
+        """Save the instrument config file next to the TXRM file"""
+        config_path = os.path.splitext(file_path)[0] + "_config.txt"
+        try:
+            if self.config_converter.create_config_from_txrm(file_path, metadata=metadata):
+                if self.config_converter.save_config(config_path):
+                    self.logger.info("Configuration saved to: %s", config_path)
+                    return True
+                self.logger.error("Failed to save configuration file")
+            else:
+                self.logger.error("Failed to create configuration")
+        except Exception as e:
+            self.logger.error("Error generating config file: %s", str(e), exc_info=True)
+            print("Warning: Could not generate config file, but continuing with metadata processing")
+        return False
+
+    def save_cumulative_json(self, filename=None):
+        """Save all collected metadata records, including projection data, to a JSON file"""
+        records = [m for m in self.all_metadata if m and isinstance(m, dict)]
+        if not records:
+            self.logger.warning("No metadata to save to cumulative JSON")
+            return False
+        
+        if filename is None:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            filename = "cumulative_metadata_{0}.json".format(timestamp)
+        json_path = os.path.join(self.output_dir, filename)
+        
+        try:
+            with open(json_path, 'w') as jsonfile:
+                json.dump(records, jsonfile, indent=2, default=str)
+            self.logger.info("Cumulative metadata saved to: %s", json_path)
+            print("\nCumulative metadata saved to: {}".format(json_path))
+            return json_path
+        except Exception as e:
+            error_msg = "Error saving cumulative JSON: %s" % str(e)
+            self.logger.error(error_msg, exc_info=True)
+            print(error_msg)
+            return False
+
     def _get_file_name(self, m):
         """Get file name without extension"""
         return os.path.splitext(os.path.basename(m.get('file_path', '')))[0]
@@ -127,28 +221,33 @@ class TXRMProcessor(object):
             )
         return ''
 
-    def _calculate_xray_power(self, metadata):
-        """Safely calculate X-ray tube power if not already available"""
-        try:
-            # First check if power is already available
-            power = metadata['machine_settings'].get('power')
-            if power is not None and power != '':
-                return str(power)
-                
-            # If not, calculate from voltage and current
-            voltage = float(metadata['machine_settings'].get('voltage', 0))
-            # Current is in μA, need to convert to A for power calculation
-            current_ua = float(metadata['machine_settings'].get('current', 0))
-            if voltage > 0 and current_ua > 0:
-                # Convert μA to A (divide by 1,000,000) then multiply by voltage
-                power_watts = (current_ua / 1000000) * voltage
-                return str(round(power_watts, 2))
-            return ''
-        except (ValueError, TypeError, ZeroDivisionError):
-            return ''
+    def _timing(self, m):
+        """Acquisition timing of a record, analyzed now for records from before it was stored"""
+        if 'acquisition_timing' not in m:
+            m['acquisition_timing'] = self.acquisition_timing.analyze(m)
+        return m['acquisition_timing']
+
+    def _text_column(self, column_name, value_func, records):
+        """CSV text of one column: floats with 6 decimals, '' for None or on errors"""
+        values = []
+        for metadata in records:
+            try:
+                value = value_func(metadata)
+                # Ensure numeric values are properly formatted
+                if isinstance(value, float):
+                    values.append("{0:.6f}".format(value))
+                else:
+                    values.append(str(value) if value is not None else '')
+            except Exception as e:
+                self.logger.warning("Error getting value for %s: %s", column_name, str(e))
+                values.append('')
+        return values
 
-    def save_cumulative_csv(self):
-        """Save all collected metadata to a single CSV file with specified column order"""
+    def save_cumulative_csv(self, filename=None):
+        """
+        Save all collected metadata to a single CSV file with specified column order.
+        A timestamped file name is used unless `filename` is given.
+        """
         if not self.all_metadata:
             self.logger.warning("No metadata to save to cumulative CSV")
             return False
@@ -160,7 +259,8 @@ class TXRMProcessor(object):
             self.logger.warning("No valid metadata entries to save after filtering")
             return False
             
-        # Define column order and mappings with clear descriptions based on new format
+        # Define column order and mappings with clear descriptions based on new format.
+        # Columns without a function are computed for all records at once by DerivedColumns.
         column_order = [
             # File Information
             ('file_hash', lambda m: m.get('file_hash', '')),  # File hash (SHA-256)
@@ -171,17 +271,17 @@ class TXRMProcessor(object):
             ('ct_number_images', lambda m: str(m['image_properties'].get('total_projections', '0'))),  # CT: Number of images
             ('ct_optical_magnification', lambda m: 'yes' if str(m['machine_settings'].get('objective', '')).lower() in ['4x', '20x', '40x'] else 'no'),  # CT: Optical magnification
             ('xray_tube_voltage', lambda m: str(m['machine_settings'].get('voltage', '0.0'))),  # X-ray Tube: voltage
-            ('xray_tube_power', self._calculate_xray_power),  # X-ray Tube: power (W)
-            ('xray_tube_current', self._calculate_xray_current),  # Xray tube: current (uA)
+            ('xray_tube_power', None),  # X-ray Tube: power (W)
+            ('xray_tube_current', None),  # Xray tube: current (uA)
             ('xray_filter', lambda m: str(m['machine_settings'].get('filter', ''))),  # X-ray: Filter
             ('detector_binning', lambda m: str(m['machine_settings'].get('binning', '0'))),  # Detector: Binning
             ('detector_capture_time', lambda m: str(m['projection_data'][0].get('exposure', '0.0')) if m.get('projection_data') else '0.0'),  # Detector: capture time (s)
             ('detector_averaging', lambda m: str(m.get('detector_info', {}).get('images_per_projection', 1))),  # Detector: Averaging (images per projection)
             ('image_width_pixels', lambda m: str(m['image_properties'].get('width', '0'))),  # Image width (pixels)
             ('image_height_pixels', lambda m: str(m['image_properties'].get('height', '0'))),  # Image height (pixels)
-            ('image_width_real', lambda m: self._calculate_real_dimension(m, 'width')),  # Image width real
-            ('image_height_real', lambda m: self._calculate_real_dimension(m, 'height')),  # Image height real
-            ('scan_time', self._calculate_scan_time),  # Scan time
+            ('image_width_real', None),  # Image width real
+            ('image_height_real', None),  # Image height real
+            ('scan_time', None),  # Scan time
             ('start_time', lambda m: str(m['projection_data'][0].get('date', '')) if m.get('projection_data') else ''),  # Start time
             ('end_time', lambda m: str(m['projection_data'][-1].get('date', '')) if m.get('projection_data') else ''),  # End time
             ('txrm_file_path', self._get_file_path),  # TXRM File path
@@ -189,91 +289,15 @@ class TXRMProcessor(object):
             ('acquisition_successful', lambda m: str(m['basic_info'].get('initialized_correctly', 'False'))),  # Acquisition stage successful?
         ]
 
-        # Add sample axis positions
-        sample_axes = [
-            ('Sample X', 'Sample_X_pos'),
-            ('Sample Y', 'Sample_Y_pos'),
-            ('Sample Z', 'Sample_Z_pos'),
-            ('Sample Theta', 'Sample_Theta_pos'),
-        ]
-        
-        for display_name, metadata_name in sample_axes:
-            safe_name = display_name.lower().replace(' ', '_')
-            column_order.extend([
-                ('{0}_start'.format(safe_name), lambda m, name=metadata_name: self._get_axis_position(m, name, 0)),
-                ('{0}_end'.format(safe_name), lambda m, name=metadata_name: self._get_axis_position(m, name, -1)),
-                ('{0}_range'.format(safe_name), lambda m, name=metadata_name: self._calculate_axis_range_new(m, name))
-            ])
-        
-        # Add source axis positions
-        source_axes = [
-            ('Source X', 'Source_X_pos'),
-            ('Source Z', 'Source_Z_pos'),
-        ]
-        
-        for display_name, metadata_name in source_axes:
-            safe_name = display_name.lower().replace(' ', '_')
-            column_order.extend([
-                ('{0}_start'.format(safe_name), lambda m, name=metadata_name: self._get_axis_position(m, name, 0)),
-                ('{0}_end'.format(safe_name), lambda m, name=metadata_name: self._get_axis_position(m, name, -1)),
-                ('{0}_range'.format(safe_name), lambda m, name=metadata_name: self._calculate_axis_range_new(m, name))
-            ])
-        
-        # Add flat panel axis positions
-        flat_panel_axes = [
-            ('Flat Panel Z', 'Flat_Panel_Z_pos'),
-            ('Flat Panel X', 'Flat_Panel_X_pos'),
-        ]
-        
-        for display_name, metadata_name in flat_panel_axes:
-            safe_name = display_name.lower().replace(' ', '_')
-            column_order.extend([
-                ('{0}_start'.format(safe_name), lambda m, name=metadata_name: self._get_axis_position(m, name, 0)),
-                ('{0}_end'.format(safe_name), lambda m, name=metadata_name: self._get_axis_position(m, name, -1)),
-                ('{0}_range'.format(safe_name), lambda m, name=metadata_name: self._calculate_axis_range_new(m, name))
-            ])
-        
-        # Add detector axis positions
-        detector_axes = [
-            ('Detector Z', 'Detector_Z_pos'),
-        ]
-        
-        for display_name, metadata_name in detector_axes:
-            safe_name = display_name.lower().replace(' ', '_')
-            column_order.extend([
-                ('{0}_start'.format(safe_name), lambda m, name=metadata_name: self._get_axis_position(m, name, 0)),
-                ('{0}_end'.format(safe_name), lambda m, name=metadata_name: self._get_axis_position(m, name, -1)),
-                ('{0}_range'.format(safe_name), lambda m, name=metadata_name: self._calculate_axis_range_new(m, name))
-            ])
-        
-        # Add CCD axis positions (which might be the "???" in the requirements)
-        ccd_axes = [
-            ('CCD Z', 'CCD_Z_pos'),
-            ('CCD X', 'CCD_X_pos'),
-        ]
-        
-        for display_name, metadata_name in ccd_axes:
-            safe_name = display_name.lower().replace(' ', '_')
-            column_order.extend([
-                ('{0}_start'.format(safe_name), lambda m, name=metadata_name: self._get_axis_position(m, name, 0)),
-                ('{0}_end'.format(safe_name), lambda m, name=metadata_name: self._get_axis_position(m, name, -1)),
-                ('{0}_range'.format(safe_name), lambda m, name=metadata_name: self._calculate_axis_range_new(m, name))
-            ])
-            
-        # Add any remaining axes that might be in the data but not explicitly listed
-        # This covers the "???" fields in the requirements
-        other_axes = [
-            ('MkIV Filter Wheel', 'MkIV_Filter_Wheel_pos'),
-            ('DCT', 'DCT_pos')
-        ]
-        
-        for display_name, metadata_name in other_axes:
-            safe_name = display_name.lower().replace(' ', '_')
-            column_order.extend([
-                ('{0}_start'.format(safe_name), lambda m, name=metadata_name: self._get_axis_position(m, name, 0)),
-                ('{0}_end'.format(safe_name), lambda m, name=metadata_name: self._get_axis_position(m, name, -1)),
-                ('{0}_range'.format(safe_name), lambda m, name=metadata_name: self._calculate_axis_range_new(m, name))
-            ])
+        # Start, end and range of the sample, source, flat panel, detector, CCD and other axes
+        for display_name, _ in EXPORTED_AXES:
+            column_order.extend((column_name, None) for column_name in axis_column_names(display_name))
+
+        # Intervals, overhead, stalls and throughput from the dates of all projections
+        for field in TIMING_FIELDS:
+            column_order.append(('timing_' + field, lambda m, field=field: self._timing(m).get(field)))
+        # Selection of the projections that were read, empty if all were
+        column_order.append(('projection_sampling', lambda m: (m.get('projection_sampling') or {}).get('selection')))
 
         # Create output directory if it doesn't exist
         if not os.path.exists(self.output_dir):
@@ -286,37 +310,30 @@ class TXRMProcessor(object):
                 print(error_msg)
                 return False
 
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        csv_path = os.path.join(self.output_dir, "cumulative_metadata_{0}.csv".format(timestamp))
+        if filename is None:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            filename = "cumulative_metadata_{0}.csv".format(timestamp)
+        csv_path = os.path.join(self.output_dir, filename)
         
         try:
-            # Prepare data with specified column order
-            rows = []
-            for metadata in filtered_metadata:
-                row = {}
-                for column_name, value_func in column_order:
-                    try:
-                        value = value_func(metadata)
-                        # Ensure numeric values are properly formatted
-                        if isinstance(value, float):
-                            row[column_name] = "{0:.6f}".format(value)
-                        else:
-                            row[column_name] = str(value) if value is not None else ''
-                    except Exception as e:
-                        self.logger.warning("Error getting value for %s: %s", column_name, str(e))
-                        row[column_name] = ''
-                # Only add non-empty rows
-                if any(row.values()):
-                    rows.append(row)
+            derived = DerivedColumns(self.date_engine, self.logger).compute(filtered_metadata)
 
+            # Prepare data with specified column order, one column at a time
+            columns = [derived[column_name] if value_func is None
+                       else self._text_column(column_name, value_func, filtered_metadata)
+                       for column_name, value_func in column_order]
+            # Only add non-empty rows
+            rows = [row for row in zip(*columns) if any(row)]
+
+            memory_checkpoint('save_cumulative_csv')
+            
             # Write to CSV with specified column order
             fieldnames = [col[0] for col in column_order]
             
             with open(csv_path, 'w') as csvfile:  # Changed from 'wb' to 'w' for better compatibility
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames, lineterminator='\n')
-                writer.writeheader()
-                for row in rows:
-                    writer.writerow(row)
+                writer = csv.writer(csvfile, lineterminator='\n')
+                writer.writerow(fieldnames)
+                writer.writerows(rows)
                 
             self.logger.info("Cumulative metadata saved to: %s", csv_path)
             print("\nCumulative metadata saved to: {}".format(csv_path))
@@ -328,180 +345,59 @@ class TXRMProcessor(object):
             print(error_msg)
             return False
 
-    def _calculate_xray_current(self, metadata):
-        """Safely calculate X-ray tube current"""
-        try:
-            power = float(metadata['machine_settings'].get('power', 0))
-            voltage = float(metadata['machine_settings'].get('voltage', 0))
-            if voltage > 0:
-                return str(round((power / voltage) * 100, 2))
-            return ''
-        except (ValueError, TypeError, ZeroDivisionError):
-            return ''
-
-    def _check_and_fix_pixel_size(self, pixel_size):
+    def save_drift_report(self, filename=None):
         """
-        Check if the pixel size seems reasonable and fix it if not.
-        Pixel size should typically be in the range of 0.5-50 μm for X-ray microscopy.
+        Save the range, jitter and drift slope of every axis of the drift
+        files among the collected records to a CSV, one row per file and axis.
         """
-        try:
-            pixel_size_float = float(pixel_size)
-            
-            # If pixel size is unusually large (>100 μm), it might be in the wrong units
-            if pixel_size_float > 100:
-                self.logger.warning("Unusually large pixel size detected: %s μm. Attempting to correct.", pixel_size_float)
-                # Try dividing by 1000 to convert from nm to μm if that's the issue
-                corrected_size = pixel_size_float / 1000
-                self.logger.info("Corrected pixel size: %s μm", corrected_size)
-                return corrected_size
-                
-            # If pixel size is extremely small (<0.01 μm), it might be in the wrong units
-            if 0 < pixel_size_float < 0.01:
-                self.logger.warning("Unusually small pixel size detected: %s μm. Attempting to correct.", pixel_size_float)
-                # Try multiplying by 1000 to convert from mm to μm if that's the issue
-                corrected_size = pixel_size_float * 1000
-                self.logger.info("Corrected pixel size: %s μm", corrected_size)
-                return corrected_size
-                
-            return pixel_size_float
-        except (ValueError, TypeError):
-            return pixel_size
-            
-    def _calculate_real_dimension(self, metadata, dimension):
-        """Calculate real dimension (pixels × pixel size)"""
-        try:
-            pixels = float(metadata['image_properties'].get(dimension, 0))
-            raw_pixel_size = metadata['machine_settings'].get('pixel_size', 0)
-            
-            # Check and fix pixel size if needed
-            pixel_size = self._check_and_fix_pixel_size(raw_pixel_size)
-            
-            # Log the values for debugging
-            self.logger.debug("Calculating real dimension for %s: pixels=%s, raw_pixel_size=%s, corrected_pixel_size=%s", 
-                             dimension, pixels, raw_pixel_size, pixel_size)
-            
-            if pixels > 0 and pixel_size > 0:
-                # Real dimension = number of pixels × pixel size in μm
-                real_dimension = pixels * pixel_size
-                
-                # Log the calculated value
-                self.logger.debug("Calculated real dimension: %s μm", real_dimension)
-                
-                # Check if the result seems reasonable (less than 100,000 μm which is 10cm)
-                if real_dimension > 100000:
-                    self.logger.warning("Unusually large real dimension calculated: %s μm. Check pixel size units.", real_dimension)
-                
-                return str(round(real_dimension, 2))
-            return ''
-        except (ValueError, TypeError) as e:
-            self.logger.error("Error calculating real dimension: %s", str(e))
-            return ''
+        records = [m for m in self.all_metadata if m and isinstance(m, dict) and m.get('is_drift_file')]
+        if not records:
+            self.logger.warning("No drift files to save to drift report")
+            print("\nNo drift files were processed, drift report not generated (use --include-drift)")
+            return True
 
-    def _parse_date_string(self, date_string):
-        """
-        Parse a date string using multiple possible formats.
-        Returns a datetime object if successful, None otherwise.
-        """
-        if not date_string or not isinstance(date_string, str):
-            return None
-            
-        # List of possible date formats to try
-        date_formats = [
-            "%m/%d/%Y %H:%M:%S.%f",  # 09/10/2022 15:17:54.773
-            "%m/%d/%Y %H:%M:%S",     # 09/10/2022 15:17:54
-            "%Y-%m-%d %H:%M:%S.%f",  # 2022-09-10 15:17:54.773
-            "%Y-%m-%d %H:%M:%S",     # 2022-09-10 15:17:54
-            "%d/%m/%Y %H:%M:%S.%f",  # 10/09/2022 15:17:54.773 (European format)
-            "%d/%m/%Y %H:%M:%S"      # 10/09/2022 15:17:54 (European format)
-        ]
-        
-        # Try each format until one works
-        for date_format in date_formats:
-            try:
-                return datetime.strptime(date_string, date_format)
-            except ValueError:
-                continue
-                
-        # If we get here, none of the formats worked
-        self.logger.error("Could not parse date string: %s", date_string)
-        return None
-        
-    def _calculate_scan_time(self, metadata):
-        """Calculate scan time (end time - start time)"""
-        try:
-            if not metadata.get('projection_data'):
-                self.logger.warning("No projection data found for scan time calculation")
-                return ''
-                
-            start_time = metadata['projection_data'][0].get('date')
-            end_time = metadata['projection_data'][-1].get('date')
-            
-            # Log the raw date values for debugging
-            self.logger.debug("Start time (raw): %s", start_time)
-            self.logger.debug("End time (raw): %s", end_time)
-            
-            # If the dates are already datetime objects, use them directly
-            if start_time and end_time and isinstance(start_time, datetime) and isinstance(end_time, datetime):
-                time_diff = end_time - start_time
-                self.logger.debug("Time difference (datetime objects): %s", time_diff)
-                return str(time_diff)
-                
-            # If the dates are strings, parse them
-            if start_time and end_time:
-                # Try to parse the date strings
-                start_dt = self._parse_date_string(str(start_time))
-                end_dt = self._parse_date_string(str(end_time))
-                
-                if start_dt and end_dt:
-                    self.logger.debug("Parsed start time: %s", start_dt)
-                    self.logger.debug("Parsed end time: %s", end_dt)
-                    
-                    # Calculate the time difference
-                    time_diff = end_dt - start_dt
-                    
-                    # Format the time difference as hours:minutes:seconds
-                    total_seconds = time_diff.total_seconds()
-                    hours = int(total_seconds // 3600)
-                    minutes = int((total_seconds % 3600) // 60)
-                    seconds = int(total_seconds % 60)
-                    
-                    formatted_time = "{:02d}:{:02d}:{:02d}".format(hours, minutes, seconds)
-                    self.logger.debug("Formatted time difference: %s", formatted_time)
-                    
-                    return formatted_time
-            
-            self.logger.warning("Could not calculate scan time: invalid date values")
-            return ''
-        except (IndexError, TypeError, ValueError) as e:
-            self.logger.error("Error calculating scan time: %s", str(e))
-            return ''
+        if filename is None:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            filename = "drift_report_{0}.csv".format(timestamp)
+        csv_path = os.path.join(self.output_dir, filename)
 
-    def _get_axis_position(self, metadata, axis_name, index):
-        """Get axis position with improved precision"""
         try:
-            if metadata.get('projection_data'):
-                pos = metadata['projection_data'][index].get(axis_name)
-                if pos is not None:
-                    return "{0:.6f}".format(float(pos))
-            return '0.0'
-        except (KeyError, IndexError, ValueError) as e:
-            self.logger.debug("Error getting position for %s: %s", axis_name, str(e))
-            return '0.0'
+            rows = []
+            for metadata in records:
+                stats = self.trajectory_stats.analyze(metadata)
+                projections = metadata.get('projection_data') or []
+                start_time = str(projections[0].get('date', '')) if projections else ''
+                for axis, values in stats['axes'].items():
+                    sampling = metadata.get('projection_sampling') or {}
+                    row = [metadata.get('file_hash', ''), self._get_file_name(metadata), start_time,
+                           axis, stats['time_base'], sampling.get('selection', '')]
+                    for name in AXIS_STATISTICS:
+                        value = values[name]
+                        row.append("{0:.6f}".format(value) if isinstance(value, float)
+                                   else (str(value) if value is not None else ''))
+                    row.append(self._get_file_path(metadata))
+                    rows.append(row)
 
-    def _calculate_axis_range_new(self, metadata, axis_name):
-        """Calculate axis range with improved precision"""
-        try:
-            if not metadata.get('projection_data'):
-                return '0.0'
-            start_pos = float(metadata['projection_data'][0].get(axis_name, 0))
-            end_pos = float(metadata['projection_data'][-1].get(axis_name, 0))
-            range_value = abs(end_pos - start_pos)
-            return "{0:.6f}".format(range_value)
-        except (ValueError, TypeError, IndexError) as e:
-            self.logger.debug("Error calculating range for %s: %s", axis_name, str(e))
-            return '0.0'
+            with open(csv_path, 'w') as csvfile:
+                writer = csv.writer(csvfile, lineterminator='\n')
+                writer.writerow(['file_hash', 'file_name', 'start_time', 'axis', 'time_base', 'projection_sampling']
+                                + list(AXIS_STATISTICS) + ['txrm_file_path'])
+                writer.writerows(rows)
+
+            self.logger.info("Drift report of %d files saved to: %s", len(records), csv_path)
+            print("\nDrift report saved to: {}".format(csv_path))
+            return csv_path
+        except Exception as e:
+            error_msg = "Error saving drift report: %s" % str(e)
+            self.logger.error(error_msg, exc_info=True)
+            print(error_msg)
+            return False
 
     def process_single_file(self, file_path):
+        timer = self.last_timer = StageTimer()
+        call_stats = self.call_stats = CallStats() if self.trace_calls else None
+        # The file may have changed since it was last read
+        self.dataset.reset()
         try:
             print("\nProcessing: {}".format(file_path))
             
@@ -511,18 +407,29 @@ class TXRMProcessor(object):
                 self.logger.info("Processing drift file: %s", file_path)
             
             # Validate file and get hash
-            valid, message, file_hash = self.validator.validate_file(file_path)
+            with timer.stage('hash'):
+                valid, message, file_hash = self.validator.validate_file(file_path)
             if not valid:
                 error_msg = "File validation failed: %s" % message
                 self.logger.error(error_msg)
                 print(error_msg)
                 return False
+            timer.bytes_read += self.validator.get_validation_info(file_path).get('size', 0)
                 
             # Log file hash
             self.logger.info("File hash (SHA-256): %s", file_hash)
             
-            # Get metadata
-            metadata = self.metadata_extractor.get_complete_metadata(file_path)
+            # Get metadata, from the cache if this content was extracted before
+            metadata = None
+            if self.metadata_cache is not None:
+                with timer.stage('cache_lookup'):
+                    metadata = self.metadata_cache.get(file_hash, file_path, self.metadata_extractor.satisfies)
+                if metadata is not None:
+                    self.logger.info("Metadata cache hit for %s", file_path)
+                    print("Using cached metadata (file content seen before)")
+            cache_miss = metadata is None
+            if cache_miss:
+                metadata = self.metadata_extractor.get_complete_metadata(file_path, timer)
             if not metadata:
                 self.logger.error("Failed to extract metadata from file: %s", file_path)
                 print("Error: Failed to extract metadata from file")
@@ -544,28 +451,35 @@ class TXRMProcessor(object):
             metadata['file_hash'] = file_hash
             metadata['validation_info'] = self.validator.get_validation_info(file_path)
             metadata['is_drift_file'] = is_drift
+            if 'acquisition_timing' not in metadata:
+                with timer.stage('timing'):
+                    metadata['acquisition_timing'] = self.acquisition_timing.analyze(metadata)
+            if cache_miss and self.metadata_cache is not None:
+                with timer.stage('cache_store'):
+                    self.metadata_cache.put(file_hash, metadata)
             
             # Save metadata as text file next to TXRM file
-            if not self.save_metadata_txt(metadata, file_path):
-                return False
+            if self.write_metadata_txt:
+                with timer.stage('metadata_txt'):
+                    saved = self.save_metadata_txt(metadata, file_path)
+                if not saved:
+                    return False
             
             # Store metadata for cumulative CSV
             self.all_metadata.append(metadata)
+            memory_checkpoint('process_single_file')
             
             # Generate config file - continue even if this fails
-            config_path = os.path.splitext(file_path)[0] + "_config.txt"
-            try:
-                if self.config_converter.create_config_from_txrm(file_path, metadata=metadata):
-                    if self.config_converter.save_config(config_path):
-                        self.logger.info("Configuration saved to: %s", config_path)
-                    else:
-                        self.logger.error("Failed to save configuration file")
-                else:
-                    self.logger.error("Failed to create configuration")
-            except Exception as e:
-                self.logger.error("Error generating config file: %s", str(e), exc_info=True)
-                print("Warning: Could not generate config file, but continuing with metadata processing")
+            if self.write_config_file:
+                with timer.stage('config_file'):
+                    self.save_config_file(metadata, file_path)
             
+            metadata['stage_timings'] = timer.timings.copy()  # The watcher adds stages to the timer later
+            metadata['bytes_read'] = timer.bytes_read
+            if call_stats is not None:
+                metadata['xradia_calls'] = call_stats.to_dict()
+                print(call_stats.summary())
+                self.logger.info("XradiaPy calls for %s:\n%s", file_path, call_stats.format_table())
             return True
             
         except Exception as e:
@@ -574,4 +488,4 @@ class TXRMProcessor(object):
             print(error_msg)
             return False
         finally:
-            gc.collect() 
\ No newline at end of file
+            gc.collect()
\ No newline at end of file
@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division
+import mmap
+import struct
+
+import numpy as np
+
+SIGNATURE = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+HEADER_SIZE = 512
+DIRECTORY_ENTRY_SIZE = 128
+HEADER_DIFAT_ENTRIES = 109
+
+# Special sector numbers
+MAX_REGULAR_SECTOR = 0xFFFFFFFA
+END_OF_CHAIN = 0xFFFFFFFE
+NO_STREAM = 0xFFFFFFFF
+
+# Directory entry types
+STORAGE = 1
+STREAM = 2
+ROOT = 5
+
+
+class CompoundFileError(Exception):
+    """The file is not a readable OLE2 compound file"""
+
+
+class CompoundFile(object):
+    """
+    Read-only access to the streams of an OLE2 compound file (the container
+    format of TXRM and XRM files), memory-mapped rather than read.
+
+    Only the header, the allocation tables and the directory are parsed
+    when the file is opened. A stream is located by following its sector
+    chain, so reading it touches only its own pages. `view` returns a NumPy
+    array on the mapping itself when the stream's sectors are contiguous,
+    which is how large streams are normally written, and a copy otherwise.
+    Stream names are case-insensitive paths such as 'ImageInfo/ImageWidth'.
+
+    The mapping stays alive as long as any array viewing it, even after
+    `close`; closing only drops this object's references.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            try:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, mmap.error) as e:
+                raise CompoundFileError("Cannot map {0}: {1}".format(path, e))
+        self._size = len(self._map)
+        self._read_header()
+        self._fat = self._read_fat()
+        self._streams = {}  # lower-case path -> (start sector, size)
+        self._read_directory()
+        self._mini_fat = self._read_chain_array(self._first_mini_fat_sector)
+        self._mini_stream_runs = None
+        self._chains = {}
+
+    def close(self):
+        self._map = None
+        self._chains = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _read_header(self):
+        if self._size < HEADER_SIZE or self._map[:8] != SIGNATURE:
+            raise CompoundFileError("{0} is not an OLE2 compound file".format(self.path))
+        (sector_shift, mini_sector_shift) = struct.unpack_from('<HH', self._map, 0x1E)
+        (self._fat_sector_count, self._first_directory_sector, _, self._mini_stream_cutoff,
+         self._first_mini_fat_sector, _, self._first_difat_sector, difat_sector_count) = \
+            struct.unpack_from('<IIIIIIII', self._map, 0x2C)
+        if sector_shift not in (9, 12) or mini_sector_shift != 6:
+            raise CompoundFileError("Unsupported sector size in {0}".format(self.path))
+        self.sector_size = 1 << sector_shift
+        self.mini_sector_size = 1 << mini_sector_shift
+        self._difat_sector_count = difat_sector_count
+
+    def _sector_offset(self, sector):
+        return (sector + 1) * self.sector_size
+
+    def _sector_array(self, sector):
+        """uint32 entries of one sector, such as a FAT, mini FAT or DIFAT sector"""
+        offset = self._sector_offset(sector)
+        if offset + self.sector_size > self._size:
+            raise CompoundFileError("Sector {0} lies beyond the end of {1}".format(sector, self.path))
+        return np.frombuffer(self._map, dtype='<u4', count=self.sector_size // 4, offset=offset)
+
+    def _read_fat(self):
+        """The sector allocation table, gathered through the DIFAT"""
+        fat_sectors = list(struct.unpack_from('<{0}I'.format(HEADER_DIFAT_ENTRIES), self._map, 0x4C))
+        sector = self._first_difat_sector
+        for _ in range(self._difat_sector_count):
+            if sector > MAX_REGULAR_SECTOR:
+                break
+            entries = self._sector_array(sector).tolist()
+            fat_sectors.extend(entries[:-1])
+            sector = entries[-1]  # The last entry links to the next DIFAT sector
+        fat_sectors = [s for s in fat_sectors[:self._fat_sector_count] if s <= MAX_REGULAR_SECTOR]
+        if not fat_sectors:
+            return np.zeros(0, dtype='<u4')
+        return np.concatenate([self._sector_array(s) for s in fat_sectors])
+
+    def _chain(self, start, table):
+        """Sector numbers of the chain that starts at `start` in `table`"""
+        chain = []
+        sector = start
+        limit = len(table)
+        while sector <= MAX_REGULAR_SECTOR:
+            if sector >= limit or len(chain) > limit:
+                raise CompoundFileError("Broken sector chain in {0}".format(self.path))
+            chain.append(sector)
+            sector = int(table[sector])
+        return chain
+
+    def _read_chain_array(self, start):
+        """uint32 entries of all sectors of a chain (the mini FAT), empty if there is none"""
+        if start > MAX_REGULAR_SECTOR:
+            return np.zeros(0, dtype='<u4')
+        return np.concatenate([self._sector_array(s) for s in self._chain(start, self._fat)])
+
+    def _read_directory(self):
+        data = b''.join(self._map[self._sector_offset(s):self._sector_offset(s) + self.sector_size]
+                        for s in self._chain(self._first_directory_sector, self._fat))
+        entries = []
+        for offset in range(0, len(data) - DIRECTORY_ENTRY_SIZE + 1, DIRECTORY_ENTRY_SIZE):
+            name_length, entry_type = struct.unpack_from('<HB', data, offset + 64)
+            left, right, child = struct.unpack_from('<III', data, offset + 68)
+            start, size = struct.unpack_from('<IQ', data, offset + 116)
+            name = data[offset:offset + max(name_length - 2, 0)].decode('utf-16-le', 'replace')
+            if self.sector_size == 512:
+                size &= 0xFFFFFFFF  # Version 3 files may leave garbage in the high half
+            entries.append((name, entry_type, left, right, child, start, size))
+        if not entries or entries[0][1] != ROOT:
+            raise CompoundFileError("No root entry in {0}".format(self.path))
+        self._mini_stream_start, self._mini_stream_size = entries[0][5], entries[0][6]
+
+        # Walk the tree of every storage; siblings form a binary tree below its child
+        pending = [(entries[0][4], '')]
+        seen = set()
+        while pending:
+            index, prefix = pending.pop()
+            if index == NO_STREAM or index >= len(entries) or index in seen:
+                continue
+            seen.add(index)
+            name, entry_type, left, right, child, start, size = entries[index]
+            pending.append((left, prefix))
+            pending.append((right, prefix))
+            path = prefix + name
+            if entry_type == STREAM:
+                self._streams[path.lower()] = (start, size)
+            elif entry_type == STORAGE:
+                pending.append((child, path + '/'))
+
+    def list_streams(self):
+        """Lower-case paths of all streams"""
+        return sorted(self._streams)
+
+    def exists(self, name):
+        return name.lower() in self._streams
+
+    def stream_size(self, name):
+        return self._entry(name)[1]
+
+    def _entry(self, name):
+        try:
+            return self._streams[name.lower()]
+        except KeyError:
+            raise KeyError("No stream {0} in {1}".format(name, self.path))
+
+    @staticmethod
+    def _runs(sectors, sector_size, offset_of, size):
+        """(file offset, length) of each run of consecutive sectors, trimmed to `size` bytes"""
+        runs = []
+        if not sectors:
+            return runs
+        numbers = np.array(sectors, dtype=np.int64)
+        breaks = np.flatnonzero(np.diff(numbers) != 1) + 1
+        remaining = size
+        for first, last in zip(np.concatenate(([0], breaks)).tolist(),
+                               np.concatenate((breaks, [len(numbers)])).tolist()):
+            length = min((last - first) * sector_size, remaining)
+            if length <= 0:
+                break
+            runs.append((offset_of(sectors[first]), length))
+            remaining -= length
+        return runs
+
+    def stream_runs(self, name):
+        """(file offset, length) of the contiguous byte runs that make up a stream, in order"""
+        key = name.lower()
+        runs = self._chains.get(key)
+        if runs is not None:
+            return runs
+        start, size = self._entry(name)
+        if size < self._mini_stream_cutoff:
+            runs = self._mini_runs(start, size)
+        else:
+            runs = self._runs(self._chain(start, self._fat), self.sector_size, self._sector_offset, size)
+        if sum(length for _, length in runs) < size or any(o + l > self._size for o, l in runs):
+            raise CompoundFileError("Stream {0} is truncated in {1}".format(name, self.path))
+        self._chains[key] = runs
+        return runs
+
+    def _mini_runs(self, start, size):
+        """Runs of a small stream, stored in 64-byte sectors inside the mini stream"""
+        if self._mini_stream_runs is None:
+            self._mini_stream_runs = self._runs(self._chain(self._mini_stream_start, self._fat), self.sector_size,
+                                                self._sector_offset, self._mini_stream_size)
+        runs = []
+        for mini_sector in (self._chain(start, self._mini_fat) if size else []):
+            # Position of the mini sector in the file, through the runs of the mini stream
+            position = mini_sector * self.mini_sector_size
+            for offset, length in self._mini_stream_runs:
+                if position < length:
+                    break
+                position -= length
+            else:
+                raise CompoundFileError("Mini sector {0} outside the mini stream of {1}".format(
+                    mini_sector, self.path))
+            length = min(self.mini_sector_size, size - sum(l for _, l in runs))
+            if runs and runs[-1][0] + runs[-1][1] == offset + position:
+                runs[-1] = (runs[-1][0], runs[-1][1] + length)
+            else:
+                runs.append((offset + position, length))
+        return runs
+
+    def read(self, name):
+        """Bytes of a stream"""
+        return b''.join(self._map[offset:offset + length] for offset, length in self.stream_runs(name))
+
+    def is_contiguous(self, name):
+        """True if `view` of this stream does not copy"""
+        return len(self.stream_runs(name)) <= 1
+
+    def view(self, name, dtype=np.uint8, shape=None):
+        """
+        Read-only array of a stream's bytes as `dtype`, reshaped to `shape`.
+        Shares memory with the mapping when the stream is contiguous.
+        """
+        dtype = np.dtype(dtype)
+        runs = self.stream_runs(name)
+        size = sum(length for _, length in runs)
+        count = size // dtype.itemsize
+        if shape is not None:
+            count = int(np.prod(shape))
+            if count * dtype.itemsize > size:
+                raise CompoundFileError("Stream {0} has {1} bytes, {2} needed for {3}".format(
+                    name, size, count * dtype.itemsize, shape))
+        if len(runs) == 1:
+            array = np.frombuffer(self._map, dtype=dtype, count=count, offset=runs[0][0])
+        else:
+            data = np.empty(count * dtype.itemsize, dtype=np.uint8)
+            position = 0
+            for offset, length in runs:
+                length = min(length, len(data) - position)
+                if length <= 0:
+                    break
+                data[position:position + length] = np.frombuffer(self._map, dtype=np.uint8, count=length,
+                                                                 offset=offset)
+                position += length
+            array = data.view(dtype)
+            array.flags.writeable = False
+        return array.reshape(shape) if shape is not None else array
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import csv
+import glob
+import hashlib
+import os
+from datetime import datetime
+
+DEFAULT_SHARD_DIR = "metadata"
+KEY_COLUMNS = ('file_hash', 'txrm_file_path')
+
+# Concurrent appends from several workstations merge by keeping both sides
+GITATTRIBUTES_LINE = "{0}/*.csv merge=union\n".format(DEFAULT_SHARD_DIR)
+
+
+def _text_lines(data):
+    """Split raw CSV bytes into lines in the string type the csv module expects"""
+    if str is bytes:
+        return data.splitlines()  # Python 2 csv works on byte strings
+    return data.decode('utf-8').splitlines()
+
+
+class AppendOnlyCSVShards(object):
+    """
+    Append-only monthly CSV shards inside a git working tree.
+
+    Rows from a cumulative CSV that are not in any shard yet are appended
+    to the shard of the current month, so each commit only adds new lines
+    and existing files are never rewritten. A shard whose header differs
+    from the cumulative CSV (e.g. after new columns were added) is left
+    alone and the rows go to a shard named after the new header instead.
+    """
+
+    def __init__(self, repo_path, shard_dir=DEFAULT_SHARD_DIR, key_columns=KEY_COLUMNS):
+        self.repo_path = repo_path
+        self.shard_dir = shard_dir
+        self.key_columns = key_columns
+        self._known_keys = set()
+        self._read_offsets = {}  # shard path -> bytes already indexed
+        self._header_columns = {}  # shard path -> positions of the key columns
+
+    def reset(self):
+        """Forget the indexed rows, e.g. after a merge rewrote the shard files"""
+        self._known_keys = set()
+        self._read_offsets = {}
+        self._header_columns = {}
+
+    def _row_key(self, row):
+        return tuple(row.get(column, '') for column in self.key_columns)
+
+    def _shard_paths(self):
+        return sorted(glob.glob(os.path.join(self.repo_path, self.shard_dir, '*.csv')))
+
+    def _read_header(self, path):
+        with open(path, 'r') as f:
+            return next(csv.reader(f), None)
+
+    def _index_shards(self):
+        """Index keys of rows added since the last call, including rows pulled from other workstations"""
+        for path in self._shard_paths():
+            offset = self._read_offsets.get(path, 0)
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                data = f.read()
+            # Only index complete lines, a partial last line is picked up next time
+            end = data.rfind(b'\n') + 1
+            if not end:
+                continue
+            rows = csv.reader(_text_lines(data[:end]))
+            if not offset:
+                header = next(rows, None)
+                self._header_columns[path] = [header.index(c) if c in header else None
+                                              for c in self.key_columns]
+            columns = self._header_columns[path]
+            for row in rows:
+                self._known_keys.add(tuple(
+                    row[i] if i is not None and i < len(row) else '' for i in columns))
+            self._read_offsets[path] = offset + end
+
+    def shard_rel_path(self, fieldnames, when=None):
+        """Repository-relative path of the shard that takes rows with these columns"""
+        month = (when or datetime.now()).strftime("%Y-%m")
+        name = "metadata_{0}.csv".format(month)
+        path = os.path.join(self.repo_path, self.shard_dir, name)
+        if os.path.exists(path) and self._read_header(path) != list(fieldnames):
+            schema = hashlib.md5(",".join(fieldnames).encode('utf-8')).hexdigest()[:8]
+            name = "metadata_{0}_{1}.csv".format(month, schema)
+        return "{0}/{1}".format(self.shard_dir, name)
+
+    def append_new_rows(self, csv_path, when=None):
+        """
+        Append rows of `csv_path` that are not in any shard yet.
+        Returns (shard_rel_path, appended_row_count).
+        """
+        self._index_shards()
+
+        with open(csv_path, 'r') as csvfile:
+            reader = csv.DictReader(csvfile)
+            fieldnames = reader.fieldnames
+            new_rows = [row for row in reader if self._row_key(row) not in self._known_keys]
+        if not new_rows:
+            return None, 0
+
+        rel_path = self.shard_rel_path(fieldnames, when)
+        path = os.path.join(self.repo_path, *rel_path.split('/'))
+        if not os.path.exists(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+
+        write_header = not os.path.exists(path)
+        with open(path, 'a') as shard:
+            writer = csv.DictWriter(shard, fieldnames=fieldnames, lineterminator='\n')
+            if write_header:
+                writer.writeheader()
+            for row in new_rows:
+                writer.writerow(row)
+                self._known_keys.add(self._row_key(row))
+
+        return rel_path, len(new_rows)
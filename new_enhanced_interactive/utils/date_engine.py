@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division
+import logging
+import re
+from datetime import datetime
+
+import numpy as np
+
+_TIME = r'(\d{1,2}):(\d{1,2}):(\d{1,2})(?:\.(\d{1,6}))?'
+_DIGITS = re.compile(r'\d')
+_DIGIT_RUNS = re.compile(r'9+')
+
+
+class DateFormat(object):
+    """
+    One date layout as a precompiled regex. `order` gives the regex groups
+    holding year, month and day; hour, minute, second and the optional
+    fraction always follow in groups 3 to 6.
+    """
+
+    def __init__(self, name, date_pattern, order):
+        self.name = name
+        self.order = order
+        self.regex = re.compile('^' + date_pattern + ' ' + _TIME + '$')
+        # Matches every line of a newline-joined column in one pass
+        self.column_regex = re.compile('^' + date_pattern + ' ' + _TIME + '$', re.M)
+
+    def fields(self, date_string):
+        """(year, month, day, hour, minute, second, fraction) as strings, None if it does not match"""
+        match = self.regex.match(date_string)
+        if match is None:
+            return None
+        groups = match.groups()
+        year, month, day = (groups[i] for i in self.order)
+        if not (1 <= int(month) <= 12 and 1 <= int(day) <= 31):
+            return None
+        return (year, month, day) + groups[3:6] + (groups[6] or '',)
+
+    def fixed_width_fields(self, date_strings, signature):
+        """
+        Field columns as int64 arrays (microseconds last) of a column whose
+        dates all have the layout `signature`, None otherwise. The digits are
+        read straight from a byte matrix, without parsing each date.
+        """
+        runs = [match.span() for match in _DIGIT_RUNS.finditer(signature)]
+        width = len(signature)
+        if len(runs) not in (6, 7) or (len(runs) == 7 and runs[6][1] - runs[6][0] > 6):
+            return None
+        if any(len(date_string) != width for date_string in date_strings):
+            return None
+        try:
+            codes = np.array(date_strings, dtype='S{0}'.format(width)).view(np.uint8).reshape(-1, width)
+        except (UnicodeError, ValueError):
+            return None
+        layout = np.frombuffer(signature.encode('ascii'), dtype=np.uint8)
+        digit_columns = layout == ord('9')
+        if not (((codes >= 48) & (codes <= 57)) == digit_columns).all():
+            return None
+        # Separators must be the same in every date, not just in the same places
+        if not (codes[:, ~digit_columns] == codes[0, ~digit_columns]).all():
+            return None
+
+        digits = codes.astype(np.int64) - 48
+        values = [digits[:, start:end].dot(10 ** np.arange(end - start - 1, -1, -1)) for start, end in runs]
+        if len(runs) == 6:
+            values.append(np.zeros(len(date_strings), dtype=np.int64))
+        else:
+            values[6] = values[6] * 10 ** (6 - (runs[6][1] - runs[6][0]))
+        return [values[i] for i in self.order] + values[3:7]
+
+    def column_fields(self, date_strings):
+        """Field table of a whole column in one regex pass, None unless every date matches"""
+        matches = self.column_regex.findall('\n'.join(date_strings))
+        if len(matches) != len(date_strings):
+            return None
+        return np.array(matches)[:, list(self.order) + [3, 4, 5, 6]]
+
+
+# Same formats and precedence as before: month first for ambiguous slash dates
+US_FORMAT = DateFormat('%m/%d/%Y %H:%M:%S.%f', r'(\d{1,2})/(\d{1,2})/(\d{4})', (2, 0, 1))  # 09/10/2022 15:17:54.773
+ISO_FORMAT = DateFormat('%Y-%m-%d %H:%M:%S.%f', r'(\d{4})-(\d{1,2})-(\d{1,2})', (0, 1, 2))  # 2022-09-10 15:17:54.773
+EUROPEAN_FORMAT = DateFormat('%d/%m/%Y %H:%M:%S.%f', r'(\d{1,2})/(\d{1,2})/(\d{4})', (2, 1, 0))  # 10/09/2022 15:17:54.773
+DATE_FORMATS = (US_FORMAT, ISO_FORMAT, EUROPEAN_FORMAT)
+
+
+def date_signature(date_string):
+    """Layout of a date string with every digit replaced, e.g. 99/99/9999 99:99:99.999"""
+    return _DIGITS.sub('9', date_string)
+
+
+def _days_from_civil(year, month, day):
+    """Days since 1970-01-01 of proleptic Gregorian dates, element-wise on int64 arrays"""
+    year = year - (month <= 2)
+    era = np.floor_divide(year, 400)
+    year_of_era = year - era * 400
+    day_of_year = (153 * np.where(month > 2, month - 3, month + 9) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    return era * 146097 + day_of_era - 719468
+
+
+def columns_to_microseconds(year, month, day, hour, minute, second, microsecond):
+    """
+    Microseconds since 1970-01-01 as int64 from int64 field columns, and
+    a mask of the rows whose fields are in range. The dates carry no time
+    zone, so the values are only meaningful relative to each other.
+    """
+    days = _days_from_civil(year, month, day)
+    seconds = days * 86400 + hour * 3600 + minute * 60 + second
+    # Same limits as datetime(): no February 30th and no leap seconds
+    month_length = _days_from_civil(year + (month == 12), month % 12 + 1, 1) - _days_from_civil(year, month, 1)
+    valid = ((year >= 1) & (month >= 1) & (month <= 12) & (day >= 1) & (day <= month_length)
+             & (hour < 24) & (minute < 60) & (second < 60))
+    return seconds * 1000000 + microsecond, valid
+
+
+def fields_to_microseconds(rows):
+    """Microseconds and valid mask of (year, month, day, hour, minute, second, fraction) string rows"""
+    if not len(rows):
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=bool)
+    table = np.array(rows)
+    columns = [table[:, i].astype(np.int64) for i in range(6)]
+    columns.append(np.char.ljust(table[:, 6], 6, '0').astype(np.int64))
+    return columns_to_microseconds(*columns)
+
+
+class DateEngine(object):
+    """
+    Parses projection dates. Unambiguous layouts are detected once and
+    remembered per date signature, so every later file with the same
+    layout skips detection. Slash dates are decided for each file, since
+    day-first and month-first dates share a signature: a first field above
+    12 means day first, a second field above 12 month first, and month
+    first is kept otherwise. Columns convert to int64 microsecond arrays in
+    one pass, from a byte matrix when all dates have the same width and
+    with one precompiled regex otherwise; dates that do not parse are masked.
+    """
+
+    def __init__(self):
+        self._formats = {}  # date signature -> DateFormat, for layouts that are not ambiguous
+        self._unparsable = set()  # signatures already reported
+        self.logger = logging.getLogger(__name__)  # Logging is configured by the processor
+
+    @staticmethod
+    def _detect(date_strings):
+        """Format of the dates of one file, None if nothing matches the first date"""
+        first = date_strings[0]
+        date_format = next((candidate for candidate in DATE_FORMATS if candidate.fields(first) is not None), None)
+        if date_format is None or date_format.order[0] != 2:
+            return date_format
+        for date_string in date_strings:
+            match = US_FORMAT.regex.match(date_string)
+            if match is None:
+                continue
+            if int(match.group(1)) > 12:
+                return EUROPEAN_FORMAT
+            if int(match.group(2)) > 12:
+                return US_FORMAT
+        return US_FORMAT
+
+    def detect_format(self, date_strings):
+        """
+        DateFormat of the date strings of one file, from the cache if their
+        signature was seen before and is not a slash date.
+        """
+        signature = date_signature(date_strings[0])
+        date_format = self._formats.get(signature)
+        if date_format is None:
+            date_format = self._detect(date_strings)
+            if date_format is None:
+                if signature not in self._unparsable:
+                    self._unparsable.add(signature)
+                    self.logger.warning("Unknown date format: %s", date_strings[0])
+                return None
+            if date_format.order[0] != 2:
+                self._formats[signature] = date_format
+        return date_format
+
+    def _fields(self, value, date_format):
+        """Field row of one date, trying the detected format first"""
+        if isinstance(value, datetime):
+            return tuple(str(part) for part in (value.year, value.month, value.day, value.hour,
+                                                 value.minute, value.second, "{0:06d}".format(value.microsecond)))
+        for candidate in ((date_format,) if date_format else ()) + DATE_FORMATS:
+            fields = candidate.fields(value)
+            if fields is not None:
+                return fields
+        return None
+
+    @staticmethod
+    def _strings(dates):
+        return [value if isinstance(value, datetime) else str(value or '').strip() for value in dates]
+
+    def to_microseconds(self, dates):
+        """
+        int64 array of microseconds since 1970-01-01 for the dates of one
+        file and a mask of the dates that parsed. Differences are exact.
+        """
+        strings = self._strings(dates)
+        if not strings:
+            return fields_to_microseconds([])
+        date_format = None
+        if strings[0] and not any(isinstance(value, datetime) for value in strings):
+            date_format = self.detect_format(strings)
+        return self._convert(strings, date_format)
+
+    def spans(self, starts, ends):
+        """
+        Microseconds of the start and end dates of many files, one row per
+        file, and a mask of the rows where both parse. The layout is
+        detected per row from its own two dates.
+        """
+        starts, ends = self._strings(starts), self._strings(ends)
+        start_us = np.zeros(len(starts), dtype=np.int64)
+        end_us = np.zeros(len(starts), dtype=np.int64)
+        valid = np.zeros(len(starts), dtype=bool)
+        rows_by_format = {}
+        for i, pair in enumerate(zip(starts, ends)):
+            date_format = None
+            if all(pair) and not any(isinstance(value, datetime) for value in pair):
+                date_format = self.detect_format(list(pair))
+            rows_by_format.setdefault(date_format, []).append(i)
+        for date_format, rows in rows_by_format.items():
+            start_us[rows], start_ok = self._convert([starts[i] for i in rows], date_format)
+            end_us[rows], end_ok = self._convert([ends[i] for i in rows], date_format)
+            valid[rows] = start_ok & end_ok
+        return start_us, end_us, valid
+
+    def _convert(self, strings, date_format):
+        """Microseconds and valid mask of a column, in one pass if every date has `date_format`"""
+        if date_format is not None:
+            result = None
+            columns = date_format.fixed_width_fields(strings, date_signature(strings[0]))
+            if columns is not None:
+                result = columns_to_microseconds(*columns)
+            else:
+                table = date_format.column_fields(strings)
+                if table is not None:
+                    result = fields_to_microseconds(table)
+            if result is not None and result[1].all():
+                return result
+
+        # Mixed or partly broken column, or a remembered format that does not fit: parse date by date
+        microseconds = np.zeros(len(strings), dtype=np.int64)
+        valid = np.zeros(len(strings), dtype=bool)
+        rows, positions = [], []
+        for i, value in enumerate(strings):
+            fields = self._fields(value, date_format) if value else None
+            if fields is not None:
+                rows.append(fields)
+                positions.append(i)
+        if rows:
+            microseconds[positions], valid[positions] = fields_to_microseconds(rows)
+        return microseconds, valid
+
+    def to_epoch(self, dates):
+        """float64 array of seconds since 1970-01-01 for a column of dates, NaN where a date does not parse"""
+        microseconds, valid = self.to_microseconds(dates)
+        return np.where(valid, microseconds / 1e6, np.nan)
+
+    def parse(self, date_string, column=None):
+        """
+        datetime of a single date string, None if it does not parse. The
+        other dates of the file in `column` help to tell day-first from
+        month-first dates.
+        """
+        if not date_string:
+            return None
+        date_string = str(date_string).strip()
+        others = [str(value).strip() for value in column or () if value and not isinstance(value, datetime)]
+        date_format = self.detect_format([date_string] + others)
+        fields = self._fields(date_string, date_format)
+        if fields is None:
+            return None
+        year, month, day, hour, minute, second, fraction = fields
+        try:
+            return datetime(int(year), int(month), int(day), int(hour), int(minute), int(second),
+                            int(fraction.ljust(6, '0')))
+        except ValueError:
+            self.logger.debug("Invalid date: %s", date_string)
+            return None
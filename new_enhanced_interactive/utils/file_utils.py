@@ -1,51 +1,114 @@
 # -*- coding: utf-8 -*-
 from __future__ import print_function
+import fnmatch
 import os
+from new_enhanced_interactive.utils.parallel_walk import (
+    DEFAULT_PRUNE_DIRS,
+    DEFAULT_WALK_CONCURRENCY,
+    parallel_walk
+)
 
 def is_drift_file(file_path):
     """Check if file is a drift file based on name"""
     filename = os.path.basename(file_path).lower()
     return 'drift' in filename
 
-def find_txrm_files(search_path, include_drift=False):
-    txrm_files = []
-    folder_structure = {}
-    total_files = 0
-    drift_files = 0
-    
-    print("\nSearching for .txrm files in: {0}".format(search_path))
-    
+def file_size(file_path):
+    """Size of a file in bytes, None if it cannot be read"""
     try:
-        for root, _, filenames in os.walk(search_path):
-            txrm_in_folder = [f for f in filenames if f.lower().endswith('.txrm')]
-            if txrm_in_folder:
-                if not include_drift:
-                    txrm_in_folder = [f for f in txrm_in_folder if not is_drift_file(f)]
-                
-                rel_path = os.path.relpath(root, search_path)
-                folder_structure[rel_path] = len(txrm_in_folder)
-                total_files += len(txrm_in_folder)
-                
-                for txrm_file in txrm_in_folder:
-                    full_path = os.path.join(root, txrm_file)
-                    txrm_files.append(full_path)
-                    if is_drift_file(txrm_file):
-                        drift_files += 1
-                    print("Found: {0}".format(full_path))
+        return os.path.getsize(file_path)
+    except OSError:
+        return None
+
+def matches_patterns(file_path, root, include_patterns=None, exclude_patterns=None):
+    """
+    Check a file against include/exclude glob patterns.
+    Patterns are matched case-insensitively against the path relative to
+    `root` (with / separators) and against the file name.
+    """
+    rel_path = os.path.relpath(file_path, root).replace('\\', '/').lower()
+    file_name = os.path.basename(file_path).lower()
+
+    def _matches(patterns):
+        return any(
+            fnmatch.fnmatchcase(rel_path, pattern.lower()) or
+            fnmatch.fnmatchcase(file_name, pattern.lower())
+            for pattern in patterns
+        )
+
+    if include_patterns and not _matches(include_patterns):
+        return False
+    return not (exclude_patterns and _matches(exclude_patterns))
+
+class DiscoverySummary(object):
+    """Counts collected while TXRM files are discovered"""
 
+    def __init__(self, search_path, include_drift=False):
+        self.search_path = search_path
+        self.include_drift = include_drift
+        self.folder_counts = {}
+        self.total_files = 0
+        self.drift_files = 0
+        self.complete = False  # Set once the whole tree has been walked
+
+    def print_summary(self):
         print("\nFolder Structure Summary:")
-        for folder, count in folder_structure.items():
+        for folder, count in self.folder_counts.items():
             print("  {0}: {1} TXRM files".format(folder, count))
-        print("\nTotal TXRM files found: {0}".format(total_files))
-        if drift_files > 0:
+        print("\nTotal TXRM files found: {0}".format(self.total_files))
+        if self.drift_files > 0:
             print("Drift files {0}: {1}".format(
-                "included" if include_drift else "excluded",
-                drift_files
+                "included" if self.include_drift else "excluded",
+                self.drift_files
             ))
+
+def iter_txrm_files(search_path, include_drift=False, summary=None,
+                    walk_concurrency=DEFAULT_WALK_CONCURRENCY, prune_dirs=DEFAULT_PRUNE_DIRS):
+    """
+    Yield TXRM file paths below `search_path` as soon as they are found.
+    Folder and drift counts are collected in `summary` (a DiscoverySummary),
+    which is marked complete when the walk has finished. Sibling folders are
+    listed concurrently by up to `walk_concurrency` threads; hidden folders
+    and `prune_dirs` are skipped.
+    """
+    if summary is None:
+        summary = DiscoverySummary(search_path, include_drift)
     
+    try:
+        for root, _, filenames in parallel_walk(search_path, walk_concurrency, prune_dirs):
+            txrm_in_folder = [f for f in filenames if f.lower().endswith('.txrm')]
+            if not txrm_in_folder:
+                continue
+            
+            drift_in_folder = [f for f in txrm_in_folder if is_drift_file(f)]
+            summary.drift_files += len(drift_in_folder)
+            if not include_drift:
+                txrm_in_folder = [f for f in txrm_in_folder if not is_drift_file(f)]
+            
+            rel_path = os.path.relpath(root, search_path)
+            summary.folder_counts[rel_path] = len(txrm_in_folder)
+            summary.total_files += len(txrm_in_folder)
+            
+            for txrm_file in txrm_in_folder:
+                yield os.path.join(root, txrm_file)
     except Exception as e:
         print("Directory search error: {0}".format(str(e)))
     
+    summary.complete = True
+
+def find_txrm_files(search_path, include_drift=False,
+                    walk_concurrency=DEFAULT_WALK_CONCURRENCY, prune_dirs=DEFAULT_PRUNE_DIRS):
+    """Walk the whole tree and return all TXRM files, printing a summary"""
+    print("\nSearching for .txrm files in: {0}".format(search_path))
+    
+    summary = DiscoverySummary(search_path, include_drift)
+    txrm_files = []
+    for full_path in iter_txrm_files(search_path, include_drift, summary,
+                                     walk_concurrency, prune_dirs):
+        txrm_files.append(full_path)
+        print("Found: {0}".format(full_path))
+    
+    summary.print_summary()
     return txrm_files
 
 def get_user_input(prompt, valid_responses=None):
@@ -4,18 +4,57 @@ import os
 import json
 import time
 from datetime import datetime
-from new_enhanced_interactive.utils.github_utils import GitHubManager
+from new_enhanced_interactive.utils.file_utils import file_size
+from new_enhanced_interactive.utils.github_utils import GitHubManager, LAYOUT_SNAPSHOT, ENGINE_PORCELAIN
+from new_enhanced_interactive.utils.git_sync import GitSyncWorker
+from new_enhanced_interactive.utils.metadata_cache import MetadataCache
+from new_enhanced_interactive.utils.parallel_walk import (
+    DEFAULT_PRUNE_DIRS,
+    DEFAULT_WALK_CONCURRENCY,
+    parallel_walk
+)
+from new_enhanced_interactive.utils.progress_tracker import ProgressTracker, SNAPSHOT_FILE_NAME
+from new_enhanced_interactive.utils.sharding import host_name, host_output_name
+from new_enhanced_interactive.utils.stage_timer import StageReport
+from new_enhanced_interactive.utils.work_queue import DEFAULT_RETRY_DELAY, SharedWorkQueue
 
 class TXRMFileWatcher(object):
     def __init__(self, processor, config):
         self.processor = processor
         self.config = config
+        self.processor.trace_calls = self.config.config.get('trace_xradia_calls', False)
+        self.processor.metadata_extractor.projection_detail = self.config.config.get('projection_detail', 'all')
+        if self.config.config.get('metadata_cache_enabled', False):
+            self.processor.metadata_cache = MetadataCache(self.config.config.get('metadata_cache_dir') or None)
         self.processed_files = self._load_processed_files()
+        self.stage_report = StageReport()  # Stage timings of the current watch cycle
+        # Throughput and latency histograms since the watcher started
+        self.progress = ProgressTracker(report_interval=self.config.config.get('progress_interval', 30))
         
         # Initialize GitHub manager if enabled
         self.github_manager = None
+        self.git_sync = None
         if self.config.config.get('github_enabled', False):  # Use get() with default False
             self.github_manager = self._setup_github_manager()
+        if self.github_manager:
+            # Pushes run in the background so a slow remote does not stall processing
+            self.git_sync = GitSyncWorker(
+                self.github_manager,
+                self.config.config.get('git_sync_state', 'git_sync_state.json')
+            )
+        
+        # Initialize shared work queue if several workstations watch the same share
+        self.work_queue = None
+        self._announced = set()  # Queued files counted in the progress totals
+        if self.config.config.get('work_queue_enabled', False):
+            self.work_queue = self._setup_work_queue()
+        # Workstations sharing a queue only see the files they processed, so each writes its own
+        # cumulative CSV and progress snapshot; `main merge --hosts` combines the CSVs
+        self.csv_name = None
+        self.snapshot_name = SNAPSHOT_FILE_NAME
+        if self.work_queue:
+            self.csv_name = host_output_name()
+            self.snapshot_name = "{0}_{1}.json".format(os.path.splitext(SNAPSHOT_FILE_NAME)[0], host_name())
     
     def _load_processed_files(self):
         """Load list of already processed files"""
@@ -40,7 +79,12 @@ class TXRMFileWatcher(object):
         new_files = []
         drift_files_skipped = 0
         try:
-            for root, _, files in os.walk(self.config.config['watch_directory']):
+            walker = parallel_walk(
+                self.config.config['watch_directory'],
+                self.config.config.get('walk_concurrency', DEFAULT_WALK_CONCURRENCY),
+                self.config.config.get('prune_dirs', DEFAULT_PRUNE_DIRS)
+            )
+            for root, _, files in walker:
                 for txrm_file in files:
                     if txrm_file.lower().endswith('.txrm'):
                         is_drift = 'drift' in txrm_file.lower()
@@ -73,7 +117,9 @@ class TXRMFileWatcher(object):
             
             manager = GitHubManager(
                 github_config['repo_path'],
-                github_config['branch']
+                github_config['branch'],
+                github_config.get('layout', LAYOUT_SNAPSHOT),
+                github_config.get('sync_engine', ENGINE_PORCELAIN)
             )
             
             # Set token from config
@@ -89,6 +135,25 @@ class TXRMFileWatcher(object):
             print("Continuing without GitHub integration")
         return None
     
+    def _setup_work_queue(self):
+        """Open the shared work queue used to coordinate with other workstations"""
+        watch_dir = self.config.config['watch_directory']
+        db_path = self.config.config.get('work_queue_path') or os.path.join(
+            watch_dir, '.txrm_work_queue.db')
+        try:
+            queue = SharedWorkQueue(
+                db_path,
+                watch_dir,
+                lease_seconds=self.config.config.get('lease_seconds', 300),
+                retry_delay=self.config.config.get('retry_delay', DEFAULT_RETRY_DELAY)
+            )
+            print("Shared work queue: {0} (worker {1})".format(db_path, queue.worker_id))
+            return queue
+        except Exception as e:
+            print("Error opening shared work queue: {0}".format(str(e)))
+            print("Continuing without work queue coordination")
+        return None
+    
     def watch(self):
         """Start watching for new files"""
         print("\nStarting file watch mode...")
@@ -104,8 +169,9 @@ class TXRMFileWatcher(object):
             except Exception as e:
                 print("Warning: Could not create output directory: {0}".format(str(e)))
         
-        if self.github_manager:
+        if self.git_sync:
             print("GitHub integration enabled")
+            self.git_sync.start()
         
         while True:
             try:
@@ -115,6 +181,11 @@ class TXRMFileWatcher(object):
                 
             except KeyboardInterrupt:
                 print("\nStopping watch mode...")
+                if self.progress.histograms:
+                    print("\nLatency percentiles:")
+                    print(self.progress.format_percentiles())
+                if self.git_sync:
+                    self.git_sync.stop(timeout=5)
                 break
             except Exception as e:
                 print("Error in watch loop: {0}".format(str(e)))
@@ -123,6 +194,8 @@ class TXRMFileWatcher(object):
     def _process_new_files(self):
         """Process any new files found in watch directory"""
         new_files = self._get_new_txrm_files()
+        if self.work_queue:
+            return self._process_queued_files(new_files)
         if not new_files:
             return False
         
@@ -131,13 +204,67 @@ class TXRMFileWatcher(object):
             datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         ))
         
+        for file_path in new_files:
+            self.progress.add_file(file_path, file_size(file_path))
         for file_path in new_files:
             self._process_single_file(file_path)
+            self.progress.print_progress()
         
+        self._print_stage_report()
         return True
 
-    def _process_single_file(self, file_path):
-        """Process a single TXRM file"""
+    def _process_queued_files(self, new_files):
+        """Queue new files and process whatever this workstation can lease"""
+        queued = self.work_queue.add_files(new_files)
+        if queued:
+            print("\nQueued {0} new files at {1}".format(
+                queued,
+                datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            ))
+        
+        # Files leased by other workstations are skipped, expired leases are reclaimed
+        processed_any = False
+        while True:
+            file_path = self.work_queue.acquire()
+            if file_path is None:
+                break
+            processed_any = True
+            if file_path not in self._announced:
+                # Retries of a failed file do not count towards the totals again
+                self._announced.add(file_path)
+                self.progress.add_file(file_path, file_size(file_path))
+            try:
+                with self.work_queue.lease(file_path) as lease:
+                    success = self._process_single_file(file_path, lease)
+            except KeyboardInterrupt:
+                # Hand the file back so another workstation can take it right away
+                self.work_queue.release(file_path)
+                raise
+            self.progress.print_progress()
+            if not self.work_queue.complete(file_path, success):
+                print("Warning: Lease on {0} expired before completion".format(file_path))
+        
+        if processed_any:
+            self._print_stage_report()
+        return processed_any
+    
+    def _print_stage_report(self):
+        """Print the stage timings of this watch cycle and start a new one"""
+        self.progress.print_progress(force=True)
+        self.stage_report.print_report("Watch cycle stage timings")
+        self.stage_report.reset()
+        
+        output_dir = self.config.config.get('cumulative_csv_path') or os.getcwd()
+        self.progress.save_snapshot(os.path.join(output_dir, self.snapshot_name))
+
+    def _process_single_file(self, file_path, lease=None):
+        """
+        Process a single TXRM file. With the LeaseRenewer `lease` of a queued
+        file, the cumulative CSV and GitHub sync are skipped if the lease was
+        lost, since another workstation is processing the file by then.
+        """
+        self.processor.last_timer = None
+        metadata = None
         try:
             print("\nProcessing: {0}".format(file_path))
             
@@ -149,7 +276,7 @@ class TXRMFileWatcher(object):
             # Check if file exists
             if not os.path.exists(file_path):
                 print("Error: File does not exist: {0}".format(file_path))
-                return
+                return False
                 
             # Check if file is readable
             try:
@@ -158,36 +285,47 @@ class TXRMFileWatcher(object):
                     f.read(10)
             except Exception as e:
                 print("Error: Cannot read file: {0} - {1}".format(file_path, str(e)))
-                return
+                return False
                 
             # Process the file
             if not self.processor.process_single_file(file_path):
                 print("Failed to process file: {0}".format(file_path))
-                return
+                return False
+            metadata = self.processor.all_metadata[-1]
+            if lease is not None and not lease.still_held():
+                print("Lost the lease on {0}, leaving its results to the workstation that took it over".format(
+                    file_path))
+                self.processor.all_metadata.pop()
+                metadata = None
+                return False
             
             # Mark as processed
             self.processed_files.append(file_path)
             self._save_processed_files()
             
             # Save cumulative CSV
-            csv_path = self.processor.save_cumulative_csv()
+            timer = self.processor.last_timer
+            with timer.stage('cumulative_csv'):
+                csv_path = self.processor.save_cumulative_csv(self.csv_name)
             if not csv_path:
                 print("Warning: Failed to generate cumulative CSV file")
-                return
+                return True
             
             print("Cumulative CSV updated: {0}".format(csv_path))
                 
-            # Only attempt GitHub push if manager is configured
-            if self.github_manager:
-                commit_message = "Update metadata CSV - New file: {0}".format(
-                    os.path.basename(file_path)
-                )
-                
-                if self.github_manager.commit_and_push_csv(csv_path, commit_message):
-                    print("Successfully pushed CSV to GitHub")
-                else:
-                    print("Failed to push CSV to GitHub, continuing processing")
+            # Hand the CSV to the background GitHub sync if configured
+            if self.git_sync:
+                with timer.stage('git_submit'):
+                    self.git_sync.submit(csv_path, [os.path.basename(file_path)])
+                print("CSV queued for GitHub sync")
+            return True
         except Exception as e:
             print("Unexpected error processing file {0}: {1}".format(file_path, str(e)))
             import traceback
-            traceback.print_exc() 
\ No newline at end of file
+            traceback.print_exc()
+            return False
+        finally:
+            timer = self.processor.last_timer
+            if timer is not None:
+                self.stage_report.add(timer.timings, timer.bytes_read)
+            self.progress.record_processed(file_path, metadata, timer) 
\ No newline at end of file
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+DEFAULT_PUSH_ATTEMPTS = 3
+
+
+class GitPlumbingSync(object):
+    """
+    Commit and push files with git plumbing commands.
+
+    Instead of `pull`, `add`, `commit` and `push` on every sync, changed
+    files are staged into the repository's own (persistent) index with one
+    `update-index`, and the commit is built with `write-tree`,
+    `commit-tree` and `update-ref`. None of these touch the network or
+    rescan the working tree. The only network round trip is a single
+    `push`; the remote is fetched and merged only when that push is
+    rejected because another workstation pushed first.
+
+    `run_git(args)` runs a git command in the repository and returns
+    (returncode, stdout, stderr) as text.
+    """
+
+    def __init__(self, run_git, branch="main", push_attempts=DEFAULT_PUSH_ATTEMPTS):
+        self.run_git = run_git
+        self.branch = branch
+        self.push_attempts = push_attempts
+        self._initialized = False
+        self._head = None
+        self._head_tree = None
+
+    def _git(self, args):
+        """Run a git command and return its stripped output, or None on failure"""
+        returncode, output, error = self.run_git(args)
+        if returncode != 0:
+            print("Git command failed: git {0}: {1}".format(' '.join(args), error.strip()))
+            return None
+        return output.strip()
+
+    def _read_head(self):
+        returncode, output, _ = self.run_git(['rev-parse', '--verify', '-q', 'HEAD'])
+        self._head = output.strip() if returncode == 0 else None
+        self._head_tree = self._git(['rev-parse', 'HEAD^{tree}']) if self._head else None
+
+    def initialize(self):
+        """
+        Read the current branch tip once. A repository without commits is
+        first brought up to date with the remote branch, if there is one.
+        """
+        if self._initialized:
+            return True
+        self._read_head()
+        if self._head is None:
+            returncode, _, _ = self.run_git(['ls-remote', '--exit-code', '--heads', 'origin', self.branch])
+            if returncode == 0:
+                if self._git(['pull', '--no-rebase', '--no-edit', 'origin', self.branch]) is None:
+                    return False
+                self._read_head()
+        self._initialized = True
+        return True
+
+    def commit(self, paths, message):
+        """
+        Commit the working tree versions of `paths` (relative to the
+        repository, with / separators) on top of the current tip.
+        Returns False on error; no commit is made if nothing changed.
+        """
+        if not self.initialize():
+            return False
+        if paths and self._git(['update-index', '--add', '--'] + list(paths)) is None:
+            return False
+
+        tree = self._git(['write-tree'])
+        if tree is None:
+            return False
+        if tree == self._head_tree:
+            return True
+
+        args = ['commit-tree', tree, '-m', message]
+        if self._head:
+            args[2:2] = ['-p', self._head]
+        commit = self._git(args)
+        if commit is None:
+            return False
+
+        ref = 'refs/heads/{0}'.format(self.branch)
+        update_args = ['update-ref', ref, commit] + ([self._head] if self._head else [])
+        if self._git(update_args) is None:
+            return False
+        self._head = commit
+        self._head_tree = tree
+        return True
+
+    def _merge_remote(self):
+        """Fetch the remote branch and merge it after a rejected push"""
+        if self._git(['fetch', 'origin', self.branch]) is None:
+            return False
+        if self._git(['merge', '--no-edit', '--allow-unrelated-histories', 'FETCH_HEAD']) is None:
+            self.run_git(['merge', '--abort'])
+            return False
+        self._read_head()
+        return True
+
+    def push(self):
+        """
+        Push the branch with a single git invocation.
+        Returns (pushed, merged) where `merged` tells whether remote
+        changes were merged into the working tree.
+        """
+        merged = False
+        for _ in range(self.push_attempts):
+            returncode, output, error = self.run_git(['push', '--porcelain', 'origin', self.branch])
+            if returncode == 0:
+                return True, merged
+            if '[rejected]' not in output and 'rejected' not in error:
+                print("Git push failed: {0}".format(error.strip()))
+                return False, merged
+            # Another workstation pushed first
+            if not self._merge_remote():
+                return False, merged
+            merged = True
+        print("Git push still rejected after {0} attempts".format(self.push_attempts))
+        return False, merged
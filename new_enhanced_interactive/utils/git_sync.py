@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import json
+import os
+import threading
+import time
+
+DEFAULT_INITIAL_BACKOFF = 5.0
+DEFAULT_MAX_BACKOFF = 300.0
+
+
+class GitSyncWorker(object):
+    """
+    Push CSV updates to the git repository on a background thread.
+
+    Processing only hands the newest cumulative CSV to `submit`, which
+    returns immediately. Updates submitted while a push is in flight are
+    coalesced: only the latest CSV is pushed, with a commit message that
+    names every new file since the last successful push. Failed pushes
+    are retried with exponential backoff, and the pending update is
+    saved to `state_path` so it survives a restart.
+    """
+
+    def __init__(self, github_manager, state_path,
+                 initial_backoff=DEFAULT_INITIAL_BACKOFF, max_backoff=DEFAULT_MAX_BACKOFF):
+        self.github_manager = github_manager
+        self.state_path = state_path
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.pending = self._load_state()
+        self.last_error_at = None
+        self._condition = threading.Condition()
+        self._stopping = False
+        self._thread = None
+
+    def _load_state(self):
+        """Load an update left pending by a previous run"""
+        try:
+            if os.path.exists(self.state_path):
+                with open(self.state_path, 'r') as f:
+                    return json.load(f).get('pending')
+        except Exception as e:
+            print("Error loading git sync state: {0}".format(str(e)))
+        return None
+
+    def _save_state(self):
+        """Persist the pending update; called with the condition held"""
+        try:
+            tmp_path = self.state_path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump({'pending': self.pending}, f, indent=4)
+            if os.path.exists(self.state_path):
+                os.remove(self.state_path)
+            os.rename(tmp_path, self.state_path)
+        except Exception as e:
+            print("Error saving git sync state: {0}".format(str(e)))
+
+    def start(self):
+        """Start the background thread"""
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+        if self.pending:
+            print("Resuming pending GitHub sync of {0}".format(self.pending['csv_path']))
+        return self
+
+    def submit(self, csv_path, new_files=None):
+        """Queue the latest cumulative CSV for pushing; replaces any older pending CSV"""
+        with self._condition:
+            files = list(self.pending['new_files']) if self.pending else []
+            for name in new_files or []:
+                if name not in files:
+                    files.append(name)
+            self.pending = {
+                'csv_path': csv_path,
+                'new_files': files,
+                'submitted_at': time.time()
+            }
+            self._save_state()
+            self._condition.notify()
+
+    def _commit_message(self, pending):
+        files = pending['new_files']
+        if not files:
+            return None
+        if len(files) == 1:
+            return "Update metadata CSV - New file: {0}".format(files[0])
+        return "Update metadata CSV - {0} new files: {1}".format(len(files), ", ".join(files))
+
+    def _sync(self, pending):
+        """Push one pending update. Returns True if it no longer needs to be retried."""
+        if not os.path.exists(pending['csv_path']):
+            print("GitHub sync skipped, CSV no longer exists: {0}".format(pending['csv_path']))
+            return True
+        return self.github_manager.commit_and_push_csv(
+            pending['csv_path'], self._commit_message(pending))
+
+    def _run(self):
+        backoff = self.initial_backoff
+        while True:
+            with self._condition:
+                while not self.pending and not self._stopping:
+                    self._condition.wait(1.0)
+                if self._stopping:
+                    return
+                pending = self.pending
+
+            try:
+                success = self._sync(pending)
+            except Exception as e:
+                print("Error during GitHub sync: {0}".format(str(e)))
+                success = False
+
+            with self._condition:
+                if success:
+                    # Keep anything submitted while this push was running
+                    if self.pending is pending:
+                        self.pending = None
+                    else:
+                        self.pending['new_files'] = [
+                            name for name in self.pending['new_files']
+                            if name not in pending['new_files']
+                        ]
+                    self._save_state()
+                    self.last_error_at = None
+                    backoff = self.initial_backoff
+                    print("Successfully pushed CSV to GitHub")
+                    continue
+
+                self.last_error_at = time.time()
+                print("Failed to push CSV to GitHub, retrying in {0:.0f} seconds".format(backoff))
+                # submit() notifies the condition; keep waiting so new files do not cut the backoff short
+                next_attempt_at = self.last_error_at + backoff
+                while not self._stopping:
+                    remaining = next_attempt_at - time.time()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                backoff = min(backoff * 2, self.max_backoff)
+
+    def stop(self, timeout=None):
+        """Stop the background thread; a pending update stays saved for the next run"""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
@@ -3,31 +3,52 @@ from __future__ import print_function
 import os
 import subprocess
 import time
+from new_enhanced_interactive.utils.csv_shards import AppendOnlyCSVShards, GITATTRIBUTES_LINE
+from new_enhanced_interactive.utils.git_plumbing import GitPlumbingSync
+
+# snapshot: copy each cumulative CSV into the repository
+# sharded: append new rows to append-only monthly CSV shards
+LAYOUT_SNAPSHOT = 'snapshot'
+LAYOUT_SHARDED = 'sharded'
+
+# porcelain: pull, add, commit and push on every sync
+# plumbing: build commits locally and fetch only when a push is rejected
+ENGINE_PORCELAIN = 'porcelain'
+ENGINE_PLUMBING = 'plumbing'
 
 class GitHubManager(object):
-    def __init__(self, repo_path, branch="main"):
+    def __init__(self, repo_path, branch="main", layout=LAYOUT_SNAPSHOT, engine=ENGINE_PORCELAIN):
         self.repo_path = repo_path
         self.branch = branch
+        self.layout = layout
+        self.shards = AppendOnlyCSVShards(repo_path) if layout == LAYOUT_SHARDED else None
+        self.plumbing = GitPlumbingSync(self._run_git, branch) if engine == ENGINE_PLUMBING else None
         self.git_env = os.environ.copy()
     
     def set_pat(self, pat):
         """Set Personal Access Token in environment"""
         self.git_env["GIT_PAT"] = pat
     
-    def _run_git_command(self, command):
+    def _run_git(self, args):
+        """Run a git command without a shell. Returns (returncode, stdout, stderr)."""
+        process = subprocess.Popen(
+            ['git'] + list(args),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env=self.git_env,
+            cwd=self.repo_path
+        )
+        output, error = process.communicate()
+        if not isinstance(output, str):
+            output = output.decode('utf-8', 'replace')
+            error = error.decode('utf-8', 'replace')
+        return process.returncode, output, error
+    
+    def _run_git_command(self, args):
         """Run git command and handle errors"""
         try:
-            process = subprocess.Popen(
-                command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                env=self.git_env,
-                cwd=self.repo_path,
-                shell=True
-            )
-            output, error = process.communicate()
-            
-            if process.returncode != 0:
+            returncode, _, error = self._run_git(args)
+            if returncode != 0:
                 print("Git command failed: {0}".format(error))
                 return False
             return True
@@ -35,13 +56,20 @@ class GitHubManager(object):
             print("Error running git command: {0}".format(str(e)))
             return False
     
+    def _has_staged_changes(self):
+        """Check if the index differs from HEAD"""
+        returncode, _, _ = self._run_git(['diff', '--cached', '--quiet'])
+        return returncode != 0
+    
     def setup_repo(self, remote_url):
         """Initialize repo if needed and set remote"""
         if not os.path.exists(os.path.join(self.repo_path, '.git')):
+            if not os.path.exists(self.repo_path):
+                os.makedirs(self.repo_path)
             commands = [
-                'git init',
-                'git branch -M {0}'.format(self.branch),
-                'git remote add origin {0}'.format(remote_url)
+                ['init'],
+                ['branch', '-M', self.branch],
+                ['remote', 'add', 'origin', remote_url]
             ]
             
             for cmd in commands:
@@ -49,6 +77,79 @@ class GitHubManager(object):
                     return False
         return True
     
+    def _pull(self):
+        """Pull the branch if it exists on the remote (it does not for a new repository)"""
+        returncode, _, _ = self._run_git(['ls-remote', '--exit-code', '--heads', 'origin', self.branch])
+        if returncode != 0:
+            return True
+        head_before = self._run_git(['rev-parse', '--verify', '-q', 'HEAD'])[1]
+        if not self._run_git_command(['pull', '--no-rebase', '--no-edit', 'origin', self.branch]):
+            return False
+        if self.shards and self._run_git(['rev-parse', '--verify', '-q', 'HEAD'])[1] != head_before:
+            # A merge may have interleaved rows from other workstations
+            self.shards.reset()
+        return True
+    
+    def _copy_snapshot(self, csv_path):
+        """Copy the whole CSV into the repository. Returns the paths to stage."""
+        csv_name = os.path.basename(csv_path)
+        repo_csv_path = os.path.join(self.repo_path, csv_name)
+        try:
+            with open(csv_path, 'rb') as src, open(repo_csv_path, 'wb') as dst:
+                dst.write(src.read())
+        except Exception as e:
+            print("Error copying CSV file: {0}".format(str(e)))
+            return None
+        return [csv_name]
+    
+    def _append_to_shards(self, csv_path):
+        """Append only the new rows to the monthly shards. Returns the paths to stage."""
+        paths = []
+        attributes_path = os.path.join(self.repo_path, '.gitattributes')
+        try:
+            attributes = ''
+            if os.path.exists(attributes_path):
+                with open(attributes_path, 'r') as f:
+                    attributes = f.read()
+            if GITATTRIBUTES_LINE not in attributes:
+                with open(attributes_path, 'a') as f:
+                    f.write(GITATTRIBUTES_LINE)
+                paths.append('.gitattributes')
+            
+            shard_path, row_count = self.shards.append_new_rows(csv_path)
+        except Exception as e:
+            print("Error appending rows to CSV shards: {0}".format(str(e)))
+            return None
+        
+        if shard_path:
+            print("Appended {0} new rows to {1}".format(row_count, shard_path))
+            paths.append(shard_path)
+        return paths
+    
+    def _layout_paths(self, csv_path):
+        """Write the CSV into the repository for the configured layout. Returns the paths to stage."""
+        if self.layout == LAYOUT_SHARDED:
+            return self._append_to_shards(csv_path)
+        return self._copy_snapshot(csv_path)
+    
+    def _commit_and_push_plumbing(self, csv_path, commit_message):
+        """Commit without pulling first and push once; fetch and merge only on rejection"""
+        # Bring an empty clone up to date before writing shards so rows are not duplicated
+        if not self.plumbing.initialize():
+            return False
+        
+        paths = self._layout_paths(csv_path)
+        if paths is None:
+            return False
+        if not self.plumbing.commit(paths, commit_message):
+            return False
+        
+        pushed, merged = self.plumbing.push()
+        if merged and self.shards:
+            # A merge may have interleaved rows from other workstations
+            self.shards.reset()
+        return pushed
+    
     def commit_and_push_csv(self, csv_path, commit_message=None):
         """Commit and push CSV file to GitHub"""
         if not os.path.exists(csv_path):
@@ -61,27 +162,22 @@ class GitHubManager(object):
                 time.strftime("%Y-%m-%d %H:%M:%S")
             )
         
-        # Copy CSV to repo directory
-        csv_name = os.path.basename(csv_path)
-        repo_csv_path = os.path.join(self.repo_path, csv_name)
+        if self.plumbing:
+            return self._commit_and_push_plumbing(csv_path, commit_message)
         
-        try:
-            with open(csv_path, 'rb') as src, open(repo_csv_path, 'wb') as dst:
-                dst.write(src.read())
-        except Exception as e:
-            print("Error copying CSV file: {0}".format(str(e)))
+        if not self._pull():
             return False
         
-        # Git commands
-        commands = [
-            'git pull origin {0}'.format(self.branch),
-            'git add "{0}"'.format(csv_name),
-            'git commit -m "{0}"'.format(commit_message),
-            'git push origin {0}'.format(self.branch)
-        ]
+        paths = self._layout_paths(csv_path)
+        if paths is None:
+            return False
+        
+        if paths and not self._run_git_command(['add'] + paths):
+            return False
         
-        for cmd in commands:
-            if not self._run_git_command(cmd):
+        # Nothing to commit when retrying after a failed push
+        if self._has_staged_changes():
+            if not self._run_git_command(['commit', '-m', commit_message]):
                 return False
         
-        return True 
\ No newline at end of file
+        return self._run_git_command(['push', 'origin', self.branch])
\ No newline at end of file
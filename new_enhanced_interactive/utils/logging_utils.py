@@ -1,20 +1,173 @@
+import atexit
 import logging
+import logging.handlers
+import multiprocessing
 import os
-from datetime import datetime
-
-def setup_logger(output_dir):
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-    
-    log_file = os.path.join(
-        output_dir,
-        'processing_{0}.log'.format(datetime.now().strftime("%Y%m%d_%H%M%S"))
-    )
-    
-    logging.basicConfig(
-        filename=log_file,
-        level=logging.DEBUG,
-        format='%(asctime)s - %(levelname)s - %(message)s'
-    )
-    
-    return logging.getLogger(__name__) 
\ No newline at end of file
+import threading
+
+try:
+    import Queue as queue  # Python 2
+except ImportError:
+    import queue
+
+try:
+    from logging.handlers import QueueHandler, QueueListener
+except ImportError:
+    # Python 2.7 has no queue handlers; minimal equivalents of the Python 3 classes
+    class QueueHandler(logging.Handler):
+        """Put log records on a queue instead of writing them"""
+
+        def __init__(self, queue):
+            logging.Handler.__init__(self)
+            self.queue = queue
+
+        def prepare(self, record):
+            # Format now so the record no longer references args or tracebacks
+            message = self.format(record)
+            record.message = message
+            record.msg = message
+            record.args = None
+            record.exc_info = None
+            return record
+
+        def emit(self, record):
+            try:
+                self.queue.put_nowait(self.prepare(record))
+            except Exception:
+                self.handleError(record)
+
+    class QueueListener(object):
+        """Write records taken from a queue with the given handlers on a background thread"""
+        _sentinel = None
+
+        def __init__(self, queue, *handlers, **kwargs):
+            self.queue = queue
+            self.handlers = handlers
+            self.respect_handler_level = kwargs.get('respect_handler_level', False)
+            self._thread = None
+
+        def start(self):
+            self._thread = threading.Thread(target=self._monitor)
+            self._thread.daemon = True
+            self._thread.start()
+
+        def handle(self, record):
+            for handler in self.handlers:
+                if not self.respect_handler_level or record.levelno >= handler.level:
+                    handler.handle(record)
+
+        def _monitor(self):
+            while True:
+                record = self.queue.get()
+                if record is self._sentinel:
+                    break
+                self.handle(record)
+
+        def enqueue_sentinel(self):
+            self.queue.put_nowait(self._sentinel)
+
+        def stop(self):
+            self.enqueue_sentinel()
+            self._thread.join()
+            self._thread = None
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(name)s - %(message)s'
+LOG_FILE_NAME = 'processing.log'
+DEFAULT_LOG_LEVEL = 'INFO'
+MAX_LOG_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+
+# Set by configure_logging; reset in forked worker processes
+_state = {'pid': None, 'queue_handler': None, 'file_handler': None, 'listener': None}
+
+
+def _parse_level(value, default=DEFAULT_LOG_LEVEL):
+    """Turn 'DEBUG', 'debug' or '10' into a logging level"""
+    value = str(value or default).strip()
+    if value.isdigit():
+        return int(value)
+    level = logging.getLevelName(value.upper())
+    if not isinstance(level, int):
+        raise ValueError("Unknown log level: {0}".format(value))
+    return level
+
+
+def parse_module_levels(value):
+    """Parse 'name=LEVEL,name=LEVEL' into a dict of logger names and levels"""
+    levels = {}
+    for item in (value or '').split(','):
+        if '=' in item:
+            name, level = item.split('=', 1)
+            levels[name.strip()] = _parse_level(level)
+    return levels
+
+
+def _log_file_path(log_dir):
+    path = os.environ.get('LOG_FILE') or os.path.join(log_dir, LOG_FILE_NAME)
+    if multiprocessing.current_process().name != 'MainProcess':
+        # Worker processes get their own file, rotation is not safe across processes
+        root, extension = os.path.splitext(path)
+        path = "{0}_{1}{2}".format(root, os.getpid(), extension)
+    return path
+
+
+def stop_logging():
+    """Flush queued records and stop the background writer"""
+    if _state['pid'] is None:
+        return
+    logging.getLogger().removeHandler(_state['queue_handler'])
+    # A forked process inherits the handlers but not the writer thread
+    if _state['pid'] == os.getpid():
+        _state['listener'].stop()
+        _state['file_handler'].close()
+    _state.update(pid=None, queue_handler=None, file_handler=None, listener=None)
+
+
+def configure_logging(log_dir, level=None, module_levels=None,
+                      max_bytes=MAX_LOG_BYTES, backup_count=LOG_BACKUP_COUNT):
+    """
+    Send log records through a queue to a rotating file in `log_dir`,
+    written on a background thread so logging never waits for disk I/O.
+
+    The level defaults to the LOG_LEVEL environment variable (INFO if
+    unset) and LOG_MODULE_LEVELS sets levels for individual loggers, e.g.
+    "new_enhanced_interactive.processors=DEBUG". LOG_FILE overrides the
+    file path.
+    """
+    stop_logging()
+
+    log_file = _log_file_path(log_dir)
+    if not os.path.exists(os.path.dirname(os.path.abspath(log_file))):
+        os.makedirs(os.path.dirname(os.path.abspath(log_file)))
+    file_handler = logging.handlers.RotatingFileHandler(
+        log_file, maxBytes=max_bytes, backupCount=backup_count)
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    log_queue = queue.Queue()
+    queue_handler = QueueHandler(log_queue)
+    listener = QueueListener(log_queue, file_handler)
+    listener.start()
+
+    root = logging.getLogger()
+    root.addHandler(queue_handler)
+    root.setLevel(_parse_level(level or os.environ.get('LOG_LEVEL')))
+
+    levels = parse_module_levels(os.environ.get('LOG_MODULE_LEVELS'))
+    levels.update(module_levels or {})
+    for name, module_level in levels.items():
+        logging.getLogger(name).setLevel(module_level)
+
+    _state.update(pid=os.getpid(), queue_handler=queue_handler, file_handler=file_handler, listener=listener)
+
+
+def setup_logger(output_dir, name=None):
+    """
+    Return the logger for `name`, configuring logging into `output_dir`
+    on first use in this process.
+    """
+    if _state['pid'] != os.getpid():
+        configure_logging(output_dir)
+    return logging.getLogger(name or __name__)
+
+
+atexit.register(stop_logging)
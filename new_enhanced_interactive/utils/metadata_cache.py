@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import logging
+import os
+import pickle
+import zlib
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.txrm_metadata_cache')
+
+# Protocol 2 can be read by both Python 2.7 and 3
+PICKLE_PROTOCOL = 2
+
+# Version of the extracted record layout. Bump it whenever extraction adds, drops or changes fields,
+# so that entries written by an older extractor are extracted again instead of served.
+SCHEMA_VERSION = 1
+
+# Record fields that describe this particular copy of the file or run, not its content
+PATH_FIELDS = ('file_path', 'validation_info', 'is_drift_file', 'stage_timings', 'bytes_read', 'xradia_calls')
+
+
+def default_cache_dir():
+    """Cache folder from METADATA_CACHE_DIR, ~/.txrm_metadata_cache by default"""
+    return os.environ.get('METADATA_CACHE_DIR') or DEFAULT_CACHE_DIR
+
+
+class MetadataCache(object):
+    """
+    Extracted metadata records keyed by the SHA-256 of the TXRM file.
+
+    Each record is pickled and zlib-compressed into its own file below
+    `cache_dir`, so copies, renames and moved folders are served without
+    reading the file through XradiaPy again. Workers and workstations can
+    share the folder; entries are written to a temporary file and renamed.
+    Entries of another SCHEMA_VERSION count as misses and are replaced.
+    """
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.hits = 0
+        self.misses = 0
+        self.logger = logging.getLogger(__name__)  # Logging is configured by the processor
+
+    def _entry_path(self, file_hash):
+        return os.path.join(self.cache_dir, file_hash[:2], file_hash + '.pkl.z')
+
+    def get(self, file_hash, file_path, accept=None):
+        """
+        Cached metadata of the file with `file_hash` as found at `file_path`,
+        None on a miss. Entries for which `accept(metadata)` is false, e.g.
+        with less detail than needed, count as misses.
+        """
+        path = self._entry_path(file_hash)
+        try:
+            with open(path, 'rb') as f:
+                entry = pickle.loads(zlib.decompress(f.read()))
+        except (IOError, OSError):
+            self.misses += 1
+            return None
+        except Exception as e:
+            # A truncated or foreign entry is treated as a miss and overwritten later
+            self.logger.warning("Ignoring unreadable cache entry %s: %s", path, str(e))
+            self.misses += 1
+            return None
+
+        if entry.get('schema_version') != SCHEMA_VERSION:
+            self.logger.debug("Ignoring cache entry %s of schema version %s", path, entry.get('schema_version'))
+            self.misses += 1
+            return None
+        metadata = entry['metadata']
+        if accept is not None and not accept(metadata):
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._rewrite_paths(metadata, entry['file_path'], file_path)
+        return metadata
+
+    @staticmethod
+    def _rewrite_paths(metadata, cached_path, file_path):
+        """Point the name reported by GetName at the new location"""
+        basic_info = metadata.get('basic_info', {})
+        name = basic_info.get('file_name')
+        if not name or not cached_path:
+            return
+        new_path = str(file_path).replace('\\', '/')
+        if name == cached_path:
+            basic_info['file_name'] = new_path
+        elif name == os.path.basename(cached_path):
+            basic_info['file_name'] = os.path.basename(new_path)
+
+    def put(self, file_hash, metadata):
+        """Store a record, leaving out the fields that belong to this copy of the file. Returns False on error."""
+        entry = {
+            'schema_version': SCHEMA_VERSION,
+            'file_path': str(metadata.get('file_path', '')).replace('\\', '/'),
+            'metadata': dict((key, value) for key, value in metadata.items() if key not in PATH_FIELDS),
+        }
+        path = self._entry_path(file_hash)
+        temp_path = "{0}.{1}.tmp".format(path, os.getpid())
+        try:
+            folder = os.path.dirname(path)
+            try:
+                os.makedirs(folder)
+            except OSError:
+                if not os.path.isdir(folder):  # Another worker may have just created it
+                    raise
+            with open(temp_path, 'wb') as f:
+                f.write(zlib.compress(pickle.dumps(entry, PICKLE_PROTOCOL)))
+            if os.path.exists(path):
+                os.remove(path)  # os.rename does not replace files on Windows
+            os.rename(temp_path, path)
+            return True
+        except Exception as e:
+            self.logger.warning("Could not write cache entry %s: %s", path, str(e))
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return False
+
+    def summary(self):
+        return "Metadata cache: {0} hits, {1} misses ({2})".format(self.hits, self.misses, self.cache_dir)
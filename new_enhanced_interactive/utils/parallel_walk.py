@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import os
+import threading
+
+try:
+    import Queue as queue  # Python 2
+except ImportError:
+    import queue
+
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir  # Optional backport for Python 2.7
+    except ImportError:
+        scandir = None
+
+DEFAULT_WALK_CONCURRENCY = 8
+
+# Folders that never contain scans: our own output and OS bookkeeping folders
+DEFAULT_PRUNE_DIRS = (
+    'metadata_output',
+    '$recycle.bin',
+    'system volume information',
+    '@eadir',
+    '#recycle',
+)
+
+
+def should_prune(dir_name, prune_dirs=DEFAULT_PRUNE_DIRS, prune_hidden=True):
+    """Check if a directory should be skipped during the walk"""
+    if prune_hidden and dir_name.startswith('.'):
+        return True
+    return dir_name.lower() in [name.lower() for name in prune_dirs]
+
+
+def _list_dir(path):
+    """
+    List one directory. Returns (dirnames, filenames, descend) where `descend`
+    holds the subdirectories that are not symlinks, matching os.walk which
+    reports symlinked folders but does not follow them.
+    """
+    dirnames, filenames, descend = [], [], []
+    if scandir is not None:
+        for entry in scandir(path):
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            if is_dir:
+                dirnames.append(entry.name)
+                if not entry.is_symlink():
+                    descend.append(entry.name)
+            else:
+                filenames.append(entry.name)
+        return dirnames, filenames, descend
+
+    for name in os.listdir(path):
+        full_path = os.path.join(path, name)
+        if os.path.isdir(full_path):
+            dirnames.append(name)
+            if not os.path.islink(full_path):
+                descend.append(name)
+        else:
+            filenames.append(name)
+    return dirnames, filenames, descend
+
+
+def _serial_walk(top, prune_dirs, prune_hidden):
+    for dirpath, dirnames, filenames in os.walk(top):
+        dirnames[:] = [d for d in dirnames if not should_prune(d, prune_dirs, prune_hidden)]
+        yield dirpath, dirnames, filenames
+
+
+def parallel_walk(top, max_workers=DEFAULT_WALK_CONCURRENCY,
+                  prune_dirs=DEFAULT_PRUNE_DIRS, prune_hidden=True):
+    """
+    Walk a directory tree like os.walk, listing up to `max_workers`
+    directories at the same time.
+
+    Yields (dirpath, dirnames, filenames) tuples. The set of results is the
+    same as os.walk(top) with pruned directories removed, but the order
+    depends on which listings finish first. Directories that cannot be
+    listed are skipped, as os.walk does by default. With max_workers <= 1
+    this falls back to a serial os.walk.
+    """
+    if max_workers <= 1:
+        for result in _serial_walk(top, prune_dirs, prune_hidden):
+            yield result
+        return
+
+    work = queue.Queue()
+    results = queue.Queue()
+
+    def _worker():
+        while True:
+            dirpath = work.get()
+            if dirpath is None:
+                return
+            try:
+                dirnames, filenames, descend = _list_dir(dirpath)
+            except Exception:
+                results.put((dirpath, None, None, []))
+                continue
+            dirnames = [d for d in dirnames if not should_prune(d, prune_dirs, prune_hidden)]
+            subdirs = [os.path.join(dirpath, d) for d in descend if d in dirnames]
+            # Report before queueing the children so the consumer counts them first
+            results.put((dirpath, dirnames, filenames, subdirs))
+            for subdir in subdirs:
+                work.put(subdir)
+
+    threads = [threading.Thread(target=_worker) for _ in range(max_workers)]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+
+    work.put(top)
+    outstanding = 1
+    try:
+        while outstanding:
+            try:
+                # Poll with a timeout so Ctrl+C is delivered on Python 2
+                dirpath, dirnames, filenames, subdirs = results.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            outstanding += len(subdirs) - 1
+            if dirnames is not None:
+                yield dirpath, dirnames, filenames
+    finally:
+        # Also reached when the consumer stops early: drop queued work and stop the threads
+        try:
+            while True:
+                work.get_nowait()
+        except queue.Empty:
+            pass
+        for _ in threads:
+            work.put(None)
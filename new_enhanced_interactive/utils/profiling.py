@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import cProfile
+import os
+import pstats
+import time
+
+try:
+    import tracemalloc  # Python 3.4+
+except ImportError:
+    tracemalloc = None
+
+DEFAULT_TOP_N = 30
+TRACEMALLOC_FRAMES = 10
+
+# Snapshot taken at the memory_checkpoint with the most traced memory
+_checkpoint = {'label': None, 'size': 0, 'snapshot': None}
+
+
+def memory_checkpoint(label):
+    """
+    Keep a tracemalloc snapshot if more memory is traced now than at any
+    earlier checkpoint. Call where short-lived structures are at their
+    largest; does nothing unless memory profiling is running.
+    """
+    if tracemalloc is None or not tracemalloc.is_tracing():
+        return
+    size = tracemalloc.get_traced_memory()[0]
+    # Snapshots are not cheap, only take one for a clearly larger peak
+    if size > _checkpoint['size'] * 1.1:
+        _checkpoint.update(label=label, size=size, snapshot=tracemalloc.take_snapshot())
+
+
+def _write_cpu_summary(profile, path, top_n):
+    with open(path, 'w') as f:
+        for sort_key, label in (('cumulative', 'cumulative time'), ('tottime', 'own time')):
+            f.write("Top {0} functions by {1}\n".format(top_n, label))
+            f.write("=" * 50 + "\n")
+            stats = pstats.Stats(profile, stream=f)
+            stats.strip_dirs().sort_stats(sort_key).print_stats(top_n)
+            f.write("\n")
+
+
+def _write_snapshot(f, title, snapshot, top_n):
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<unknown>"),
+    ))
+    f.write("{0}: top {1} allocation sites by size\n".format(title, top_n))
+    f.write("=" * 50 + "\n")
+    for stat in snapshot.statistics('lineno')[:top_n]:
+        f.write("{0}\n".format(stat))
+
+    f.write("\n{0}: top 5 allocation tracebacks\n".format(title))
+    f.write("=" * 50 + "\n")
+    for stat in snapshot.statistics('traceback')[:5]:
+        f.write("\n{0} blocks, {1:.1f} KB\n".format(stat.count, stat.size / 1024.0))
+        for line in stat.traceback.format():
+            f.write("{0}\n".format(line))
+    f.write("\n")
+
+
+def _write_memory_summary(path, top_n):
+    current, peak = tracemalloc.get_traced_memory()
+    with open(path, 'w') as f:
+        f.write("Traced memory: {0:.1f} MB at exit, {1:.1f} MB peak\n\n".format(
+            current / (1024.0 * 1024.0), peak / (1024.0 * 1024.0)))
+        if _checkpoint['snapshot'] is not None:
+            _write_snapshot(f, "Largest checkpoint ({0}, {1:.1f} MB)".format(
+                _checkpoint['label'], _checkpoint['size'] / (1024.0 * 1024.0)), _checkpoint['snapshot'], top_n)
+        _write_snapshot(f, "At exit", tracemalloc.take_snapshot(), top_n)
+
+
+def run_profiled(func, output_dir, name, top_n=DEFAULT_TOP_N, trace_memory=False):
+    """
+    Run `func()` under cProfile and return its result.
+
+    Writes profile_<name>_<timestamp>.prof (load with pstats or snakeviz)
+    and a .txt summary of the top `top_n` functions to `output_dir`. With
+    `trace_memory` the largest allocation sites found by tracemalloc, at
+    exit and at the largest memory_checkpoint, are written to a
+    _memory.txt file as well. The files are also written when
+    the run is interrupted.
+    """
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    base_path = os.path.join(output_dir, "profile_{0}_{1}".format(
+        name, time.strftime("%Y%m%d_%H%M%S")))
+
+    if trace_memory and tracemalloc is None:
+        print("Memory profiling needs tracemalloc (Python 3.4+), it is not available on this Python")
+        trace_memory = False
+    if trace_memory:
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        return func()
+    finally:
+        profile.disable()
+        profile.dump_stats(base_path + '.prof')
+        _write_cpu_summary(profile, base_path + '.txt', top_n)
+        print("\nCPU profile saved to: {0}.prof (summary in {0}.txt)".format(base_path))
+        if trace_memory:
+            _write_memory_summary(base_path + '_memory.txt', top_n)
+            tracemalloc.stop()
+            _checkpoint.update(label=None, size=0, snapshot=None)
+            print("Memory profile saved to: {0}_memory.txt".format(base_path))
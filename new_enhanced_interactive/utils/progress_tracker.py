@@ -1,21 +1,311 @@
 # -*- coding: utf-8 -*-
-from __future__ import division
+from __future__ import print_function, division
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+
+INF = float('inf')
+
+# Upper bounds of the latency buckets in seconds
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+                   30.0, 60.0, 120.0, 300.0, 600.0, INF)
+
+# (upper bound, label) of the file size and projection count buckets
+SIZE_BUCKETS = (
+    (100 * 1024 ** 2, '<100MB'),
+    (1024 ** 3, '100MB-1GB'),
+    (10 * 1024 ** 3, '1GB-10GB'),
+    (INF, '>=10GB'),
+)
+PROJECTION_BUCKETS = (
+    (100, '<=100'),
+    (1000, '101-1000'),
+    (5000, '1001-5000'),
+    (INF, '>5000'),
+)
+
+SNAPSHOT_FILE_NAME = 'latency_histograms.json'
+
+# Rates are measured over the files finished in the last THROUGHPUT_WINDOW seconds
+THROUGHPUT_WINDOW = 300.0
+DEFAULT_REPORT_INTERVAL = 30.0
+
+ALL = 'all'
+UNKNOWN = 'unknown'
+TOTAL_STAGE = 'total'
+
+
+def format_duration(seconds):
+    """Format seconds as H:MM:SS, '--' if unknown"""
+    if seconds is None:
+        return '--'
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return "{0}:{1:02d}:{2:02d}".format(hours, minutes, seconds)
+
+
+def format_size(size):
+    """Format a byte count with the largest fitting unit up to TB"""
+    size = float(size)
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(size) < 1024.0:
+            return "{0:.1f} {1}".format(size, unit)
+        size /= 1024.0
+    return "{0:.1f} TB".format(size)
+
+
+def bucket_label(value, buckets):
+    """Label of the first bucket whose upper bound holds `value`"""
+    if value is None:
+        return UNKNOWN
+    for bound, label in buckets:
+        if value <= bound:
+            return label
+    return buckets[-1][1]
+
+
+class LatencyHistogram(object):
+    """Counts of durations in fixed buckets; percentiles are interpolated within a bucket"""
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * len(bounds)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        for i, bound in enumerate(self.bounds):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, pct):
+        if not self.count:
+            return None
+        rank = pct / 100.0 * self.count
+        cumulative = 0
+        lower = 0.0
+        for bound, count in zip(self.bounds, self.counts):
+            if count and cumulative + count >= rank:
+                if bound == INF:
+                    return self.max
+                return min(lower + (bound - lower) * (rank - cumulative) / count, self.max)
+            cumulative += count
+            lower = bound
+        return self.max
+
+    def to_dict(self):
+        return OrderedDict([
+            ('count', self.count),
+            ('sum', self.sum),
+            ('max', self.max),
+            ('p50', self.percentile(50)),
+            ('p95', self.percentile(95)),
+            ('p99', self.percentile(99)),
+            ('buckets', self.counts),
+        ])
+
 
 class ProgressTracker(object):  # Make it a new-style class
-    def __init__(self, total_files):
+    """
+    Counts processed and failed files and collects latency histograms per
+    processing stage. Every file is counted in its file size bucket and
+    projection count bucket as well as in the 'all' buckets.
+
+    Files announced with `add_file` count towards the total; their sizes
+    give a size-weighted ETA from the bytes per second of the recent
+    window, so a queue of large scans is not estimated like small ones.
+    Files may be announced from another thread than the one recording
+    results, e.g. the task feeder of a multiprocessing pool, so the
+    counters are updated under a lock.
+    """
+
+    def __init__(self, total_files=0, window=THROUGHPUT_WINDOW, report_interval=DEFAULT_REPORT_INTERVAL):
         self.total_files = float(total_files)
         self.processed_files = 0
         self.failed_files = []
-        
-    def update(self, file_path, success):
-        self.processed_files += 1
-        if not success:
-            self.failed_files.append(file_path)
-            
-    def get_progress(self):
+        self.histograms = OrderedDict()  # (stage, size bucket, projection bucket) -> histogram
+        self.started_at = time.time()
+        self.window = window
+        self.report_interval = report_interval
+        self.total_bytes = 0
+        self.bytes_processed = 0
+        self.pending_bytes = 0
+        self._pending_sizes = {}  # file path -> size of announced files not finished yet
+        self._recent = deque()  # (finished at, bytes) of files in the window
+        self._last_report = self.started_at
+        self._lock = threading.RLock()
+
+    def add_file(self, file_path, file_size=None):
+        """Announce a file that is going to be processed"""
+        with self._lock:
+            self.total_files += 1
+            if file_size:
+                self.total_bytes += file_size
+                self.pending_bytes += file_size
+                self._pending_sizes[file_path] = file_size
+
+    def discard_file(self, file_path):
+        """Forget an announced file that will not be processed after all"""
+        with self._lock:
+            self.total_files = max(self.total_files - 1, 0)
+            size = self._pending_sizes.pop(file_path, 0)
+            self.total_bytes -= size
+            self.pending_bytes -= size
+
+    def update(self, file_path, success, file_size=None):
+        with self._lock:
+            # A retry of a failed file is the same file: it only leaves the failed list if it succeeds now
+            retry = file_path in self.failed_files
+            if retry and success:
+                self.failed_files.remove(file_path)
+            elif not retry:
+                self.processed_files += 1
+                if not success:
+                    self.failed_files.append(file_path)
+            announced = self._pending_sizes.pop(file_path, 0)
+            self.pending_bytes -= announced
+            size = announced or file_size or 0
+            if not retry:
+                self.bytes_processed += size
+            now = time.time()
+            self._recent.append((now, size))
+            self._trim_window(now)
+
+    def _trim_window(self, now):
+        while self._recent and self._recent[0][0] < now - self.window:
+            self._recent.popleft()
+
+    def get_throughput(self):
+        """Files/s and bytes/s over the recent window, and the ETA in seconds (None if unknown)"""
+        with self._lock:
+            now = time.time()
+            self._trim_window(now)
+            span = now - max(self.started_at, now - self.window)
+            files_per_second = len(self._recent) / span if span > 0 else 0.0
+            bytes_per_second = sum(size for _, size in self._recent) / span if span > 0 else 0.0
+            remaining_files = max(self.total_files - self.processed_files, 0)
+            pending_bytes = self.pending_bytes
+
+        eta = None
+        if not remaining_files:
+            eta = 0.0
+        elif pending_bytes and bytes_per_second:
+            eta = pending_bytes / bytes_per_second
+        elif files_per_second:
+            eta = remaining_files / files_per_second
         return {
-            'total': int(self.total_files),
-            'processed': self.processed_files,
-            'failed': len(self.failed_files),
-            'percentage': (self.processed_files / self.total_files) * 100.0
-        }
\ No newline at end of file
+            'files_per_second': files_per_second,
+            'mb_per_second': bytes_per_second / (1024.0 * 1024.0),
+            'eta_seconds': eta
+        }
+
+    def format_progress(self):
+        progress = self.get_progress()
+        return "Progress: {0}/{1} files ({2:.1f}%), {3} failed, {4} of {5}, " \
+               "{6:.2f} files/s, {7:.1f} MB/s, elapsed {8}, ETA {9}".format(
+                   progress['processed'], progress['total'], progress['percentage'], progress['failed'],
+                   format_size(progress['bytes_processed']), format_size(progress['total_bytes']),
+                   progress['files_per_second'], progress['mb_per_second'],
+                   format_duration(progress['elapsed_seconds']), format_duration(progress['eta_seconds']))
+
+    def print_progress(self, force=False):
+        """Print the progress line at most once per report interval unless forced"""
+        now = time.time()
+        if not force and now - self._last_report < self.report_interval:
+            return
+        self._last_report = now
+        print(self.format_progress())
+
+    def _observe(self, stage, size_label, projection_label, seconds):
+        for key in ((stage, ALL, ALL), (stage, size_label, ALL), (stage, ALL, projection_label)):
+            if key not in self.histograms:
+                self.histograms[key] = LatencyHistogram()
+            self.histograms[key].observe(seconds)
+
+    def record_file(self, file_path, success, stage_timings=None, file_size=None, projections=None):
+        """Count a finished file and add its stage durations to the histograms"""
+        self.update(file_path, success, file_size)
+        if not stage_timings:
+            return
+        size_label = bucket_label(file_size, SIZE_BUCKETS)
+        projection_label = bucket_label(projections, PROJECTION_BUCKETS)
+        for stage, seconds in stage_timings.items():
+            self._observe(stage, size_label, projection_label, seconds)
+        self._observe(TOTAL_STAGE, size_label, projection_label, sum(stage_timings.values()))
+
+    def record_processed(self, file_path, metadata, timer):
+        """Count a file handled by TXRMProcessor; `metadata` is None if it failed"""
+        self.record_file(
+            file_path, metadata is not None,
+            timer.timings if timer is not None else None,
+            timer.bytes_read if timer is not None and timer.bytes_read else None,
+            metadata['image_properties'].get('total_projections') if metadata is not None else None
+        )
+
+    def get_progress(self):
+        with self._lock:
+            progress = {
+                'total': int(self.total_files),
+                'processed': self.processed_files,
+                'failed': len(self.failed_files),
+                'percentage': (self.processed_files / self.total_files) * 100.0 if self.total_files else 0.0,
+                'bytes_processed': self.bytes_processed,
+                'total_bytes': self.total_bytes,
+                'elapsed_seconds': time.time() - self.started_at
+            }
+        progress.update(self.get_throughput())
+        return progress
+
+    def get_percentiles(self, stage=TOTAL_STAGE, file_size=ALL, projections=ALL):
+        """p50/p95/p99 in seconds of one stage and bucket, None if nothing was recorded"""
+        histogram = self.histograms.get((stage, file_size, projections))
+        if histogram is None:
+            return None
+        return dict((name, histogram.percentile(pct)) for name, pct in (('p50', 50), ('p95', 95), ('p99', 99)))
+
+    def format_percentiles(self):
+        """Table of latency percentiles per stage, then per size and projection bucket for the whole file"""
+        lines = [
+            "{0:<28} {1:>6} {2:>9} {3:>9} {4:>9} {5:>9}".format('Stage / bucket', 'Count', 'p50 s', 'p95 s', 'p99 s', 'Max s'),
+            "-" * 75
+        ]
+        rows = [(key[0], key) for key in self.histograms if key[1] == ALL and key[2] == ALL]
+        rows += [("{0} size {1}".format(TOTAL_STAGE, key[1]), key) for key in self.histograms
+                 if key[0] == TOTAL_STAGE and key[1] != ALL]
+        rows += [("{0} proj {1}".format(TOTAL_STAGE, key[2]), key) for key in self.histograms
+                 if key[0] == TOTAL_STAGE and key[2] != ALL]
+        for label, key in rows:
+            histogram = self.histograms[key]
+            lines.append("{0:<28} {1:>6} {2:>9.3f} {3:>9.3f} {4:>9.3f} {5:>9.3f}".format(
+                label, histogram.count, histogram.percentile(50), histogram.percentile(95),
+                histogram.percentile(99), histogram.max))
+        return "\n".join(lines)
+
+    def snapshot(self):
+        """Progress and all histograms as a JSON-serializable dict"""
+        return OrderedDict([
+            ('generated_at', time.strftime("%Y-%m-%d %H:%M:%S")),
+            ('progress', self.get_progress()),
+            ('latency_buckets', [bound if bound != INF else '+Inf' for bound in LATENCY_BUCKETS]),
+            ('histograms', [
+                OrderedDict([('stage', stage), ('file_size', size_label), ('projections', projection_label)]
+                            + list(histogram.to_dict().items()))
+                for (stage, size_label, projection_label), histogram in self.histograms.items()
+            ]),
+        ])
+
+    def save_snapshot(self, path):
+        """Write the snapshot as JSON. Returns False on error."""
+        try:
+            with open(path, 'w') as f:
+                json.dump(self.snapshot(), f, indent=2, separators=(',', ': '))
+            return True
+        except (IOError, OSError) as e:
+            print("Error saving latency histograms: {0}".format(str(e)))
+            return False
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division
+import math
+from collections import OrderedDict
+
+
+class RunningStats(object):
+    """
+    Count, mean, variance, min, max, first and last of a stream of numbers
+    in constant memory, using Welford's update. The co-moment with the
+    position of each value (e.g. the projection number) gives a least
+    squares slope and the scatter around that line, also without keeping
+    the values.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.min = None
+        self.max = None
+        self.first = None
+        self.last = None
+        self.first_position = None
+        self.last_position = None
+        self._m2 = 0.0
+        self._position_mean = 0.0
+        self._position_m2 = 0.0
+        self._co_moment = 0.0
+
+    def add(self, value, position=None):
+        """Add one number; `position` defaults to the number of values added before it"""
+        if position is None:
+            position = self.count
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        position_delta = position - self._position_mean
+        self._position_mean += position_delta / self.count
+        self._position_m2 += position_delta * (position - self._position_mean)
+        self._co_moment += position_delta * (value - self.mean)
+
+        if self.first is None:
+            self.first = value
+            self.first_position = position
+            self.min = self.max = value
+        else:
+            self.min = min(self.min, value)
+            self.max = max(self.max, value)
+        self.last = value
+        self.last_position = position
+
+    @property
+    def variance(self):
+        """Population variance, None before the first value"""
+        return self._m2 / self.count if self.count else None
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance) if self.count else None
+
+    @property
+    def slope(self):
+        """Least squares change per unit of position, None if the positions do not vary"""
+        return self._co_moment / self._position_m2 if self._position_m2 > 0 else None
+
+    @property
+    def jitter(self):
+        """Standard deviation around the least squares line"""
+        if self.slope is None:
+            return None
+        residual = self._m2 - self._co_moment * self.slope
+        return math.sqrt(max(residual, 0.0) / self.count)
+
+    def to_dict(self):
+        return OrderedDict([
+            ('count', self.count), ('min', self.min), ('max', self.max), ('mean', self.mean if self.count else None),
+            ('std', self.std), ('first', self.first), ('last', self.last), ('first_position', self.first_position),
+            ('last_position', self.last_position), ('slope', self.slope), ('jitter', self.jitter),
+        ])
+
+
+class ColumnStats(object):
+    """RunningStats of every numeric field of a stream of rows, such as the projections of a scan"""
+
+    def __init__(self, skip=()):
+        self.skip = set(skip)  # Fields that are numbers but not measurements, e.g. the projection number
+        self.columns = {}
+
+    def add(self, row, position=None):
+        for name, value in row.items():
+            if name in self.skip or isinstance(value, bool):
+                continue
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                continue
+            if math.isnan(value) or math.isinf(value):
+                continue
+            column = self.columns.get(name)
+            if column is None:
+                column = self.columns[name] = RunningStats()
+            column.add(value, position)
+
+    def summary(self):
+        """OrderedDict of column name -> RunningStats.to_dict(), sorted by name"""
+        return OrderedDict((name, self.columns[name].to_dict()) for name in sorted(self.columns))
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import csv
+import glob
+import hashlib
+import os
+import re
+import socket
+
+SHARD_CSV_PATTERN = "cumulative_metadata_shard_*_of_*.csv"
+MERGED_CSV_NAME = "cumulative_metadata_merged.csv"
+_SHARD_CSV_RE = re.compile(r"cumulative_metadata_shard_(\d+)_of_(\d+)\.csv$")
+HOST_CSV_PATTERN = "cumulative_metadata_host_*.csv"
+
+
+def parse_shard(spec):
+    """
+    Parse a shard specification of the form "i/N".
+
+    Shards are numbered from 0, so "0/4" to "3/4" cover all files.
+    Raises ValueError for malformed or out-of-range specifications.
+    """
+    try:
+        index, count = [int(part) for part in str(spec).split('/')]
+    except ValueError:
+        raise ValueError("Invalid shard '{0}', expected i/N (e.g. 0/4)".format(spec))
+    if count < 1 or not 0 <= index < count:
+        raise ValueError("Invalid shard '{0}', index must be between 0 and {1}".format(
+            spec, max(count - 1, 0)))
+    return index, count
+
+
+def shard_key(file_path, root):
+    """Path relative to the search root with forward slashes, identical on every host"""
+    rel_path = os.path.relpath(os.path.normpath(file_path), os.path.normpath(root))
+    return rel_path.replace('\\', '/')
+
+
+def shard_of(file_path, root, count):
+    """Stable shard number of a file, independent of process and hash seed"""
+    key = shard_key(file_path, root)
+    if not isinstance(key, bytes):
+        key = key.encode('utf-8')
+    return int(hashlib.md5(key).hexdigest()[:8], 16) % count
+
+
+def in_shard(file_path, root, index, count):
+    """Check if a file belongs to shard `index` of `count`"""
+    return count == 1 or shard_of(file_path, root, count) == index
+
+
+def shard_output_name(index, count, extension='csv'):
+    """File name of the cumulative output written by one shard"""
+    return "cumulative_metadata_shard_{0}_of_{1}.{2}".format(index, count, extension)
+
+
+def host_name():
+    """Name of this workstation, usable in a file name"""
+    return re.sub(r'[^A-Za-z0-9._-]', '_', socket.gethostname()) or 'unknown'
+
+
+def host_output_name(extension='csv', host=None):
+    """File name of the cumulative output written by one workstation of a shared watch"""
+    return "cumulative_metadata_host_{0}.{1}".format(host or host_name(), extension)
+
+
+def merge_shard_csvs(output_dir, merged_path=None, shard_count=None):
+    """
+    Merge the cumulative CSV files written by the shards of one run in
+    `output_dir`. With `shard_count` only files "_of_{shard_count}" are
+    merged; without it, all shard files must have the same count, so that
+    leftovers of a run with a different N are not mixed in.
+
+    Rows are de-duplicated on file hash and TXRM path. Returns the path of
+    the merged CSV, or None if no shard files were found or the counts differ.
+    """
+    found = {}  # shard count -> {shard index: path}
+    for path in glob.glob(os.path.join(output_dir, SHARD_CSV_PATTERN)):
+        match = _SHARD_CSV_RE.search(os.path.basename(path))
+        if match:
+            found.setdefault(int(match.group(2)), {})[int(match.group(1))] = path
+    if shard_count is None and len(found) > 1:
+        print("Shard CSV files of different shard counts ({0}) found in: {1}".format(
+            ", ".join(str(count) for count in sorted(found)), output_dir))
+        print("Use --shards N to merge one run, or remove the files of older runs.")
+        return None
+    if shard_count is None and found:
+        shard_count = list(found)[0]
+    shards = found.get(shard_count)
+    if not shards:
+        print("No shard CSV files found in: {0}".format(output_dir))
+        return None
+
+    # Warn about shards that have not written their output yet
+    missing = sorted(set(range(shard_count)) - set(shards))
+    if missing:
+        print("Warning: Missing output for shards {0} of {1}".format(
+            ", ".join(str(i) for i in missing), shard_count))
+    shard_files = [shards[index] for index in sorted(shards)]
+    return _merge_csv_files(shard_files, merged_path or os.path.join(output_dir, MERGED_CSV_NAME), 'shard')
+
+
+def merge_host_csvs(output_dir, merged_path=None):
+    """
+    Merge the cumulative CSV files written by the workstations of a shared
+    watch in `output_dir`, de-duplicated like shard files. Returns the path
+    of the merged CSV, or None if no workstation files were found.
+    """
+    host_files = sorted(glob.glob(os.path.join(output_dir, HOST_CSV_PATTERN)))
+    if not host_files:
+        print("No workstation CSV files found in: {0}".format(output_dir))
+        return None
+    return _merge_csv_files(host_files, merged_path or os.path.join(output_dir, MERGED_CSV_NAME), 'workstation')
+
+
+def _merge_csv_files(paths, merged_path, kind):
+    """Write the rows of `paths` to `merged_path`, skipping repeated file hash and TXRM path pairs"""
+    fieldnames = None
+    seen = set()
+    rows = []
+    for path in paths:
+        with open(path, 'r') as csvfile:
+            reader = csv.DictReader(csvfile)
+            if fieldnames is None:
+                fieldnames = reader.fieldnames
+            for row in reader:
+                key = (row.get('file_hash'), row.get('txrm_file_path'))
+                if key in seen:
+                    continue
+                seen.add(key)
+                rows.append(row)
+
+    with open(merged_path, 'w') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames, lineterminator='\n')
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+
+    print("Merged {0} rows from {1} {2} files into: {3}".format(
+        len(rows), len(paths), kind, merged_path))
+    return merged_path
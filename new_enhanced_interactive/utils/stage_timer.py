@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division
+import math
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# time.perf_counter does not exist on Python 2.7
+_clock = getattr(time, 'perf_counter', time.time)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers, None if the list is empty"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = int(math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[min(max(rank, 1), len(ordered)) - 1]
+
+
+class StageTimer(object):
+    """
+    Wall-clock durations of the processing stages of one file.
+
+        timer = StageTimer()
+        with timer.stage('hash'):
+            ...
+        timer.timings  # {'hash': 0.12}
+
+    Timing a stage again adds to its duration.
+    """
+
+    def __init__(self):
+        self.timings = OrderedDict()
+        self.bytes_read = 0
+
+    @contextmanager
+    def stage(self, name):
+        start = _clock()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + (_clock() - start)
+
+    def total(self):
+        return sum(self.timings.values())
+
+
+class StageReport(object):
+    """Collects stage timings of many files and prints totals, means and p95 per stage"""
+
+    def __init__(self):
+        self.samples = OrderedDict()  # stage -> list of durations
+        self.files = 0
+        self.bytes_read = 0
+
+    def add(self, timings, bytes_read=0, count_file=True):
+        """Add the stage timings of one file, or of a step that is not per file with count_file=False"""
+        for name, seconds in timings.items():
+            self.samples.setdefault(name, []).append(seconds)
+        self.bytes_read += bytes_read or 0
+        if count_file:
+            self.files += 1
+
+    def reset(self):
+        self.samples = OrderedDict()
+        self.files = 0
+        self.bytes_read = 0
+
+    def format_table(self):
+        lines = [
+            "{0:<16} {1:>6} {2:>10} {3:>10} {4:>10}".format('Stage', 'Count', 'Total s', 'Mean s', 'p95 s'),
+            "-" * 56
+        ]
+        for name, values in self.samples.items():
+            lines.append("{0:<16} {1:>6} {2:>10.3f} {3:>10.3f} {4:>10.3f}".format(
+                name, len(values), sum(values), sum(values) / len(values), percentile(values, 95)))
+        return "\n".join(lines)
+
+    def print_report(self, title="Stage timings"):
+        if not self.samples:
+            return
+        print("\n{0} ({1} files, {2:.1f} MB read):".format(
+            title, self.files, self.bytes_read / (1024.0 * 1024.0)))
+        print(self.format_table())
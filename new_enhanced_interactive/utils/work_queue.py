@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+DEFAULT_LEASE_SECONDS = 300
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_RETRY_DELAY = 60.0  # Seconds before a failed file is retried, doubled after every further failure
+
+STATUS_PENDING = 'pending'
+STATUS_LEASED = 'leased'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+
+def default_worker_id():
+    """Build a worker id that is unique per workstation and process"""
+    return "{0}-{1}".format(socket.gethostname(), os.getpid())
+
+
+class SharedWorkQueue(object):
+    """
+    Lease-based work queue kept in a SQLite database on the shared drive.
+
+    Files are stored relative to the watched root so that workstations which
+    mount the share under different drive letters or mount points still agree
+    on the identity of a file. A worker leases one file at a time; the lease
+    expires after `lease_seconds` unless renewed, so files held by a crashed
+    workstation are picked up again by the others. A failed file is retried
+    after `retry_delay` seconds, doubled for every further failure, so a
+    file that is still being copied does not use up its attempts at once.
+    """
+
+    def __init__(self, db_path, root, worker_id=None, lease_seconds=DEFAULT_LEASE_SECONDS,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS, retry_delay=DEFAULT_RETRY_DELAY):
+        self.db_path = db_path
+        self.root = os.path.normpath(root)
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=60, isolation_level=None,
+                                     check_same_thread=False)
+        self._init_db()
+
+    def _init_db(self):
+        """Create the queue table if it does not exist yet"""
+        with self._lock:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS work_items ("
+                " rel_path TEXT PRIMARY KEY,"
+                " status TEXT NOT NULL,"
+                " worker TEXT,"
+                " lease_expires REAL,"
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " added_at REAL NOT NULL,"
+                " finished_at REAL,"
+                " retry_after REAL)"
+            )
+            # Queues created before failed files were retried with a delay
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(work_items)")]
+            if 'retry_after' not in columns:
+                self._conn.execute("ALTER TABLE work_items ADD COLUMN retry_after REAL")
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_work_items_status"
+                " ON work_items (status, lease_expires)"
+            )
+
+    def _to_key(self, file_path):
+        """Convert a local path to the share-relative key stored in the queue"""
+        rel_path = os.path.relpath(os.path.normpath(file_path), self.root)
+        return rel_path.replace('\\', '/')
+
+    def _to_path(self, key):
+        """Convert a stored key back to a path under this worker's root"""
+        return os.path.join(self.root, *key.split('/'))
+
+    def _transaction(self, statements):
+        """Run (sql, params) statements inside one write-locked transaction"""
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                results = [cursor.execute(sql, params).rowcount for sql, params in statements]
+                cursor.execute("COMMIT")
+                return results
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+
+    def add_files(self, file_paths):
+        """Queue files that are not known yet. Returns the number of new entries."""
+        now = time.time()
+        statements = [
+            ("INSERT OR IGNORE INTO work_items (rel_path, status, added_at) VALUES (?, ?, ?)",
+             (self._to_key(path), STATUS_PENDING, now))
+            for path in file_paths
+        ]
+        if not statements:
+            return 0
+        return sum(self._transaction(statements))
+
+    def acquire(self):
+        """
+        Lease the next available file.
+
+        Pending files, files whose lease has expired and failed files with
+        attempts left whose retry delay has passed are eligible. Returns the
+        local file path, or None if there is nothing to do.
+        """
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = cursor.execute(
+                    "SELECT rel_path FROM work_items"
+                    " WHERE (status = ?"
+                    "    OR (status = ? AND lease_expires < ?)"
+                    "    OR (status = ? AND attempts < ? AND (retry_after IS NULL OR retry_after <= ?)))"
+                    " ORDER BY added_at LIMIT 1",
+                    (STATUS_PENDING, STATUS_LEASED, now, STATUS_FAILED, self.max_attempts, now)
+                ).fetchone()
+                if row is None:
+                    cursor.execute("COMMIT")
+                    return None
+                cursor.execute(
+                    "UPDATE work_items SET status = ?, worker = ?, lease_expires = ?,"
+                    " attempts = attempts + 1 WHERE rel_path = ?",
+                    (STATUS_LEASED, self.worker_id, now + self.lease_seconds, row[0])
+                )
+                cursor.execute("COMMIT")
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+        return self._to_path(row[0])
+
+    def renew(self, file_path):
+        """Extend the lease on a file held by this worker. Returns False if the lease was lost."""
+        updated = self._transaction([(
+            "UPDATE work_items SET lease_expires = ?"
+            " WHERE rel_path = ? AND status = ? AND worker = ?",
+            (time.time() + self.lease_seconds, self._to_key(file_path),
+             STATUS_LEASED, self.worker_id)
+        )])
+        return updated[0] == 1
+
+    def complete(self, file_path, success=True):
+        """Mark a leased file as done or failed. Returns False if the lease was lost."""
+        now = time.time()
+        updated = self._transaction([(
+            "UPDATE work_items SET status = ?, lease_expires = NULL, finished_at = ?,"
+            " retry_after = CASE WHEN ? THEN NULL ELSE ? * (1 << (attempts - 1)) + ? END"
+            " WHERE rel_path = ? AND status = ? AND worker = ?",
+            (STATUS_DONE if success else STATUS_FAILED, now, success, self.retry_delay, now,
+             self._to_key(file_path), STATUS_LEASED, self.worker_id)
+        )])
+        return updated[0] == 1
+
+    def release(self, file_path):
+        """Give a leased file back to the queue without counting it as processed"""
+        self._transaction([(
+            "UPDATE work_items SET status = ?, worker = NULL, lease_expires = NULL,"
+            " attempts = attempts - 1"
+            " WHERE rel_path = ? AND status = ? AND worker = ?",
+            (STATUS_PENDING, self._to_key(file_path), STATUS_LEASED, self.worker_id)
+        )])
+
+    def get_counts(self):
+        """Get the number of queue entries per status"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM work_items GROUP BY status"
+            ).fetchall()
+        counts = dict((status, 0) for status in
+                      (STATUS_PENDING, STATUS_LEASED, STATUS_DONE, STATUS_FAILED))
+        counts.update(dict(rows))
+        return counts
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
+    def lease(self, file_path):
+        """Context manager that keeps the lease on `file_path` alive while working"""
+        return LeaseRenewer(self, file_path)
+
+
+class LeaseRenewer(object):
+    """Background thread that renews a lease until the with-block exits"""
+
+    def __init__(self, queue, file_path, interval=None):
+        self.queue = queue
+        self.file_path = file_path
+        self.interval = interval or max(1.0, queue.lease_seconds / 3.0)
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                if not self.queue.renew(self.file_path):
+                    self.lost = True
+                    print("Warning: Lost lease on {0}".format(self.file_path))
+                    return
+            except Exception as e:
+                print("Error renewing lease: {0}".format(str(e)))
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+    def still_held(self):
+        """Renew the lease now; False if it was lost, e.g. before writing results that others must not duplicate"""
+        if not self.lost:
+            try:
+                self.lost = not self.queue.renew(self.file_path)
+            except Exception as e:
+                print("Error renewing lease: {0}".format(str(e)))
+        return not self.lost